@@ -0,0 +1,173 @@
+import os
+import sys
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+dirName = os.path.dirname(__file__)
+sys.path.append(os.path.join(dirName, '..'))
+import argparse
+import json
+import platform
+import random
+import time
+import numpy as np
+
+from src.environment.chasingEnv import BuildChasingEnv
+from src.maddpg.rlTools.RLrun import getBuffer, SampleFromMemory
+
+seed = 0
+actionDim = 5
+layerWidth = [128, 128]
+
+
+def timeCalls(func, minTime, minCalls = 3):
+    numCalls = 0
+    startTime = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < minTime or numCalls < minCalls:
+        func()
+        numCalls += 1
+        elapsed = time.perf_counter() - startTime
+    return numCalls / elapsed
+
+
+def sampleRandomActions(numAgents):
+    return [np.random.dirichlet(np.ones(actionDim)) for agentID in range(numAgents)]
+
+
+def benchmarkEnvironment(env, minTime):
+    state = env['reset']()
+    actions = sampleRandomActions(env['numAgents'])
+    nextState = env['transit'](state, actions)
+    transitRate = timeCalls(lambda: env['transit'](state, actions), minTime)
+    observeRate = timeCalls(lambda: env['observe'](state), minTime)
+    rewardRate = timeCalls(lambda: env['rewardFunc'](state, actions, nextState), minTime)
+    return {'transitStepsPerSec': transitRate, 'observeCallsPerSec': observeRate, 'rewardCallsPerSec': rewardRate}
+
+
+def makeTransition(env):
+    state = env['reset']()
+    actions = sampleRandomActions(env['numAgents'])
+    nextState = env['transit'](state, actions)
+    reward = env['rewardFunc'](state, actions, nextState)
+    return (env['observe'](state), actions, reward, env['observe'](nextState))
+
+
+def fillBuffer(env, bufferSize, numTransitions):
+    replayBuffer = getBuffer(bufferSize)
+    transition = makeTransition(env)
+    [replayBuffer.append(transition) for _ in range(numTransitions)]
+    return replayBuffer
+
+
+def benchmarkReplay(env, batchSize, minTime):
+    transition = makeTransition(env)
+    replayBuffer = fillBuffer(env, 1e5, 10 * batchSize)
+    appendRate = timeCalls(lambda: replayBuffer.append(transition), minTime, minCalls=1000)
+    sampleFromMemory = SampleFromMemory(batchSize)
+    sampleRate = timeCalls(lambda: sampleFromMemory(replayBuffer), minTime)
+    return {'replayAppendsPerSec': appendRate, 'replaySamplesPerSec': sampleRate}
+
+
+def benchmarkLearner(env, batchSize, minTime):
+    from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainCritic, TrainActor, TrainCriticBySASR, \
+        TrainActorFromSA, TrainMADDPGModelsWithBuffer, actByPolicyTargetNoisyForNextState
+    from src.maddpg.rlTools.RLrun import UpdateParameters, StartLearn
+
+    numAgents = env['numAgents']
+    obsShape = [len(obs) for obs in env['observe'](env['reset']())]
+    buildStartTime = time.perf_counter()
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape)
+    modelsList = [buildMADDPGModels(layerWidth, agentID) for agentID in range(numAgents)]
+    buildTime = time.perf_counter() - buildStartTime
+
+    trainCritic = TrainCritic(TrainCriticBySASR(actByPolicyTargetNoisyForNextState, 0.01, 0.95))
+    trainActor = TrainActor(TrainActorFromSA(0.01))
+    learnEveryCall = StartLearn(0, 1)
+    trainMADDPGModels = TrainMADDPGModelsWithBuffer(UpdateParameters(1, 0.01), trainActor, trainCritic,
+                                                    SampleFromMemory(batchSize), learnEveryCall, modelsList)
+    replayBuffer = fillBuffer(env, 1e5, batchSize)
+    trainMADDPGModels(replayBuffer, 0)
+    roundRate = timeCalls(lambda: trainMADDPGModels(replayBuffer, 0), minTime, minCalls=1)
+    [model.close() for model in modelsList]
+    return {'buildModelsSec': buildTime, 'learnerRoundsPerSec': roundRate}
+
+
+def runBenchmarks(predatorsSweep, blocksSweep, batchSweep, learnerPredatorsSweep, minTime, runLearner):
+    buildChasingEnv = BuildChasingEnv()
+    results = []
+    for numPredators in predatorsSweep:
+        for numBlocks in blocksSweep:
+            np.random.seed(seed)
+            random.seed(seed)
+            env = buildChasingEnv(numPredators, numBlocks)
+            condition = {'numPredators': numPredators, 'numBlocks': numBlocks}
+            results.append({'name': 'environment', **condition, **benchmarkEnvironment(env, minTime)})
+            for batchSize in batchSweep:
+                results.append({'name': 'replay', **condition, 'batchSize': batchSize, **benchmarkReplay(env, batchSize, minTime)})
+                if runLearner and numPredators in learnerPredatorsSweep and numBlocks == blocksSweep[0]:
+                    results.append({'name': 'learner', **condition, 'batchSize': batchSize, **benchmarkLearner(env, batchSize, minTime)})
+            print('benchmarked {} predators, {} blocks'.format(numPredators, numBlocks))
+    return results
+
+
+def getResultKey(result):
+    return (result['name'], result['numPredators'], result['numBlocks'], result.get('batchSize'))
+
+
+def compareWithBaseline(results, baselineResults, tolerance):
+    baselineByKey = {getResultKey(result): result for result in baselineResults}
+    regressions = []
+    for result in results:
+        baseline = baselineByKey.get(getResultKey(result))
+        if baseline is None:
+            continue
+        for metric, value in list(result.items()):
+            if not metric.endswith('PerSec') or metric not in baseline:
+                continue
+            ratio = value / baseline[metric]
+            result[metric + 'VsBaseline'] = ratio
+            if ratio < 1 - tolerance:
+                regressions.append((getResultKey(result), metric, ratio))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Environment, replay and learner benchmarks")
+    parser.add_argument("--predators", type=int, nargs='+', default=[3, 6, 10, 20, 50], help="numPredators sweep")
+    parser.add_argument("--blocks", type=int, nargs='+', default=[2, 6], help="numBlocks sweep")
+    parser.add_argument("--batch-sizes", type=int, nargs='+', default=[256, 1024], help="minibatch size sweep")
+    parser.add_argument("--learner-predators", type=int, nargs='+', default=[3, 10, 20], help="numPredators sweep for the learner round")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds spent per measurement")
+    parser.add_argument("--no-learner", action='store_true', help="skip the tensorflow learner benchmark")
+    parser.add_argument("--output", type=str, default=os.path.join(dirName, 'results.json'), help="results file")
+    parser.add_argument("--baseline", type=str, default=os.path.join(dirName, 'baseline.json'), help="baseline results file")
+    parser.add_argument("--save-baseline", action='store_true', help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown against the baseline")
+    return parser.parse_args()
+
+
+def main():
+    arglist = parse_args()
+    results = runBenchmarks(arglist.predators, arglist.blocks, arglist.batch_sizes, arglist.learner_predators,
+                            arglist.min_time, not arglist.no_learner)
+
+    regressions = []
+    if os.path.exists(arglist.baseline) and not arglist.save_baseline:
+        with open(arglist.baseline) as baselineFile:
+            regressions = compareWithBaseline(results, json.load(baselineFile)['results'], arglist.tolerance)
+
+    report = {'seed': seed, 'python': platform.python_version(), 'machine': platform.machine(),
+              'numpy': np.__version__, 'results': results}
+    outputPath = arglist.baseline if arglist.save_baseline else arglist.output
+    with open(outputPath, 'w') as outputFile:
+        json.dump(report, outputFile, indent=1)
+    print('results written to {}'.format(outputPath))
+
+    for key, metric, ratio in regressions:
+        print('regression {}: {} at {:.2f}x baseline'.format(key, metric, ratio))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+dirName = os.path.dirname(__file__)
+sys.path.append(os.path.join(dirName, '..'))
+sys.path.append(os.path.join(dirName, '..', '..'))
+import argparse
+import importlib
+import numpy as np
+
+from src.environment.chasingEnv import BuildChasingEnv
+from src.functionTools.goldenTrajectory import SampleRandomAction, SampleChasingAction, RecordGoldenTrajectories, ReplayGoldenTrajectories, \
+    CompareWithGoldenTrajectories, saveGoldenTrajectories, loadGoldenTrajectories
+
+maxTimeStep = 75
+actionDim = 5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Record golden trajectories or check a candidate physics/reward implementation against them")
+    parser.add_argument("mode", choices=['record', 'compare'], help="record reference trajectories or compare a candidate")
+    parser.add_argument("--golden-file", type=str, default=os.path.join(dirName, '..', 'goldenTrajectories', 'golden3predators.npz'))
+    parser.add_argument("--num-predators", type=int, default=3, help="number of predators")
+    parser.add_argument("--num-blocks", type=int, default=2, help="number of blocks")
+    parser.add_argument("--speed", type=float, default=1.0, help="prey speed multiplier")
+    parser.add_argument("--cost", type=float, default=0.0, help="cost-action ratio")
+    parser.add_argument("--selfish", type=float, default=0.0, help="selfish index")
+    parser.add_argument("--num-traj", type=int, default=50, help="number of trajectories to record")
+    parser.add_argument("--seed", type=int, default=0, help="recording seed")
+    parser.add_argument("--candidate", type=str, default=None,
+                        help="module:attribute of a builder called like BuildChasingEnv()(numPredators, numBlocks, speed, cost, selfish)")
+    parser.add_argument("--timing-repeats", type=int, default=5, help="timed replays of each implementation after a warmup, median reported")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="maximum allowed absolute deviation")
+    return parser.parse_args()
+
+
+def importCandidate(candidatePath):
+    moduleName, attributeName = candidatePath.split(':')
+    return getattr(importlib.import_module(moduleName), attributeName)
+
+
+def main():
+    arglist = parse_args()
+    buildChasingEnv = BuildChasingEnv()
+
+    if arglist.mode == 'record':
+        condition = {'numPredators': arglist.num_predators, 'numBlocks': arglist.num_blocks, 'preySpeedMultiplier': arglist.speed,
+                     'costActionRatio': arglist.cost, 'selfishIndex': arglist.selfish}
+        env = buildChasingEnv(**condition)
+        sampleRandomAction = SampleRandomAction(env['numAgents'], actionDim, arglist.seed)
+        sampleAction = SampleChasingAction(env['predatorsID'], env['preyGroupID'][0], sampleRandomAction)
+        recordGoldenTrajectories = RecordGoldenTrajectories(env['reset'], env['transit'], env['rewardFunc'], env['isTerminal'],
+                                                            sampleAction, maxTimeStep, arglist.seed)
+        golden = recordGoldenTrajectories(arglist.num_traj)
+        goldenDir = os.path.dirname(os.path.abspath(arglist.golden_file))
+        if not os.path.exists(goldenDir):
+            os.makedirs(goldenDir)
+        saveGoldenTrajectories(golden, arglist.golden_file, condition)
+        print("recorded {} trajectories, {} steps, {} kills to {}".format(
+            arglist.num_traj, len(golden['states']), int(golden['terminals'].sum()), arglist.golden_file))
+        return
+
+    golden, condition = loadGoldenTrajectories(arglist.golden_file)
+    buildCandidateEnv = importCandidate(arglist.candidate) if arglist.candidate else buildChasingEnv
+    referenceEnv = buildChasingEnv(**condition)
+    candidateEnv = buildCandidateEnv(**condition)
+    replayReference = ReplayGoldenTrajectories(referenceEnv['transit'], referenceEnv['rewardFunc'], referenceEnv['isTerminal'])
+    replayCandidate = ReplayGoldenTrajectories(candidateEnv['transit'], candidateEnv['rewardFunc'], candidateEnv['isTerminal'])
+    report = CompareWithGoldenTrajectories(replayReference, replayCandidate, arglist.timing_repeats)(golden)
+
+    worstSteps = np.argsort(-np.maximum(report['stateDeviation'], report['rewardDeviation']))[:5]
+    print("condition: {}".format(condition))
+    print("steps: {}, trajectories: {}".format(report['numSteps'], report['numTrajectories']))
+    print("max |state deviation|: {:.3e}, max |reward deviation|: {:.3e}, terminal mismatches: {}".format(
+        report['maxStateDeviation'], report['maxRewardDeviation'], report['numTerminalMismatches']))
+    print("worst steps: {}".format([(int(step), float(report['stateDeviation'][step]), float(report['rewardDeviation'][step])) for step in worstSteps]))
+    print("reference reproduces golden file: {}".format(report['referenceMatchesGolden']))
+    print("median of {} replays: reference {:.3f}s, candidate {:.3f}s, speedup {:.2f}x".format(
+        report['numTimedRepeats'], report['referenceTime'], report['candidateTime'], report['speedup']))
+
+    isEquivalent = report['maxStateDeviation'] <= arglist.tolerance and report['maxRewardDeviation'] <= arglist.tolerance \
+        and report['numTerminalMismatches'] == 0
+    sys.exit(0 if isEquivalent else 1)
+
+
+if __name__ == '__main__':
+    main()
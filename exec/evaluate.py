@@ -7,18 +7,27 @@ sys.path.append(os.path.join(dirName, '..'))
 sys.path.append(os.path.join(dirName, '..', '..'))
 import logging
 import argparse
+import random
+import time
 logging.getLogger('tensorflow').setLevel(logging.ERROR)
 
-from src.environment.multiAgentEnv import *
-from src.functionTools.loadSaveModel import *
+import numpy as np
+
+from src.functionTools.loadSaveModel import restoreVariables, loadActorWeights
 from src.functionTools.trajectory import SampleTrajectory
-from src.visualize.drawDemo import *
-from src.environment.reward import *
-from pygame.color import THECOLORS
-from src.maddpg.trainer.MADDPG import *
+from src.functionTools.trajectoryStore import WriteColumnarTrajectories, ColumnarTrajectories
+from src.functionTools.onlineStats import OnlineMeanVariance, SampleUntilStandardError
+from src.functionTools.evaluationCache import EvaluationCache, getCheckpointFilesHash, getEvaluationCacheKey, appendEvaluationRecord, \
+    recordConditionFields
+from src.functionTools.trajectoryStatus import GetTrajectoryStatus, CountTrajectoryContacts, getTrajectoryStateArrays, getStatusLabels
+from src.functionTools.vectorizedEvaluation import SampleTrajKillsInLockstep, EvaluateTrajKillsInLockstep
+from src.functionTools.experiment import getCondition, getConditionName, getModelFileName, findTrainedModelFileName, getTrajFileName, \
+    buildEnvFromCondition, getObsShape, getNumDecisionSteps, actionDim, layerWidth, fixedConditionParameters
+from src.maddpg.trainer.numpyActor import ActByActorWeights
+# tensorflow (MADDPG) and pygame (drawDemo) are imported where they are used, so kill statistics from actor snapshots
+# or without --visualize do not pay for them
 
-maxEpisode = 60000
-maxRunningStepsToSample = 75  # num of timesteps in one eps
+maxEpisode = fixedConditionParameters['maxEpisode']
 
 
 class CalcPredatorsTrajKills:
@@ -28,12 +37,14 @@ class CalcPredatorsTrajKills:
         self.rewardIDinTraj = 2
         
     def __call__(self, traj):        
-        getPredatorReward = lambda allAgentsReward: np.sum([allAgentsReward[predatorID] for predatorID in self.predatorsID])
-        rewardList = [getPredatorReward(timeStepInfo[self.rewardIDinTraj]) for timeStepInfo in traj]
-        trajReward = np.sum(rewardList)
-        trajKills = trajReward/self.killReward
+        trajKills = np.sum([self.getStepKills(timeStepInfo) for timeStepInfo in traj])
         return trajKills
 
+    def getStepKills(self, timeStepInfo):
+        allAgentsReward = timeStepInfo[self.rewardIDinTraj]
+        predatorReward = np.sum([allAgentsReward[predatorID] for predatorID in self.predatorsID])
+        return predatorReward/self.killReward
+
 
 def parse_args():
     parser = argparse.ArgumentParser("Multi-agent chasing experiment evaluation")
@@ -41,10 +52,30 @@ def parse_args():
     parser.add_argument("--speed", type=float, default=1.0, help="prey speed multiplier")
     parser.add_argument("--cost", type=float, default=0.0, help="cost-action ratio")
     parser.add_argument("--selfish", type=float, default=0.0, help="selfish index")
+    parser.add_argument("--k-nearest-predators", type=int, default=0, help="observe only the k nearest other predators, 0 = all")
+    parser.add_argument("--k-nearest-blocks", type=int, default=0, help="observe only the k nearest blocks, 0 = all")
+    parser.add_argument("--critic-pooling", type=str, default='none', choices=['none', 'mean', 'attention'],
+                        help="critic on all agents concatenated (none) or on a shared per-agent encoder with mean / attention pooling")
+    parser.add_argument("--action-repeat", type=int, default=1, help="physics steps each policy decision is held for, as in training")
+    parser.add_argument("--train-seed", type=int, default=-1, help="evaluate this seed of an ensemble trained with --num-seeds, -1 = single-seed model")
 
     parser.add_argument("--num-traj", type=int, default=10, help="number of trajectories to sample")
     parser.add_argument("--visualize", type=int, default=1, help="generate demo = 1, otherwise 0")
     parser.add_argument("--save-images", type=int, default=1, help="save demo images = 1, otherwise 0")
+    parser.add_argument("--headless", type=int, default=0, help="render demos offscreen without a window or fps throttling = 1, otherwise 0")
+    parser.add_argument("--demo-format", type=str, default='png', choices=['png', 'npy', 'npz', 'gif', 'mp4'],
+                        help="png = one image per frame, otherwise one frame stack / animation file per trajectory")
+    parser.add_argument("--num-render", type=int, default=20, help="number of sampled trajectories to render, -1 = all")
+    parser.add_argument("--render-workers", type=int, default=0, help="render headless in this many processes, 0 = in this process")
+    parser.add_argument("--target-se", type=float, default=0.0, help="sample in chunks until the kill standard error drops below this, 0 = sample exactly --num-traj")
+    parser.add_argument("--max-traj", type=int, default=100000, help="trajectory cap when --target-se is set")
+    parser.add_argument("--chunk-size", type=int, default=100, help="trajectories sampled between standard error checks")
+    parser.add_argument("--num-worlds", type=int, default=0, help="simulate this many worlds in lockstep for kill statistics only, 0 = sample trajectories one by one")
+    parser.add_argument("--snapshot-episode", type=int, default=0, help="evaluate the actor-only snapshot of this episode with numpy, 0 = full tensorflow model")
+    parser.add_argument("--traj-float16", type=int, default=0, help="store trajectories in float16 = 1, otherwise 0")
+    parser.add_argument("--seed", type=int, default=0, help="evaluation seed")
+    parser.add_argument("--result-cache", type=int, default=1, help="reuse kill statistics of an identical earlier evaluation = 1, otherwise 0")
+    parser.add_argument("--graph-cache", type=int, default=1, help="reuse built agent graphs from ./graphCache = 1, otherwise 0")
     return parser.parse_args()
 
 
@@ -54,145 +85,184 @@ def main():
     preySpeedMultiplier = arglist.speed
     costActionRatio = arglist.cost
     selfishIndex = arglist.selfish
+    numNearestPredators = arglist.k_nearest_predators or None
+    numNearestBlocks = arglist.k_nearest_blocks or None
+    criticPooling = None if arglist.critic_pooling == 'none' else arglist.critic_pooling
+    trainSeed = None if arglist.train_seed < 0 else arglist.train_seed
+    actionRepeat = arglist.action_repeat
     numTrajToSample = arglist.num_traj
     visualize = arglist.visualize
     saveImage = arglist.save_images
-
-    numPrey = 1
-    numBlocks = 2
-    maxTimeStep = 75
-    killReward = 10
-    killProportion = 0.2
-    biteReward = 0.0
+    headless = arglist.headless
+    demoFormat = arglist.demo_format
+    numRender = arglist.num_render
+    renderWorkers = arglist.render_workers
+    trajFloat16 = arglist.traj_float16
+    numWorlds = arglist.num_worlds
+    snapshotEpisode = arglist.snapshot_episode
+    targetSE = arglist.target_se
+    maxTraj = arglist.max_traj
+    # a lockstep chunk fills all the worlds, so each call samples at least numWorlds trajectories at once
+    chunkSize = arglist.chunk_size if arglist.num_worlds == 0 else max(arglist.chunk_size, arglist.num_worlds)
+    graphCache = arglist.graph_cache
+    seed = arglist.seed
+    resultCache = arglist.result_cache
+
+    condition = getCondition(numPredators, preySpeedMultiplier, costActionRatio, selfishIndex,
+                             numNearestPredators=numNearestPredators, numNearestBlocks=numNearestBlocks, criticPooling=criticPooling,
+                             trainSeed=trainSeed, actionRepeat=actionRepeat)
+    numPrey = condition['numPrey']
+    numBlocks = condition['numBlocks']
+    maxTimeStep = condition['maxTimeStep']
+    killReward = condition['killReward']
 
     print("evaluate: {} predators, {} prey, {} blocks, {} episodes with {} steps each eps, preySpeed: {}x, cost: {}, selfish: {}, sample {} trajectories, demo: {}, save: {}".
           format(numPredators, numPrey, numBlocks, maxEpisode, maxTimeStep, preySpeedMultiplier, costActionRatio, selfishIndex, numTrajToSample, visualize, saveImage))
 
-    numAgents = numPredators + numPrey
-    numEntities = numAgents + numBlocks
-    predatorsID = list(range(numPredators))
-    preyGroupID = list(range(numPredators, numAgents))
-    blocksID = list(range(numAgents, numEntities))
-
-    predatorSize = 0.075
-    preySize = 0.05
-    blockSize = 0.2
-    entitiesSizeList = [predatorSize] * numPredators + [preySize] * numPrey + [blockSize] * numBlocks
-
-    predatorMaxSpeed = 1.0
-    blockMaxSpeed = None
-    preyMaxSpeedOriginal = 1.3
-    preyMaxSpeed = preyMaxSpeedOriginal * preySpeedMultiplier
-
-    entityMaxSpeedList = [predatorMaxSpeed] * numPredators + [preyMaxSpeed] * numPrey + [blockMaxSpeed] * numBlocks
-    entitiesMovableList = [True] * numAgents + [False] * numBlocks
-    massList = [1.0] * numEntities
-
-    collisionReward = 10 # originalPaper = 10*3
-    isCollision = IsCollision(getPosFromAgentState)
-    punishForOutOfBound = PunishForOutOfBound()
-    rewardPrey = RewardPrey(predatorsID, preyGroupID, entitiesSizeList, getPosFromAgentState, isCollision,
-                              punishForOutOfBound, collisionPunishment = collisionReward)
-
-    collisionDist = predatorSize + preySize
-    getAgentsPercentageOfRewards = GetAgentsPercentageOfRewards(selfishIndex, collisionDist)
-    terminalCheck = TerminalCheck()
-
-    getCollisionPredatorReward = GetCollisionPredatorReward(biteReward, killReward, killProportion, sampleFromDistribution, terminalCheck)
-    getPredatorPreyDistance = GetPredatorPreyDistance(computeVectorNorm, getPosFromAgentState)
-    rewardPredator = RewardPredatorsWithKillProb(predatorsID, preyGroupID, entitiesSizeList, isCollision, terminalCheck, getPredatorPreyDistance,
-                 getAgentsPercentageOfRewards, getCollisionPredatorReward)
-
-    reshapeAction = ReshapeAction()
-    getActionCost = GetActionCost(costActionRatio, reshapeAction, individualCost=True)
-    getPredatorsAction = lambda action: [action[predatorID] for predatorID in predatorsID]
-    rewardPredatorWithActionCost = lambda state, action, nextState: np.array(rewardPredator(state, action, nextState)) - np.array(getActionCost(getPredatorsAction(action)))
-
-    rewardFunc = lambda state, action, nextState: \
-        list(rewardPredatorWithActionCost(state, action, nextState)) + list(rewardPrey(state, action, nextState))
-
-    reset = ResetMultiAgentChasing(numAgents, numBlocks)
-    observeOneAgent = lambda agentID: Observe(agentID, predatorsID, preyGroupID, blocksID, getPosFromAgentState,
-                                              getVelFromAgentState)
-    observe = lambda state: [observeOneAgent(agentID)(state) for agentID in range(numAgents)]
-
-    getCollisionForce = GetCollisionForce()
-    applyActionForce = ApplyActionForce(predatorsID, preyGroupID, entitiesMovableList)
-    applyEnvironForce = ApplyEnvironForce(numEntities, entitiesMovableList, entitiesSizeList,
-                                          getCollisionForce, getPosFromAgentState)
-    integrateState = IntegrateState(numEntities, entitiesMovableList, massList,
-                                    entityMaxSpeedList, getVelFromAgentState, getPosFromAgentState)
-    transit = TransitMultiAgentChasing(numEntities, reshapeAction, applyActionForce, applyEnvironForce, integrateState)
-
-    isTerminal = lambda state: terminalCheck.terminal
-    initObsForParams = observe(reset())
-    obsShape = [initObsForParams[obsID].shape[0] for obsID in range(len(initObsForParams))]
-
-    sampleTrajectory = SampleTrajectory(maxRunningStepsToSample, transit, isTerminal, rewardFunc, reset)
-
-    worldDim = 2
-    actionDim = worldDim * 2 + 1
-
-    layerWidth = [128, 128]
+    env = buildEnvFromCondition(condition)
+    numAgents = env['numAgents']
+    predatorsID, preyGroupID = env['predatorsID'], env['preyGroupID']
+    observe = env['observe']
+    obsShape = getObsShape(env)
 
-    #  model ------------------------
+    maxRunningStepsToSample = getNumDecisionSteps(condition)
+    sampleTrajectory = SampleTrajectory(maxRunningStepsToSample, env['transit'], env['isTerminal'], env['rewardFunc'], env['reset'], actionRepeat)
 
-    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape)
-    modelsList = [buildMADDPGModels(layerWidth, agentID) for agentID in range(numAgents)]
+    #  model ------------------------
 
     dirName = os.path.dirname(__file__)
-    fileName = "model{}predators{}prey{}blocks{}episodes{}stepPreySpeed{}PredatorActCost{}sensitive{}biteReward{}killPercent{}_agent".format(
-        numPredators, numPrey, numBlocks, maxEpisode, maxTimeStep, preySpeedMultiplier, costActionRatio, selfishIndex, biteReward, killProportion)
-    modelPaths = [os.path.join(dirName, '..', 'trainedModels', fileName + str(i) ) for i in range(numAgents)]
-    [restoreVariables(model, path) for model, path in zip(modelsList, modelPaths)]
-
-    actOneStepOneModel = ActOneStep(actByPolicyTrainNoisy)
-    policy = lambda allAgentsStates: [actOneStepOneModel(model, observe(allAgentsStates)) for model in modelsList]
-
-    # generate trajectories ------------
-
-    numKillsList = []
-    trajToRender = []
-    trajList = []
-    calcPredatorsTrajKills = CalcPredatorsTrajKills(predatorsID, killReward)
-    for i in range(numTrajToSample):
-        traj = sampleTrajectory(policy)
-        numKills = calcPredatorsTrajKills(traj)
-        numKillsList.append(numKills)
-        trajToRender = trajToRender + list(traj)
-        trajList.append(traj)
-
-    meanTrajKill = np.mean(numKillsList)
-    seTrajKill = np.std(numKillsList) / np.sqrt(len(numKillsList) - 1)
-    print('meanTrajKill', meanTrajKill, 'se ', seTrajKill)
-
-    # save trajectories ------------
+    fileName = getModelFileName(condition)
+    snapshotPaths = [os.path.join(dirName, '..', 'trainedModels', 'actorSnapshots', fileName + str(i) + str(snapshotEpisode) + "eps.npz")
+                     for i in range(numAgents)]
+    modelDir = os.path.join(dirName, '..', 'trainedModels')
+    modelPaths = [os.path.join(modelDir, findTrainedModelFileName(modelDir, condition) + str(i)) for i in range(numAgents)]
+
+    evalRecordPath = os.path.join(dirName, '..', 'evalResults', 'evaluationRecord.csv')
+    getEvalRecord = lambda numTrajectories, meanTrajKill, seTrajKill: {
+        'numPredators': numPredators, 'speed': preySpeedMultiplier, 'cost': costActionRatio, 'selfish': selfishIndex,
+        **{field: condition[field] for field in recordConditionFields}, 'snapshotEpisode': snapshotEpisode, 'targetSE': targetSE, 'numTrajectories': numTrajectories, 'meanTrajKill': meanTrajKill, 'seTrajKill': seTrajKill}
+
+    if resultCache:
+        # a cached result only replaces the kill statistics; demos still need freshly sampled trajectories
+        evaluationCache = EvaluationCache(os.path.join(dirName, '..', 'evalResults', 'cache'))
+        checkpointHash = getCheckpointFilesHash(snapshotPaths if snapshotEpisode > 0 else modelPaths)
+        samplingSettings = {'targetSE': targetSE, 'maxTraj': maxTraj if targetSE > 0 else None, 'chunkSize': chunkSize, 'numWorlds': numWorlds}
+        cacheKey = getEvaluationCacheKey(condition, checkpointHash, seed, numTrajToSample if targetSE == 0 else None, **samplingSettings)
+        cachedResult = evaluationCache.get(cacheKey)
+        if cachedResult is not None and not visualize:
+            print('meanTrajKill', cachedResult['meanTrajKill'], 'se ', cachedResult['seTrajKill'], '(cached)')
+            appendEvaluationRecord(evalRecordPath, getEvalRecord(cachedResult['numTrajectories'], cachedResult['meanTrajKill'], cachedResult['seTrajKill']))
+            return
+
+    if snapshotEpisode > 0:
+        actors = [ActByActorWeights(loadActorWeights(path)[0]) for path in snapshotPaths]
+        policy = lambda allAgentsStates: [actor(agentObs[None])[0] for actor, agentObs in zip(actors, observe(allAgentsStates))]
+        actAllAgentsBatch = lambda allAgentsObservations: np.stack([actor(agentObs) for actor, agentObs in zip(actors, allAgentsObservations)], axis=1)
+    else:
+        from src.maddpg.trainer.MADDPG import BuildMADDPGModels, ActOneStep, actByPolicyTrainNoisy, actByPolicyTrainNoisyBatch
+        graphCacheDir = os.path.join(dirName, '..', 'graphCache') if graphCache else None
+        buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape, graphCacheDir=graphCacheDir, criticPooling=criticPooling)
+        modelsList = [buildMADDPGModels(layerWidth, agentID) for agentID in range(numAgents)]
+        [restoreVariables(model, path) for model, path in zip(modelsList, modelPaths)]
+
+        actOneStepOneModel = ActOneStep(actByPolicyTrainNoisy)
+        policy = lambda allAgentsStates: [actOneStepOneModel(model, observe(allAgentsStates)) for model in modelsList]
+        actAllAgentsBatch = lambda allAgentsObservations: np.stack([actByPolicyTrainNoisyBatch(model, allAgentsObservations) for model in modelsList], axis=1)
+
+    # generate trajectories and kill statistics ------------
 
     trajectoryDirectory = os.path.join(dirName, '..', 'trajectories')
     if not os.path.exists(trajectoryDirectory):
         os.makedirs(trajectoryDirectory)
 
-    trajFileName = "model{}predators{}prey{}blocks{}episodes{}stepPreySpeed{}PredatorActCost{}sensitive{}biteReward{}killPercent{}_Traj".format(
-        numPredators, numPrey, numBlocks, maxEpisode, maxTimeStep, preySpeedMultiplier, costActionRatio,
-        selfishIndex, biteReward, killProportion)
+    trajSavePath = os.path.join(trajectoryDirectory, getTrajFileName(condition))
+
+    if numWorlds > 0:
+        batchEnv = buildEnvFromCondition(condition, batch=True)
+        batchPolicy = lambda states: actAllAgentsBatch(batchEnv['observe'](states))
+        sampleTrajKillsInLockstep = SampleTrajKillsInLockstep(maxRunningStepsToSample, batchEnv['reset'], batchEnv['transit'],
+                                                              batchEnv['rewardFunc'], predatorsID, killReward, actionRepeat)
+        evaluateTrajKills = EvaluateTrajKillsInLockstep(sampleTrajKillsInLockstep, numWorlds)
+        sampleTrajKills = lambda numTrajectories: evaluateTrajKills.sampleTrajKills(batchPolicy, numTrajectories)
+    else:
+        writeTrajectories = WriteColumnarTrajectories(trajSavePath, float16=trajFloat16)
+        calcPredatorsTrajKills = CalcPredatorsTrajKills(predatorsID, killReward)
+
+        def sampleTrajKills(numTrajectories):
+            trajKillsList = []
+            for i in range(numTrajectories):
+                numKills = 0
+                for timeStep in sampleTrajectory.generate(policy):
+                    writeTrajectories.appendStep(timeStep)
+                    numKills += calcPredatorsTrajKills.getStepKills(timeStep)
+                writeTrajectories.endTrajectory()
+                trajKillsList.append(numKills)
+            return trajKillsList
+
+    np.random.seed(seed)
+    random.seed(seed)
+    maxTrajToSample = maxTraj if targetSE > 0 else numTrajToSample
+    sampleUntilStandardError = SampleUntilStandardError(sampleTrajKills, chunkSize, targetSE, maxTrajToSample)
+    startTime = time.time()
+    trajKillsStats = sampleUntilStandardError(OnlineMeanVariance())
+    samplingTime = time.time() - startTime
+    if numWorlds == 0:
+        writeTrajectories.close()
+
+    meanTrajKill = trajKillsStats.mean
+    seTrajKill = trajKillsStats.getStandardError()
+    print('meanTrajKill', meanTrajKill, 'se ', seTrajKill)
+    print('trajectories sampled', trajKillsStats.count, 'trajectories per second', trajKillsStats.count / samplingTime)
+
+    appendEvaluationRecord(evalRecordPath, getEvalRecord(trajKillsStats.count, meanTrajKill, seTrajKill))
+    if resultCache:
+        evaluationCache.put(cacheKey, {'numTrajectories': trajKillsStats.count, 'meanTrajKill': meanTrajKill, 'seTrajKill': seTrajKill})
+
+    if numWorlds > 0:
+        return
+
+    # who bites and who kills, from the saved trajectories ------------
 
-    trajSavePath = os.path.join(trajectoryDirectory, trajFileName)
-    saveToPickle(trajList, trajSavePath)
+    getTrajectoryStatus = GetTrajectoryStatus(predatorsID, preyGroupID, env['entitiesSizeList'])
+    countTrajectoryContacts = CountTrajectoryContacts(getTrajectoryStatus)
+    savedTrajectories = ColumnarTrajectories(trajSavePath)
+    contactCounts = [countTrajectoryContacts(episodeArrays['states'], episodeArrays['nextStates'])
+                     for episodeArrays in map(savedTrajectories.getEpisodeArrays, range(len(savedTrajectories)))]
+    biteSteps, killSteps = np.sum(contactCounts, axis=0)
+    print('predators bite steps per trajectory', biteSteps[predatorsID] / len(savedTrajectories))
+    print('predators in contact at kills per trajectory', killSteps[predatorsID] / len(savedTrajectories))
 
     # visualize ------------
 
-    if visualize:
-        trajList = loadFromPickle(trajSavePath)
+    if visualize and renderWorkers > 0:
+        from src.visualize.renderTrajectories import BuildHeadlessChaseTrial, RenderTrajectoriesInPool, stitchRenderedTrajectories
+
+        numTrajSaved = len(ColumnarTrajectories(trajSavePath))
+        numTrajToRender = numTrajSaved if numRender < 0 else min(numRender, numTrajSaved)
+        renderDir = os.path.join(dirName, '..', 'trajectories', getConditionName(condition), 'forDemo')
+        buildChaseTrial = BuildHeadlessChaseTrial(numPredators, numPrey, numBlocks, demoFormat)
+        renderTrajectoriesInPool = RenderTrajectoriesInPool(renderWorkers, buildChaseTrial, trajSavePath, renderDir)
+        renderIndex = renderTrajectoriesInPool(list(range(numTrajToRender)))
+        stitchedPath = stitchRenderedTrajectories(renderDir, renderIndex, demoFormat)
+        print('rendered', len(renderIndex), 'trajectories to', stitchedPath or renderDir)
+
+    elif visualize:
+        import pygame as pg
+        from pygame.color import THECOLORS
+        from src.visualize.drawDemo import DrawBackground, DrawCircleOutside, DrawState, ChaseTrialWithPrecomputedStatus, \
+            getHeadlessScreen, WriteFramesPerTrajectory
+
+        trajList = ColumnarTrajectories(trajSavePath)
 
         screenWidth = 700
         screenHeight = 700
-        screen = pg.display.set_mode((screenWidth, screenHeight))
+        screen = getHeadlessScreen(screenWidth, screenHeight) if headless else pg.display.set_mode((screenWidth, screenHeight))
         screenColor = THECOLORS['black']
         xBoundary = [0, 700]
         yBoundary = [0, 700]
         lineColor = THECOLORS['white']
         lineWidth = 4
-        drawBackground = DrawBackground(screen, screenColor, xBoundary, yBoundary, lineColor, lineWidth)
+        drawBackground = DrawBackground(screen, screenColor, xBoundary, yBoundary, lineColor, lineWidth, handleEvents=not headless)
 
         FPS = 10
         numBlocks = 2
@@ -208,10 +278,7 @@ def main():
         positionIndex = [0, 1]
         agentIdsToDraw = list(range(numPredators + numPrey + numBlocks))
 
-        conditionName = "model{}predators{}prey{}blocks{}episodes{}stepPreySpeed{}PredatorActCost{}sensitive{}biteReward{}killPercent{}".format(
-            numPredators, numPrey, numBlocks, maxEpisode, maxTimeStep, preySpeedMultiplier, costActionRatio,
-            selfishIndex, biteReward, killProportion)
-        imageSavePath = os.path.join(dirName, '..', 'trajectories', conditionName)
+        imageSavePath = os.path.join(dirName, '..', 'trajectories', getConditionName(condition))
         if not os.path.exists(imageSavePath):
             os.makedirs(imageSavePath)
         imageFolderName = str('forDemo')
@@ -224,18 +291,22 @@ def main():
         drawCircleOutside = DrawCircleOutside(screen, predatorsID, positionIndex,
                                               outsideCircleColor, outsideCircleSize, viewRatio= viewRatio)
 
+        savePngFrames = saveImage and demoFormat == 'png'
+        writeFrames = WriteFramesPerTrajectory(demoFormat, FPS) if saveImage and demoFormat != 'png' else None
         drawState = DrawState(FPS, screen, circleColorSpace, circleSizeSpace, agentIdsToDraw,
-                              positionIndex, saveImage, saveImageDir, preyGroupID, predatorsID,
-                              drawBackground, drawCircleOutside=drawCircleOutside, viewRatio= viewRatio)
+                              positionIndex, savePngFrames, saveImageDir, preyGroupID, predatorsID,
+                              drawBackground, drawCircleOutside=drawCircleOutside, viewRatio= viewRatio,
+                              display=not headless, recordFrame=writeFrames)
 
         # MDP Env
         stateID = 0
-        nextStateID = 3
-        predatorSizeForCheck = 0.075
-        preySizeForCheck = 0.05
-        checkStatus = CheckStatus(predatorsID, preyGroupID, isCollision, predatorSizeForCheck, preySizeForCheck, stateID, nextStateID)
-        chaseTrial = ChaseTrialWithKillNotation(stateID, drawState, checkStatus)
-        [chaseTrial(trajectory) for trajectory in np.array(trajList[:20])]
+        getTrajAgentsStatus = lambda trajectory: getStatusLabels(getTrajectoryStatus(*getTrajectoryStateArrays(trajectory)), predatorsID)
+        chaseTrial = ChaseTrialWithPrecomputedStatus(stateID, drawState, getTrajAgentsStatus)
+        numTrajToRender = len(trajList) if numRender < 0 else min(numRender, len(trajList))
+        for trajID in range(numTrajToRender):
+            chaseTrial(trajList[trajID])
+            if writeFrames is not None:
+                writeFrames.writeTrajectory(os.path.join(saveImageDir, 'traj{}'.format(trajID)))
 
 
 if __name__ == '__main__':
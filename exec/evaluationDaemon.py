@@ -0,0 +1,214 @@
+import os
+import sys
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+dirName = os.path.dirname(__file__)
+sys.path.append(os.path.join(dirName, '..'))
+sys.path.append(os.path.join(dirName, '..', '..'))
+import logging
+logging.getLogger('tensorflow').setLevel(logging.ERROR)
+import argparse
+import glob
+import json
+import random
+import time
+import traceback
+import uuid
+import numpy as np
+
+from src.functionTools.experiment import getCondition, getModelFileName, findTrainedModelFileName, buildEnvFromCondition, getNumDecisionSteps, actionDim, layerWidth
+from src.functionTools.onlineStats import OnlineMeanVariance, SampleUntilStandardError
+from src.functionTools.vectorizedEvaluation import SampleTrajKillsInLockstep, EvaluateTrajKillsInLockstep
+from src.functionTools.loadSaveModel import restoreVariables
+from src.functionTools.evaluationCache import EvaluationCache, getCheckpointFilesHash, getEvaluationCacheKey, appendEvaluationRecord, \
+    recordConditionFields
+
+queueSubDirs = ['pending', 'running', 'done', 'failed']
+resultFields = ['jobID', 'numPredators', 'speed', 'cost', 'selfish'] + recordConditionFields + ['checkpointEpisode', 'seed', 'targetSE',
+                'numTrajectories', 'meanTrajKill', 'seTrajKill', 'evalSeconds']
+
+
+def getJobCondition(job):
+    return getCondition(job['numPredators'], job['speed'], job['cost'], job['selfish'],
+                        numNearestPredators=job.get('numNearestPredators'), numNearestBlocks=job.get('numNearestBlocks'),
+                        criticPooling=job.get('criticPooling'), trainSeed=job.get('trainSeed'),
+                        actionRepeat=job.get('actionRepeat', 1))
+
+
+def getModelPaths(job):
+    condition = getJobCondition(job)
+    checkpointSuffix = str(job['checkpointEpisode']) + "eps" if job.get('checkpointEpisode') else ''
+    modelDir = job.get('modelDir', os.path.join(dirName, '..', 'trainedModels'))
+    fileName = getModelFileName(condition) if checkpointSuffix else findTrainedModelFileName(modelDir, condition)
+    numAgents = job['numPredators'] + condition['numPrey']
+    return [os.path.join(modelDir, fileName + str(agentID) + checkpointSuffix) for agentID in range(numAgents)]
+
+
+class GetWarmModels:
+    # one set of agent graphs per numPredators and observation mode stays built; jobs only restore weights into it
+    def __init__(self, graphCacheDir = None):
+        self.graphCacheDir = graphCacheDir
+        self.modelsByArchitecture = {}
+
+    def __call__(self, condition):
+        architecture = (condition['numPredators'], condition['numNearestPredators'], condition['numNearestBlocks'], condition['criticPooling'])
+        if architecture not in self.modelsByArchitecture:
+            from src.maddpg.trainer.MADDPG import BuildMADDPGModels
+            env = buildEnvFromCondition(condition, batch=True)
+            obsShape = [obs.shape[1] for obs in env['observe'](env['reset'](1))]
+            buildMADDPGModels = BuildMADDPGModels(actionDim, env['numAgents'], obsShape, graphCacheDir=self.graphCacheDir,
+                                                  criticPooling=condition['criticPooling'])
+            self.modelsByArchitecture[architecture] = [buildMADDPGModels(layerWidth, agentID) for agentID in range(env['numAgents'])]
+        return self.modelsByArchitecture[architecture]
+
+
+class EvaluateJob:
+    def __init__(self, getWarmModels, numWorlds, chunkSize, evaluationCache = None):
+        self.getWarmModels = getWarmModels
+        self.numWorlds = numWorlds
+        self.chunkSize = chunkSize
+        self.evaluationCache = evaluationCache
+
+    def sampleTrajKillsStats(self, job, condition, seed, targetSE, maxTrajectories):
+        from src.maddpg.trainer.MADDPG import actByPolicyTrainNoisyBatch
+        modelsList = self.getWarmModels(condition)
+        [restoreVariables(model, path) for model, path in zip(modelsList, getModelPaths(job))]
+
+        np.random.seed(seed)
+        random.seed(seed)
+        env = buildEnvFromCondition(condition, batch=True)
+        batchPolicy = lambda states: np.stack([actByPolicyTrainNoisyBatch(model, env['observe'](states)) for model in modelsList], axis=1)
+        sampleTrajKillsInLockstep = SampleTrajKillsInLockstep(getNumDecisionSteps(condition), env['reset'], env['transit'], env['rewardFunc'],
+                                                              env['predatorsID'], condition['killReward'], condition['actionRepeat'])
+        evaluateTrajKills = EvaluateTrajKillsInLockstep(sampleTrajKillsInLockstep, self.numWorlds)
+        sampleTrajKills = lambda numTrajectories: evaluateTrajKills.sampleTrajKills(batchPolicy, numTrajectories)
+
+        trajKillsStats = SampleUntilStandardError(sampleTrajKills, self.chunkSize, targetSE, maxTrajectories)(OnlineMeanVariance())
+        return {'numTrajectories': trajKillsStats.count, 'meanTrajKill': trajKillsStats.mean, 'seTrajKill': trajKillsStats.getStandardError()}
+
+    def __call__(self, job):
+        startTime = time.time()
+        seed = job.get('seed', 0)
+        condition = getJobCondition(job)
+        targetSE = job.get('targetSE', 0.0)
+        maxTrajectories = job.get('maxTraj', 100000) if targetSE > 0 else job.get('numTraj', 1000)
+        sampleTrajKillsStats = lambda: self.sampleTrajKillsStats(job, condition, seed, targetSE, maxTrajectories)
+
+        if self.evaluationCache is not None:
+            samplingSettings = {'targetSE': targetSE, 'maxTraj': maxTrajectories if targetSE > 0 else None, 'chunkSize': self.chunkSize,
+                                'numWorlds': self.numWorlds}
+            cacheKey = getEvaluationCacheKey(condition, getCheckpointFilesHash(getModelPaths(job)), seed,
+                                             maxTrajectories if targetSE == 0 else None, **samplingSettings)
+            trajKillsStats = self.evaluationCache(cacheKey, sampleTrajKillsStats)
+        else:
+            trajKillsStats = sampleTrajKillsStats()
+
+        result = {'jobID': job['jobID'], 'numPredators': job['numPredators'], 'speed': job['speed'], 'cost': job['cost'],
+                  'selfish': job['selfish'], **{field: condition[field] for field in recordConditionFields}, 'checkpointEpisode': job.get('checkpointEpisode'), 'seed': seed, 'targetSE': targetSE,
+                  **trajKillsStats, 'evalSeconds': time.time() - startTime}
+        return result
+
+
+def appendResult(resultsPath, result):
+    appendEvaluationRecord(resultsPath, result, resultFields)
+
+
+def claimNextJob(queueDir):
+    pendingJobs = sorted(glob.glob(os.path.join(queueDir, 'pending', '*.json')), key=os.path.getmtime)
+    for jobPath in pendingJobs:
+        runningPath = os.path.join(queueDir, 'running', os.path.basename(jobPath))
+        try:
+            os.rename(jobPath, runningPath)  # atomic, so several daemons can share one queue
+        except OSError:
+            continue
+        return runningPath
+    return None
+
+
+def serve(queueDir, resultsPath, evaluateJob, pollInterval, exitWhenEmpty):
+    while True:
+        jobPath = claimNextJob(queueDir)
+        if jobPath is None:
+            if exitWhenEmpty:
+                return
+            time.sleep(pollInterval)
+            continue
+
+        jobFileName = os.path.basename(jobPath)
+        try:
+            with open(jobPath) as jobFile:
+                job = json.load(jobFile)
+            result = evaluateJob(job)
+            appendResult(resultsPath, result)
+            os.rename(jobPath, os.path.join(queueDir, 'done', jobFileName))
+            print("job {}: meanTrajKill {} se {} ({} trajectories, {:.1f}s)".format(
+                job['jobID'], result['meanTrajKill'], result['seTrajKill'], result['numTrajectories'], result['evalSeconds']))
+        except Exception:
+            with open(jobPath, 'a') as jobFile:
+                jobFile.write('\n' + json.dumps({'error': traceback.format_exc()}))
+            os.rename(jobPath, os.path.join(queueDir, 'failed', jobFileName))
+            print("job {} failed, see {}".format(jobFileName, os.path.join(queueDir, 'failed', jobFileName)))
+
+
+def submitJob(queueDir, job):
+    job['jobID'] = job.get('jobID') or uuid.uuid4().hex[:12]
+    temporaryPath = os.path.join(queueDir, job['jobID'] + '.tmp')
+    with open(temporaryPath, 'w') as jobFile:
+        json.dump(job, jobFile)
+    os.rename(temporaryPath, os.path.join(queueDir, 'pending', job['jobID'] + '.json'))
+    return job['jobID']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Long-lived evaluation service reading jobs from a queue directory")
+    parser.add_argument("mode", choices=['serve', 'submit'], help="run the service or add a job to its queue")
+    parser.add_argument("--queue-dir", type=str, default=os.path.join(dirName, '..', 'evalJobs'), help="job queue directory")
+    parser.add_argument("--results", type=str, default=os.path.join(dirName, '..', 'evalResults', 'daemonResults.csv'), help="shared results table")
+    parser.add_argument("--num-worlds", type=int, default=1000, help="worlds simulated in lockstep")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="trajectories sampled between standard error checks")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds between queue polls")
+    parser.add_argument("--exit-when-empty", action='store_true', help="stop once the queue is empty")
+    parser.add_argument("--result-cache", type=int, default=1, help="answer jobs identical to an earlier evaluation from the result cache = 1, otherwise 0")
+
+    parser.add_argument("--num-predators", type=int, default=3, help="job: number of predators")
+    parser.add_argument("--speed", type=float, default=1.0, help="job: prey speed multiplier")
+    parser.add_argument("--cost", type=float, default=0.0, help="job: cost-action ratio")
+    parser.add_argument("--selfish", type=float, default=0.0, help="job: selfish index")
+    parser.add_argument("--k-nearest-predators", type=int, default=0, help="job: model observes only the k nearest other predators, 0 = all")
+    parser.add_argument("--k-nearest-blocks", type=int, default=0, help="job: model observes only the k nearest blocks, 0 = all")
+    parser.add_argument("--critic-pooling", type=str, default='none', choices=['none', 'mean', 'attention'], help="job: critic architecture of the model")
+    parser.add_argument("--action-repeat", type=int, default=1, help="job: physics steps each policy decision is held for")
+    parser.add_argument("--train-seed", type=int, default=-1, help="job: seed of an ensemble-trained model, -1 = single-seed model")
+    parser.add_argument("--checkpoint-episode", type=int, default=None, help="job: episode of a saveAllmodels checkpoint, default final model")
+    parser.add_argument("--num-traj", type=int, default=1000, help="job: number of trajectories")
+    parser.add_argument("--target-se", type=float, default=0.0, help="job: stop at this standard error, 0 = sample --num-traj")
+    parser.add_argument("--seed", type=int, default=0, help="job: evaluation seed")
+    return parser.parse_args()
+
+
+def main():
+    arglist = parse_args()
+    queueDir = arglist.queue_dir
+    [os.makedirs(os.path.join(queueDir, subDir)) for subDir in queueSubDirs if not os.path.exists(os.path.join(queueDir, subDir))]
+
+    if arglist.mode == 'submit':
+        job = {'numPredators': arglist.num_predators, 'speed': arglist.speed, 'cost': arglist.cost, 'selfish': arglist.selfish,
+               'checkpointEpisode': arglist.checkpoint_episode, 'numTraj': arglist.num_traj, 'targetSE': arglist.target_se,
+               'seed': arglist.seed, 'numNearestPredators': arglist.k_nearest_predators or None,
+               'numNearestBlocks': arglist.k_nearest_blocks or None,
+               'criticPooling': None if arglist.critic_pooling == 'none' else arglist.critic_pooling,
+               'trainSeed': None if arglist.train_seed < 0 else arglist.train_seed, 'actionRepeat': arglist.action_repeat}
+        print("submitted job {}".format(submitJob(queueDir, job)))
+        return
+
+    resultsDir = os.path.dirname(os.path.abspath(arglist.results))
+    if not os.path.exists(resultsDir):
+        os.makedirs(resultsDir)
+    evaluationCache = EvaluationCache(os.path.join(dirName, '..', 'evalResults', 'cache')) if arglist.result_cache else None
+    evaluateJob = EvaluateJob(GetWarmModels(os.path.join(dirName, '..', 'graphCache')), arglist.num_worlds, arglist.chunk_size,
+                              evaluationCache)
+    serve(queueDir, arglist.results, evaluateJob, arglist.poll_interval, arglist.exit_when_empty)
+
+
+if __name__ == '__main__':
+    main()
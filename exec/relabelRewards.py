@@ -0,0 +1,45 @@
+import os
+import sys
+dirName = os.path.dirname(__file__)
+sys.path.append(os.path.join(dirName, '..'))
+sys.path.append(os.path.join(dirName, '..', '..'))
+import argparse
+import itertools
+import numpy as np
+
+from src.functionTools.experiment import getCondition, getTrajFileName, buildEnvFromCondition
+from src.functionTools.trajectoryStore import ColumnarTrajectories
+from src.functionTools.rewardRelabel import relabelColumnarTrajectories
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Recompute predator rewards of saved trajectories for other selfish / cost settings")
+    parser.add_argument("--num-predators", type=int, default=3, help="number of predators")
+    parser.add_argument("--speed", type=float, default=1.0, help="prey speed multiplier")
+    parser.add_argument("--cost", type=float, default=0.0, help="cost-action ratio the trajectories were recorded with")
+    parser.add_argument("--selfish", type=float, default=0.0, help="selfish index the trajectories were recorded with")
+    parser.add_argument("--action-repeat", type=int, default=1, help="action repeat the trajectories were recorded with, only 1 can be relabeled")
+    parser.add_argument("--traj-path", type=str, default=None, help="trajectory directory, default the one evaluate.py writes for the condition")
+    parser.add_argument("--target-selfish", type=float, nargs='+', required=True, help="selfish indices to relabel for")
+    parser.add_argument("--target-cost", type=float, nargs='+', required=True, help="cost-action ratios to relabel for, crossed with --target-selfish")
+    parser.add_argument("--seed", type=int, default=0, help="seed for drawing killers the recorded rewards do not identify")
+    return parser.parse_args()
+
+
+def main():
+    arglist = parse_args()
+    condition = getCondition(arglist.num_predators, arglist.speed, arglist.cost, arglist.selfish, actionRepeat=arglist.action_repeat)
+    trajPath = arglist.traj_path or os.path.join(dirName, '..', 'trajectories', getTrajFileName(condition))
+    env = buildEnvFromCondition(condition)
+    targetSettings = list(itertools.product(arglist.target_selfish, arglist.target_cost))
+
+    fields = relabelColumnarTrajectories(trajPath, env, condition, targetSettings, seed=arglist.seed)
+    for (selfish, cost), field in zip(targetSettings, fields):
+        trajectories = ColumnarTrajectories(trajPath, rewardField=field)
+        predatorsReward = np.sum(trajectories.columns['rewards'][:, env['predatorsID']], axis=1)
+        print("selfish {}, cost {}: column {}, mean predators reward per trajectory {:.3f}".format(
+            selfish, cost, field, np.sum(predatorsReward) / len(trajectories)))
+
+
+if __name__ == '__main__':
+    main()
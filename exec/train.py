@@ -8,19 +8,24 @@ sys.path.append(os.path.join(dirName, '..', '..'))
 import logging
 logging.getLogger('tensorflow').setLevel(logging.ERROR)
 import argparse
-
-from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainCritic, TrainActor, TrainCriticBySASR, \
-    TrainActorFromSA, TrainMADDPGModelsWithBuffer, ActOneStep, actByPolicyTrainNoisy, actByPolicyTargetNoisyForNextState
-from src.maddpg.rlTools.RLrun import UpdateParameters, SampleOneStep, SampleFromMemory,\
-    RunTimeStep, RunEpisode, RunAlgorithm, getBuffer, SaveModel, StartLearn
-from src.functionTools.loadSaveModel import saveVariables
-from src.environment.multiAgentEnv import TransitMultiAgentChasing, ApplyActionForce, ApplyEnvironForce, \
-    ResetMultiAgentChasing, ReshapeAction, Observe, GetCollisionForce, IntegrateState, \
-    IsCollision, PunishForOutOfBound, getPosFromAgentState, getVelFromAgentState, GetActionCost
-from src.environment.reward import *
+import shutil
+import numpy as np
+
+from src.maddpg.rlTools.RLrun import UpdateParameters, SampleRepeatedStep, SampleRepeatedBatchStep, SampleFromMemory,\
+    RunTimeStep, RunEpisode, RunAlgorithm, getBuffer, SaveModel, StartLearn, SaveActorSnapshot, SampleEnsembleFromMemory, \
+    RunLockstepTimeStep, RunLockstepAlgorithm, TrackEpisodeRewards, SendActorWeights, StopTraining
+from src.functionTools.loadSaveModel import saveVariables, removeCheckpoint, saveActorWeights, getActorWeights
+from src.functionTools.backgroundEvaluation import BackgroundEvaluator
+from src.functionTools.memoryAccounting import estimateTransitionBytes, getReplayCapacity, GetSessionMemory, ReportMemory
+from src.functionTools.trajectoryStore import WriteColumnarTrajectories
+from src.functionTools.warmStart import BatchChasePolicy, WriteScriptedTrajectories, getReplayTransitions
+from src.functionTools.experiment import getCondition, getModelFileName, getTrajFileName, buildEnvFromCondition, getObsShape, getNumDecisionSteps, actionDim, layerWidth, \
+    fixedConditionParameters
+# tensorflow (MADDPG, ensembleMADDPG) is imported where the graphs are built, so processes spawned from this module,
+# such as the background evaluator, do not load it
 
 # fixed training parameters
-maxEpisode = 60000
+maxEpisode = fixedConditionParameters['maxEpisode']
 learningRateActor = 0.01
 learningRateCritic = 0.01
 gamma = 0.95
@@ -35,7 +40,43 @@ def parse_args():
     parser.add_argument("--speed", type=float, default=1.0, help="prey speed multiplier")
     parser.add_argument("--cost", type=float, default=0.0, help="cost-action ratio")
     parser.add_argument("--selfish", type=float, default=0.0, help="selfish index")
-    return parser.parse_args()
+    parser.add_argument("--k-nearest-predators", type=int, default=0, help="observe only the k nearest other predators, 0 = all")
+    parser.add_argument("--k-nearest-blocks", type=int, default=0, help="observe only the k nearest blocks, 0 = all")
+    parser.add_argument("--critic-pooling", type=str, default='none', choices=['none', 'mean', 'attention'],
+                        help="critic on all agents concatenated (none) or on a shared per-agent encoder with mean / attention pooling")
+    parser.add_argument("--summary-interval", type=int, default=0, help="write tensorboard summaries every n learner steps, 0 = off")
+    parser.add_argument("--trace-interval", type=int, default=0, help="trace every n-th learner session.run of each agent as a Chrome timeline, 0 = off")
+    parser.add_argument("--actor-snapshot-rate", type=int, default=0, help="save actor-only snapshots every n episodes, 0 = off")
+    parser.add_argument("--actor-snapshot-float16", type=int, default=0, help="store actor snapshots in float16 = 1, otherwise 0")
+    parser.add_argument("--eval-rate", type=int, default=0, help="evaluate the actors in a background process every n episodes, 0 = off")
+    parser.add_argument("--eval-traj", type=int, default=1000, help="number of trajectories of each background evaluation")
+    parser.add_argument("--eval-seed", type=int, default=0, help="seed of the worlds and action noise of every background evaluation")
+    parser.add_argument("--stop-metric", type=str, default='none', choices=['none', 'kills', 'reward'],
+                        help="stop once the windowed mean of predator kills or reward per episode stops improving")
+    parser.add_argument("--stop-window", type=int, default=1000, help="episodes per window of the stopping metric")
+    parser.add_argument("--stop-tolerance", type=float, default=0.01, help="smallest gain over the best window that counts as improvement")
+    parser.add_argument("--stop-patience", type=int, default=5, help="stop after this many windows in a row without improvement")
+    parser.add_argument("--stop-min-episodes", type=int, default=10000, help="never stop on the metric before this many episodes")
+    parser.add_argument("--max-hours", type=float, default=0, help="stop after this many wall-clock hours of training, 0 = no limit")
+    parser.add_argument("--max-cpu-hours", type=float, default=0, help="stop after this many cpu hours of training, 0 = no limit")
+    parser.add_argument("--memory-limit-gb", type=float, default=0, help="soft memory limit for the projected footprint with full replay buffers, 0 = none")
+    parser.add_argument("--memory-limit-action", type=str, default='shrink', choices=['shrink', 'refuse'],
+                        help="above the limit, shrink the replay capacity to fit or refuse to start")
+    parser.add_argument("--memory-report-rate", type=int, default=0, help="report rss, replay and tensorflow memory every n episodes, 0 = off")
+    parser.add_argument("--graph-cache", type=int, default=1, help="reuse built agent graphs from ./graphCache = 1, otherwise 0")
+    parser.add_argument("--action-repeat", type=int, default=1, help="hold each policy decision for this many physics steps")
+    parser.add_argument("--num-seeds", type=int, default=1, help="train this many seeds together in one batched graph per agent, 1 = single seed")
+    parser.add_argument("--first-seed", type=int, default=0, help="seed number of the first ensemble member in model file names")
+    parser.add_argument("--warm-start", type=str, default='none', choices=['none', 'trajectories', 'scripted'],
+                        help="pre-fill the replay buffer from saved trajectories or a scripted chaser dataset so learning starts at once")
+    parser.add_argument("--warm-start-path", type=str, default=None, help="trajectory store to pre-fill from, default per condition")
+    parser.add_argument("--warm-start-steps", type=int, default=minibatchSize * fixedConditionParameters['maxTimeStep'],
+                        help="number of transitions to pre-fill, by default as many as are collected before learning starts")
+    arglist = parser.parse_args()
+    if arglist.num_seeds > 1 and (arglist.critic_pooling != 'none' or arglist.summary_interval > 0 or arglist.actor_snapshot_rate > 0
+                                  or arglist.eval_rate > 0 or arglist.trace_interval > 0):
+        parser.error("--num-seeds > 1 supports neither --critic-pooling, --summary-interval, --actor-snapshot-rate, --eval-rate nor --trace-interval")
+    return arglist
 
 
 def main():
@@ -44,98 +85,72 @@ def main():
     preySpeedMultiplier = arglist.speed
     costActionRatio = arglist.cost
     selfishIndex = arglist.selfish
-
-    numPrey = 1
-    numBlocks = 2
+    numNearestPredators = arglist.k_nearest_predators or None
+    numNearestBlocks = arglist.k_nearest_blocks or None
+    criticPooling = None if arglist.critic_pooling == 'none' else arglist.critic_pooling
+    summaryInterval = arglist.summary_interval
+    traceInterval = arglist.trace_interval
+    actorSnapshotRate = arglist.actor_snapshot_rate
+    actorSnapshotFloat16 = arglist.actor_snapshot_float16
+    graphCache = arglist.graph_cache
+    numSeeds = arglist.num_seeds
+    firstSeed = arglist.first_seed
+    actionRepeat = arglist.action_repeat
+    evalRate = arglist.eval_rate
+
+    condition = getCondition(numPredators, preySpeedMultiplier, costActionRatio, selfishIndex,
+                             numNearestPredators=numNearestPredators, numNearestBlocks=numNearestBlocks, criticPooling=criticPooling,
+                             actionRepeat=actionRepeat)
+    numPrey = condition['numPrey']
+    numBlocks = condition['numBlocks']
     saveAllmodels = 0 # save all models during training
-    maxTimeStep = 75
-    killReward = 10
-    killProportion = 0.2
-    biteReward = 0.0
+    maxTimeStep = condition['maxTimeStep']
 
     print("train: {} predators, {} prey, {} blocks, {} episodes with {} steps each eps, preySpeed: {}x, cost: {}, selfish: {}".
           format(numPredators, numPrey, numBlocks, maxEpisode, maxTimeStep, preySpeedMultiplier, costActionRatio, selfishIndex))
 
-    numAgents = numPredators + numPrey
-    numEntities = numAgents + numBlocks
-    predatorsID = list(range(numPredators))
-    preyGroupID = list(range(numPredators, numAgents))
-    blocksID = list(range(numAgents, numEntities))
-
-    predatorSize = 0.075
-    preySize = 0.05
-    blockSize = 0.2
-    entitiesSizeList = [predatorSize] * numPredators + [preySize] * numPrey + [blockSize] * numBlocks
-
-    predatorMaxSpeed = 1.0
-    blockMaxSpeed = None
-    preyMaxSpeedOriginal = 1.3
-    preyMaxSpeed = preyMaxSpeedOriginal * preySpeedMultiplier
-
-    entityMaxSpeedList = [predatorMaxSpeed] * numPredators + [preyMaxSpeed] * numPrey + [blockMaxSpeed] * numBlocks
-    entitiesMovableList = [True] * numAgents + [False] * numBlocks
-    massList = [1.0] * numEntities
-
-    collisionReward = 10 # originalPaper = 10*3
-    isCollision = IsCollision(getPosFromAgentState)
-    punishForOutOfBound = PunishForOutOfBound()
-    rewardPrey = RewardPrey(predatorsID, preyGroupID, entitiesSizeList, getPosFromAgentState, isCollision,
-                              punishForOutOfBound, collisionPunishment = collisionReward)
-
-    collisionDist = predatorSize + preySize
-    getAgentsPercentageOfRewards = GetAgentsPercentageOfRewards(selfishIndex, collisionDist)
-    terminalCheck = TerminalCheck()
-    getCollisionPredatorReward = GetCollisionPredatorReward(biteReward, killReward, killProportion, sampleFromDistribution, terminalCheck)
-    getPredatorPreyDistance = GetPredatorPreyDistance(computeVectorNorm, getPosFromAgentState)
-    rewardPredator = RewardPredatorsWithKillProb(predatorsID, preyGroupID, entitiesSizeList, isCollision, terminalCheck, getPredatorPreyDistance,
-                 getAgentsPercentageOfRewards, getCollisionPredatorReward)
-
-    reshapeAction = ReshapeAction()
-    getActionCost = GetActionCost(costActionRatio, reshapeAction, individualCost=True)
-    getPredatorsAction = lambda action: [action[predatorID] for predatorID in predatorsID]
-    rewardPredatorWithActionCost = lambda state, action, nextState: np.array(rewardPredator(state, action, nextState)) - np.array(getActionCost(getPredatorsAction(action)))
-
-    rewardFunc = lambda state, action, nextState: \
-        list(rewardPredatorWithActionCost(state, action, nextState)) + list(rewardPrey(state, action, nextState))
-
-    reset = ResetMultiAgentChasing(numAgents, numBlocks)
-    observeOneAgent = lambda agentID: Observe(agentID, predatorsID, preyGroupID, blocksID, getPosFromAgentState,
-                                              getVelFromAgentState)
-    observe = lambda state: [observeOneAgent(agentID)(state) for agentID in range(numAgents)]
-
-    getCollisionForce = GetCollisionForce()
-    applyActionForce = ApplyActionForce(predatorsID, preyGroupID, entitiesMovableList)
-    applyEnvironForce = ApplyEnvironForce(numEntities, entitiesMovableList, entitiesSizeList,
-                                          getCollisionForce, getPosFromAgentState)
-    integrateState = IntegrateState(numEntities, entitiesMovableList, massList,
-                                    entityMaxSpeedList, getVelFromAgentState, getPosFromAgentState)
-    transit = TransitMultiAgentChasing(numEntities, reshapeAction, applyActionForce, applyEnvironForce, integrateState)
-
-    isTerminal = lambda state: terminalCheck.terminal
-    initObsForParams = observe(reset())
-    obsShape = [initObsForParams[obsID].shape[0] for obsID in range(len(initObsForParams))]
-
-    worldDim = 2
-    actionDim = worldDim * 2 + 1
-
-    layerWidth = [128, 128]
+    graphCacheDir = os.path.join(dirName, '..', 'graphCache') if graphCache else None
+    modelDir = os.path.join(dirName, '..', 'trainedModels')
+    if not os.path.exists(modelDir):
+        os.makedirs(modelDir)
+    warmStartTransitions = [] if arglist.warm_start == 'none' else \
+        getWarmStartTransitions(arglist.warm_start, arglist.warm_start_path, arglist.warm_start_steps, condition)
+    if numSeeds > 1:
+        trainEnsemble(condition, numSeeds, firstSeed, graphCacheDir, modelDir, saveAllmodels, warmStartTransitions, arglist)
+        return
+
+    env = buildEnvFromCondition(condition)
+    numAgents = env['numAgents']
+    reset, transit, observe, rewardFunc, isTerminal = env['reset'], env['transit'], env['observe'], env['rewardFunc'], env['isTerminal']
+    obsShape = getObsShape(env)
 
     #------------ models ------------------------
 
-    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape)
+    from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainCritic, TrainActor, TrainCriticBySASR, TrainActorFromSA, \
+        TrainMADDPGModelsWithBuffer, ActOneStep, actByPolicyTrainNoisy, actByPolicyTargetNoisyForNextState, WriteSummary, TraceRun, \
+        runWithoutTrace
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape, graphCacheDir=graphCacheDir, criticPooling=criticPooling)
     modelsList = [buildMADDPGModels(layerWidth, agentID) for agentID in range(numAgents)]
 
-    trainCriticBySASR = TrainCriticBySASR(actByPolicyTargetNoisyForNextState, learningRateCritic, gamma)
+    summaryDir = os.path.join(dirName, '..', 'summaries', "{}predators{}prey{}blocksPreySpeed{}PredatorActCost{}sensitive{}".format(
+        numPredators, numPrey, numBlocks, preySpeedMultiplier, costActionRatio, selfishIndex))
+    writeSummary = WriteSummary(summaryInterval, summaryDir) if summaryInterval > 0 else None
+
+    traceDir = os.path.join(dirName, '..', 'traces', getModelFileName(condition))
+    traceRun = TraceRun(traceInterval, traceDir, modelsList) if traceInterval > 0 else None
+    runSession = traceRun if traceRun is not None else runWithoutTrace
+
+    trainCriticBySASR = TrainCriticBySASR(actByPolicyTargetNoisyForNextState, learningRateCritic, gamma, writeSummary, runSession)
     trainCritic = TrainCritic(trainCriticBySASR)
-    trainActorFromSA = TrainActorFromSA(learningRateActor)
+    trainActorFromSA = TrainActorFromSA(learningRateActor, writeSummary, runSession)
     trainActor = TrainActor(trainActorFromSA)
 
     paramUpdateInterval = 1 #
-    updateParameters = UpdateParameters(paramUpdateInterval, tau)
+    updateParameters = UpdateParameters(paramUpdateInterval, tau, traceRun)
     sampleBatchFromMemory = SampleFromMemory(minibatchSize)
 
     learnInterval = 100
-    learningStartBufferSize = minibatchSize * maxTimeStep
+    learningStartBufferSize = max(minibatchSize * maxTimeStep - len(warmStartTransitions), 0)
     startLearn = StartLearn(learningStartBufferSize, learnInterval)
 
     trainMADDPGModels = TrainMADDPGModelsWithBuffer(updateParameters, trainActor, trainCritic, sampleBatchFromMemory, startLearn, modelsList)
@@ -143,27 +158,168 @@ def main():
     actOneStepOneModel = ActOneStep(actByPolicyTrainNoisy)
     actOneStep = lambda allAgentsStates, runTime: [actOneStepOneModel(model, allAgentsStates) for model in modelsList]
 
-    sampleOneStep = SampleOneStep(transit, rewardFunc)
+    sampleOneStep = SampleRepeatedStep(transit, rewardFunc, isTerminal, actionRepeat)
     runTimeStep = RunTimeStep(actOneStep, sampleOneStep, trainMADDPGModels, observe = observe)
 
-    runEpisode = RunEpisode(reset, runTimeStep, maxTimeStep, isTerminal)
+    runEpisode = TrackEpisodeRewards(RunEpisode(reset, runTimeStep, getNumDecisionSteps(condition), isTerminal))
+
+    getObservationAndAction = lambda observation: (observation, actOneStep(observation, 0))
+    getSampleTransition = lambda: (*getObservationAndAction(observe(reset())), list(np.zeros(numAgents)), observe(reset()))
+    replayBuffer = getBuffer(getMemoryCheckedBufferSize(arglist, getSampleTransition, 1, warmStartTransitions))
 
     getAgentModel = lambda agentId: lambda: trainMADDPGModels.getTrainedModels()[agentId]
     getModelList = [getAgentModel(i) for i in range(numAgents)]
     modelSaveRate = 1000
-    fileName = "model{}predators{}prey{}blocks{}episodes{}stepPreySpeed{}PredatorActCost{}sensitive{}biteReward{}killPercent{}_agent".format(
-        numPredators, numPrey, numBlocks, maxEpisode, maxTimeStep, preySpeedMultiplier, costActionRatio, selfishIndex, biteReward, killProportion)
+    fileName = getModelFileName(condition)
+    modelPath = os.path.join(modelDir, fileName)
+    saveCheckpoints = [SaveModel(modelSaveRate, saveVariables, getTrainedModel, modelPath + str(i), saveAllmodels) for i, getTrainedModel in enumerate(getModelList)]
+    saveModels = list(saveCheckpoints)
+
+    if actorSnapshotRate > 0:
+        snapshotDir = os.path.join(modelDir, 'actorSnapshots')
+        if not os.path.exists(snapshotDir):
+            os.makedirs(snapshotDir)
+        snapshotCondition = {key: condition[key] for key in ['numPredators', 'speed', 'cost', 'selfish', 'biteReward', 'killProportion']}
+        saveModels += [SaveActorSnapshot(actorSnapshotRate, saveActorWeights, getTrainedModel, os.path.join(snapshotDir, fileName + str(i)),
+                                         {**snapshotCondition, 'agentID': i}, actorSnapshotFloat16) for i, getTrainedModel in enumerate(getModelList)]
+
+    if evalRate > 0:
+        evalDir = os.path.join(dirName, '..', 'evalResults', 'duringTraining')
+        if not os.path.exists(evalDir):
+            os.makedirs(evalDir)
+        backgroundEvaluator = BackgroundEvaluator(condition, arglist.eval_traj, arglist.eval_seed, os.path.join(evalDir, fileName + '.csv'))
+        backgroundEvaluator.start()
+        saveModels += [SendActorWeights(evalRate, getActorWeights, trainMADDPGModels.getTrainedModels, runEpisode.getMeanEpisodeReward, backgroundEvaluator)]
+
+    if arglist.memory_report_rate > 0:
+        saveModels += [ReportMemory(arglist.memory_report_rate, lambda: [replayBuffer], trainMADDPGModels.getTrainedModels, GetSessionMemory())]
+
+    stopTraining = getStopTraining(arglist, condition, env['predatorsID'])
+    maddpg = RunAlgorithm(runEpisode, maxEpisode, saveModels, numAgents, stopTraining=stopTraining)
+    replayBuffer.extend(warmStartTransitions)
+    maddpg(replayBuffer)
+    if stopTraining is not None:
+        # the periodic saves went to the maxEpisode name, which evaluation would take for a full-length run
+        finalModelPath = os.path.join(modelDir, getModelFileName({**condition, 'maxEpisode': stopTraining.numEpisodes}))
+        [removeCheckpoint(saveCheckpoint.modelSavePath) for saveCheckpoint in saveCheckpoints]
+        [saveCheckpoint.save(finalModelPath + str(i)) for i, saveCheckpoint in enumerate(saveCheckpoints)]
+    if writeSummary is not None:
+        writeSummary.close()
+    if traceRun is not None:
+        traceRun.printOpSummary()
+    if evalRate > 0:
+        backgroundEvaluator.close()
+
+
+def getMemoryCheckedBufferSize(arglist, getSampleTransition, numBuffers, warmStartTransitions):
+    # bufferSize, or the capacity that fits --memory-limit-gb; transition size is measured on the warm-start data if
+    # there is any, else on one transition shaped like those the run stores
+    if arglist.memory_limit_gb <= 0 and arglist.memory_report_rate <= 0:
+        return bufferSize
+    transitionBytes = estimateTransitionBytes(warmStartTransitions if len(warmStartTransitions) > 0 else [getSampleTransition()])
+    try:
+        return getReplayCapacity(bufferSize, transitionBytes, arglist.memory_limit_gb * 2 ** 30, numBuffers, len(warmStartTransitions),
+                                 minibatchSize, arglist.memory_limit_action == 'shrink')
+    except MemoryError as memoryError:
+        sys.exit("train: refusing to start, {}".format(memoryError))
+
+
+def getStopTraining(arglist, condition, predatorsID):
+    # None trains the fixed maxEpisode episodes; otherwise the run ends on a plateau or a spent budget and its final
+    # checkpoint is named with the episodes actually trained, which evaluate.py finds when no full-length one exists
+    if arglist.stop_metric == 'none' and arglist.max_hours <= 0 and arglist.max_cpu_hours <= 0:
+        return None
+    getPredatorsReward = lambda episodeReward: np.sum(np.asarray(episodeReward)[predatorsID])
+    getEpisodeMetric = {'none': None, 'reward': getPredatorsReward,
+                        'kills': lambda episodeReward: getPredatorsReward(episodeReward) / condition['killReward']}[arglist.stop_metric]
+    getBudgetSeconds = lambda hours: hours * 3600 if hours > 0 else None
+    return StopTraining(getEpisodeMetric, arglist.stop_window, arglist.stop_tolerance, arglist.stop_patience, arglist.stop_min_episodes,
+                        getBudgetSeconds(arglist.max_hours), getBudgetSeconds(arglist.max_cpu_hours))
+
+
+def getWarmStartTransitions(warmStart, warmStartPath, warmStartSteps, condition):
+    # the scripted dataset depends on the physics and rewards only, so runs differing in observation mode, critic or
+    # seed share it; whichever run finds it missing generates it
+    datasetCondition = {**condition, **{key: fixedConditionParameters[key] for key in ['numNearestPredators', 'numNearestBlocks', 'criticPooling', 'trainSeed']}}
+    defaultDir = os.path.join(dirName, '..', 'trajectories' if warmStart == 'trajectories' else 'warmStart')
+    warmStartPath = warmStartPath or os.path.join(defaultDir, getTrajFileName(condition if warmStart == 'trajectories' else datasetCondition))
+
+    batchEnv = buildEnvFromCondition(condition, batch=True)
+    if warmStart == 'scripted' and not os.path.exists(warmStartPath):
+        temporaryPath = warmStartPath + '.' + str(os.getpid())
+        batchPolicy = BatchChasePolicy(batchEnv['predatorsID'], batchEnv['preyGroupID'][0], batchEnv['numAgents'], actionDim)
+        numDecisionSteps = getNumDecisionSteps(condition)
+        writeScriptedTrajectories = WriteScriptedTrajectories(batchEnv['reset'], batchEnv['transit'], batchEnv['rewardFunc'], batchPolicy,
+                                                              numDecisionSteps, condition['actionRepeat'])
+        writeTrajectories = WriteColumnarTrajectories(temporaryPath)
+        writeScriptedTrajectories(-(-warmStartSteps // numDecisionSteps), writeTrajectories)
+        writeTrajectories.close()
+        try:
+            os.rename(temporaryPath, warmStartPath)
+        except OSError: # written meanwhile by another run
+            shutil.rmtree(temporaryPath)
+
+    warmStartTransitions = getReplayTransitions(warmStartPath, batchEnv['observe'], warmStartSteps, condition['selfish'], condition['cost'])
+    print("warm start: {} transitions from {}".format(len(warmStartTransitions), warmStartPath))
+    return warmStartTransitions
+
+
+def trainEnsemble(condition, numSeeds, firstSeed, graphCacheDir, modelDir, saveAllmodels, warmStartTransitions, arglist):
+    # numSeeds independent runs of one condition: one world, replay buffer and weight slice per seed, one graph and
+    # session per agent for all of them; every seed is saved as the checkpoint a single-seed run would write
+    from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainMADDPGModelsWithBuffer
+    from src.maddpg.trainer.ensembleMADDPG import BuildEnsembleMADDPGModels, TrainEnsembleCritic, TrainEnsembleActor, \
+        actByEnsembleTrainNoisy, actByEnsembleTargetNoisy, SaveSeedVariables
+    batchEnv = buildEnvFromCondition(condition, batch=True)
+    numAgents = batchEnv['numAgents']
+    maxTimeStep = condition['maxTimeStep']
+    obsShape = getObsShape(buildEnvFromCondition(condition))
+
+    buildEnsembleModels = BuildEnsembleMADDPGModels(numSeeds, actionDim, numAgents, obsShape, graphCacheDir=graphCacheDir)
+    modelsList = [buildEnsembleModels(layerWidth, agentID) for agentID in range(numAgents)]
+
+    trainCritic = TrainEnsembleCritic(actByEnsembleTargetNoisy, learningRateCritic, gamma)
+    trainActor = TrainEnsembleActor(learningRateActor)
+    updateParameters = UpdateParameters(1, tau)
+    sampleBatchFromMemory = SampleEnsembleFromMemory(SampleFromMemory(minibatchSize))
+    startLearn = StartLearn(max(minibatchSize * maxTimeStep - len(warmStartTransitions), 0), 100)
+    trainMADDPGModels = TrainMADDPGModelsWithBuffer(updateParameters, trainActor, trainCritic, sampleBatchFromMemory, startLearn, modelsList)
 
-    modelDir = os.path.join(dirName, '..', 'trainedModels')
-    if not os.path.exists(modelDir):
-        os.makedirs(modelDir)
+    actOneStep = lambda allAgentsObservations, runTime: [actByEnsembleTrainNoisy(model, allAgentsObservations) for model in modelsList]
+    batchReset = batchEnv['reset']
+    sampleOneStep = SampleRepeatedBatchStep(batchEnv['transit'], batchEnv['rewardFunc'], condition['actionRepeat'])
+    runTimeStep = RunLockstepTimeStep(actOneStep, sampleOneStep, trainMADDPGModels, batchEnv['observe'])
 
-    modelPath = os.path.join(modelDir, fileName)
-    saveModels = [SaveModel(modelSaveRate, saveVariables, getTrainedModel, modelPath + str(i), saveAllmodels) for i, getTrainedModel in enumerate(getModelList)]
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape, graphCacheDir=graphCacheDir)
+    exportModels = [buildMADDPGModels(layerWidth, agentID) for agentID in range(numAgents)]
 
-    maddpg = RunAlgorithm(runEpisode, maxEpisode, saveModels, numAgents)
-    replayBuffer = getBuffer(bufferSize)
-    meanRewardList = maddpg(replayBuffer)
+    getFirstSeedRows = lambda allAgentsRows: [agentRows[0] for agentRows in allAgentsRows]
+    getObservations = lambda: batchEnv['observe'](batchReset(numSeeds))
+    getObservationAndAction = lambda observations: (getFirstSeedRows(observations), getFirstSeedRows(actOneStep(observations, 0)))
+    getSampleTransition = lambda: (*getObservationAndAction(getObservations()), np.zeros((numSeeds, numAgents))[0], getFirstSeedRows(getObservations()))
+    replayCapacity = getMemoryCheckedBufferSize(arglist, getSampleTransition, numSeeds, warmStartTransitions)
+    replayBuffers = [getBuffer(replayCapacity) for seed in range(numSeeds)]
+
+    getAgentModel = lambda agentId: lambda: trainMADDPGModels.getTrainedModels()[agentId]
+    getSeedModelPath = lambda seed, numEpisodes: os.path.join(modelDir, getModelFileName({**condition, 'trainSeed': firstSeed + seed, 'maxEpisode': numEpisodes}))
+    saveCheckpoints = [[SaveModel(1000, SaveSeedVariables(seed, exportModels[i], saveVariables), getAgentModel(i),
+                                  getSeedModelPath(seed, maxEpisode) + str(i), saveAllmodels) for i in range(numAgents)] for seed in range(numSeeds)]
+    seedsSaveModels = [list(seedSaveCheckpoints) for seedSaveCheckpoints in saveCheckpoints]
+    if arglist.memory_report_rate > 0:
+        seedsSaveModels[0] += [ReportMemory(arglist.memory_report_rate, lambda: replayBuffers, trainMADDPGModels.getTrainedModels, GetSessionMemory())]
+
+    # every seed counts its own episodes and is saved when it has trained maxEpisode of them or its own stopTraining
+    # fires, so its checkpoint is the one a single-seed run would write after the same number of episodes
+    def finishSeed(seed, numEpisodes, isStopped):
+        if isStopped:
+            [removeCheckpoint(saveCheckpoint.modelSavePath) for saveCheckpoint in saveCheckpoints[seed]]
+            [saveCheckpoint.save(getSeedModelPath(seed, numEpisodes) + str(i)) for i, saveCheckpoint in enumerate(saveCheckpoints[seed])]
+
+    seedsStopTraining = [getStopTraining(arglist, condition, batchEnv['predatorsID']) for seed in range(numSeeds)]
+    maddpg = RunLockstepAlgorithm(batchReset, runTimeStep, getNumDecisionSteps(condition), maxEpisode,
+                                  seedsSaveModels, seedsStopTraining, finishSeed)
+    [replayBuffer.extend(warmStartTransitions) for replayBuffer in replayBuffers]
+    maddpg(replayBuffers)
 
 
 if __name__ == '__main__':
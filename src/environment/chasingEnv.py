@@ -0,0 +1,136 @@
+import numpy as np
+
+from src.environment.multiAgentEnv import TransitMultiAgentChasing, ApplyActionForce, ApplyEnvironForce, \
+    ResetMultiAgentChasing, ReshapeAction, Observe, GetCollisionForce, IntegrateState, \
+    IsCollision, PunishForOutOfBound, getPosFromAgentState, getVelFromAgentState, GetActionCost
+from src.environment.vectorizedEnv import BatchResetMultiAgentChasing, BatchObserve, BatchReshapeAction, \
+    BatchTransitMultiAgentChasing, BatchRewardPredatorsWithKillProb, BatchRewardPrey, BatchGetActionCost, BatchObserveKNearest
+from src.environment.reward import RewardPrey, RewardPredatorsWithKillProb, GetAgentsPercentageOfRewards, \
+    GetCollisionPredatorReward, GetPredatorPreyDistance, TerminalCheck, sampleFromDistribution, computeVectorNorm
+
+
+class BuildChasingEnv:
+    def __init__(self, numPrey = 1, killReward = 10, killProportion = 0.2, biteReward = 0.0, collisionReward = 10,
+                 numNearestPredators = None, numNearestBlocks = None):
+        self.numPrey = numPrey
+        self.killReward = killReward
+        self.killProportion = killProportion
+        self.biteReward = biteReward
+        self.collisionReward = collisionReward
+        self.numNearestPredators = numNearestPredators
+        self.numNearestBlocks = numNearestBlocks
+
+        self.predatorSize = 0.075
+        self.preySize = 0.05
+        self.blockSize = 0.2
+        self.predatorMaxSpeed = 1.0
+        self.preyMaxSpeedOriginal = 1.3
+
+    def buildBatchObserveKNearest(self, predatorsID, preyGroupID, blocksID):
+        # None for either k keeps the full observation of every predator / block
+        if self.numNearestPredators is None and self.numNearestBlocks is None:
+            return None
+        numNearestPredators = len(predatorsID) if self.numNearestPredators is None else self.numNearestPredators
+        numNearestBlocks = len(blocksID) if self.numNearestBlocks is None else self.numNearestBlocks
+        return BatchObserveKNearest(predatorsID, preyGroupID, blocksID, numNearestPredators, numNearestBlocks)
+
+    def __call__(self, numPredators, numBlocks = 2, preySpeedMultiplier = 1.0, costActionRatio = 0.0, selfishIndex = 0.0):
+        numPrey = self.numPrey
+        numAgents = numPredators + numPrey
+        numEntities = numAgents + numBlocks
+        predatorsID = list(range(numPredators))
+        preyGroupID = list(range(numPredators, numAgents))
+        blocksID = list(range(numAgents, numEntities))
+
+        entitiesSizeList = [self.predatorSize] * numPredators + [self.preySize] * numPrey + [self.blockSize] * numBlocks
+        preyMaxSpeed = self.preyMaxSpeedOriginal * preySpeedMultiplier
+        entityMaxSpeedList = [self.predatorMaxSpeed] * numPredators + [preyMaxSpeed] * numPrey + [None] * numBlocks
+        entitiesMovableList = [True] * numAgents + [False] * numBlocks
+        massList = [1.0] * numEntities
+
+        isCollision = IsCollision(getPosFromAgentState)
+        punishForOutOfBound = PunishForOutOfBound()
+        rewardPrey = RewardPrey(predatorsID, preyGroupID, entitiesSizeList, getPosFromAgentState, isCollision,
+                                punishForOutOfBound, collisionPunishment=self.collisionReward)
+
+        collisionDist = self.predatorSize + self.preySize
+        getAgentsPercentageOfRewards = GetAgentsPercentageOfRewards(selfishIndex, collisionDist)
+        terminalCheck = TerminalCheck()
+        getCollisionPredatorReward = GetCollisionPredatorReward(self.biteReward, self.killReward, self.killProportion,
+                                                                sampleFromDistribution, terminalCheck)
+        getPredatorPreyDistance = GetPredatorPreyDistance(computeVectorNorm, getPosFromAgentState)
+        rewardPredator = RewardPredatorsWithKillProb(predatorsID, preyGroupID, entitiesSizeList, isCollision, terminalCheck,
+                                                     getPredatorPreyDistance, getAgentsPercentageOfRewards, getCollisionPredatorReward)
+
+        reshapeAction = ReshapeAction()
+        getActionCost = GetActionCost(costActionRatio, reshapeAction, individualCost=True)
+        getPredatorsAction = lambda action: [action[predatorID] for predatorID in predatorsID]
+        rewardPredatorWithActionCost = lambda state, action, nextState: \
+            np.array(rewardPredator(state, action, nextState)) - np.array(getActionCost(getPredatorsAction(action)))
+        rewardFunc = lambda state, action, nextState: \
+            list(rewardPredatorWithActionCost(state, action, nextState)) + list(rewardPrey(state, action, nextState))
+
+        reset = ResetMultiAgentChasing(numAgents, numBlocks)
+        observeOneAgent = [Observe(agentID, predatorsID, preyGroupID, blocksID, getPosFromAgentState, getVelFromAgentState)
+                           for agentID in range(numAgents)]
+        observe = lambda state: [observeAgent(state) for observeAgent in observeOneAgent]
+        batchObserveKNearest = self.buildBatchObserveKNearest(predatorsID, preyGroupID, blocksID)
+        if batchObserveKNearest is not None:
+            observe = lambda state: [agentObs[0] for agentObs in batchObserveKNearest(np.asarray(state)[None])]
+
+        getCollisionForce = GetCollisionForce()
+        applyActionForce = ApplyActionForce(predatorsID, preyGroupID, entitiesMovableList)
+        applyEnvironForce = ApplyEnvironForce(numEntities, entitiesMovableList, entitiesSizeList,
+                                              getCollisionForce, getPosFromAgentState)
+        integrateState = IntegrateState(numEntities, entitiesMovableList, massList,
+                                        entityMaxSpeedList, getVelFromAgentState, getPosFromAgentState)
+        transit = TransitMultiAgentChasing(numEntities, reshapeAction, applyActionForce, applyEnvironForce, integrateState)
+
+        isTerminal = lambda state: terminalCheck.terminal
+
+        env = {'numPredators': numPredators, 'numPrey': numPrey, 'numBlocks': numBlocks, 'numAgents': numAgents,
+               'numEntities': numEntities, 'predatorsID': predatorsID, 'preyGroupID': preyGroupID, 'blocksID': blocksID,
+               'entitiesSizeList': entitiesSizeList, 'isCollision': isCollision, 'terminalCheck': terminalCheck,
+               'reset': reset, 'transit': transit, 'observe': observe, 'rewardFunc': rewardFunc, 'isTerminal': isTerminal}
+        return env
+
+
+class BuildBatchChasingEnv(BuildChasingEnv):
+    def __call__(self, numPredators, numBlocks = 2, preySpeedMultiplier = 1.0, costActionRatio = 0.0, selfishIndex = 0.0):
+        numPrey = self.numPrey
+        numAgents = numPredators + numPrey
+        numEntities = numAgents + numBlocks
+        predatorsID = list(range(numPredators))
+        preyGroupID = list(range(numPredators, numAgents))
+        blocksID = list(range(numAgents, numEntities))
+
+        entitiesSizeList = [self.predatorSize] * numPredators + [self.preySize] * numPrey + [self.blockSize] * numBlocks
+        preyMaxSpeed = self.preyMaxSpeedOriginal * preySpeedMultiplier
+        entityMaxSpeedList = [self.predatorMaxSpeed] * numPredators + [preyMaxSpeed] * numPrey + [None] * numBlocks
+        entitiesMovableList = [True] * numAgents + [False] * numBlocks
+        massList = [1.0] * numEntities
+
+        collisionDist = self.predatorSize + self.preySize
+        rewardPredator = BatchRewardPredatorsWithKillProb(predatorsID, preyGroupID, entitiesSizeList, selfishIndex, collisionDist,
+                                                          self.biteReward, self.killReward, self.killProportion)
+        rewardPrey = BatchRewardPrey(predatorsID, preyGroupID, entitiesSizeList, self.collisionReward)
+        reshapeAction = BatchReshapeAction()
+        getActionCost = BatchGetActionCost(costActionRatio, reshapeAction)
+
+        def rewardFunc(states, actions, nextStates):
+            predatorsReward, terminal = rewardPredator(states, actions, nextStates)
+            predatorsReward = predatorsReward - getActionCost(np.asarray(actions)[:, predatorsID])
+            return np.concatenate([predatorsReward, rewardPrey(states, actions, nextStates)], axis=1), terminal
+
+        reset = BatchResetMultiAgentChasing(numAgents, numBlocks)
+        observeOneAgent = [BatchObserve(agentID, predatorsID, preyGroupID, blocksID) for agentID in range(numAgents)]
+        observe = lambda states: [observeAgent(states) for observeAgent in observeOneAgent]
+        batchObserveKNearest = self.buildBatchObserveKNearest(predatorsID, preyGroupID, blocksID)
+        if batchObserveKNearest is not None:
+            observe = batchObserveKNearest
+        transit = BatchTransitMultiAgentChasing(numAgents, entitiesMovableList, entitiesSizeList, massList, entityMaxSpeedList, reshapeAction)
+
+        env = {'numPredators': numPredators, 'numPrey': numPrey, 'numBlocks': numBlocks, 'numAgents': numAgents,
+               'numEntities': numEntities, 'predatorsID': predatorsID, 'preyGroupID': preyGroupID, 'blocksID': blocksID,
+               'entitiesSizeList': entitiesSizeList, 'reset': reset, 'transit': transit, 'observe': observe, 'rewardFunc': rewardFunc}
+        return env
@@ -0,0 +1,219 @@
+import numpy as np
+
+# Batched counterparts of multiAgentEnv / reward: states are arrays of shape (numWorlds, numEntities, 4),
+# actions of shape (numWorlds, numAgents, actionDim), so many independent worlds advance in one numpy call.
+
+
+class BatchResetMultiAgentChasing:
+    def __init__(self, numTotalAgents, numBlocks):
+        self.positionDimension = 2
+        self.numTotalAgents = numTotalAgents
+        self.numBlocks = numBlocks
+
+    def __call__(self, numWorlds):
+        agentsPos = np.random.uniform(-1, +1, (numWorlds, self.numTotalAgents, self.positionDimension))
+        blocksPos = np.random.uniform(-0.9, +0.9, (numWorlds, self.numBlocks, self.positionDimension))
+        pos = np.concatenate([agentsPos, blocksPos], axis=1)
+        state = np.concatenate([pos, np.zeros_like(pos)], axis=2)
+        return state
+
+
+class BatchObserve:
+    def __init__(self, agentID, predatorsID, preyGroupID, blocksID):
+        self.agentID = agentID
+        self.blocksID = list(blocksID)
+        otherPredatorsID = [predatorID for predatorID in predatorsID if predatorID != agentID]
+        self.otherPreyID = [preyID for preyID in preyGroupID if preyID != agentID]
+        self.relativeEntitiesID = self.blocksID + otherPredatorsID + self.otherPreyID
+
+    def __call__(self, states):
+        numWorlds = len(states)
+        agentPos = states[:, self.agentID, 0:2]
+        agentVel = states[:, self.agentID, 2:4]
+        relativePos = states[:, self.relativeEntitiesID, 0:2] - agentPos[:, None, :]
+        preyVel = states[:, self.otherPreyID, 2:4]
+        return np.concatenate([agentVel, agentPos, relativePos.reshape(numWorlds, -1), preyVel.reshape(numWorlds, -1)], axis=1)
+
+
+class BatchReshapeAction:
+    def __init__(self, sensitivity = 5):
+        self.sensitivity = sensitivity
+
+    def __call__(self, actions):
+        actionX = actions[..., 1] - actions[..., 2]
+        actionY = actions[..., 3] - actions[..., 4]
+        return np.stack([actionX, actionY], axis=-1) * self.sensitivity
+
+
+class BatchTransitMultiAgentChasing:
+    def __init__(self, numAgents, entitiesMovableList, entitiesSizeList, massList, entityMaxSpeedList, reshapeAction,
+                 contactMargin = 0.001, contactForce = 100, damping = 0.25, dt = 0.1):
+        self.numAgents = numAgents
+        self.movable = np.array(entitiesMovableList)
+        self.sizes = np.array(entitiesSizeList, dtype=np.float64)
+        self.masses = np.array(massList, dtype=np.float64)
+        self.maxSpeeds = np.array([np.inf if maxSpeed is None else maxSpeed for maxSpeed in entityMaxSpeedList])
+        self.reshapeAction = reshapeAction
+        self.contactMargin = contactMargin
+        self.contactForce = contactForce
+        self.damping = damping
+        self.dt = dt
+
+        numEntities = len(entitiesSizeList)
+        self.pairsID1, self.pairsID2 = np.triu_indices(numEntities, k=1)
+        self.pairsMinDist = self.sizes[self.pairsID1] + self.sizes[self.pairsID2]
+        pairsIndex = np.arange(len(self.pairsID1))
+        self.pairsIncidence = np.zeros((numEntities, len(pairsIndex)))
+        self.pairsIncidence[self.pairsID1, pairsIndex] = 1.0 * self.movable[self.pairsID1]
+        self.pairsIncidence[self.pairsID2, pairsIndex] = -1.0 * self.movable[self.pairsID2]
+
+    def __call__(self, states, actions):
+        numWorlds, numEntities = states.shape[:2]
+        pos = states[:, :, 0:2]
+        vel = states[:, :, 2:4]
+
+        force = np.zeros((numWorlds, numEntities, 2))
+        force[:, :self.numAgents] = self.reshapeAction(np.asarray(actions))
+
+        posDiff = pos[:, self.pairsID1] - pos[:, self.pairsID2]
+        dist = np.sqrt(np.sum(np.square(posDiff), axis=-1))
+        penetration = np.logaddexp(0, -(dist - self.pairsMinDist) / self.contactMargin) * self.contactMargin
+        pairForce = self.contactForce * posDiff / dist[..., None] * penetration[..., None]
+        force += np.einsum('ep,wpd->wed', self.pairsIncidence, pairForce)
+
+        nextVel = vel * (1 - self.damping) + force / self.masses[None, :, None] * self.dt
+        speed = np.sqrt(np.sum(np.square(nextVel), axis=-1))
+        overSpeed = speed > self.maxSpeeds[None, :]
+        cappedSpeed = np.where(overSpeed, self.maxSpeeds[None, :], 1)
+        nextVel = np.where(overSpeed[..., None], nextVel / np.where(overSpeed, speed, 1)[..., None] * cappedSpeed[..., None], nextVel)
+        nextPos = pos + nextVel * self.dt
+
+        nextState = np.concatenate([nextPos, nextVel], axis=2)
+        nextState[:, ~self.movable] = states[:, ~self.movable]
+        return nextState
+
+
+class BatchRewardPredatorsWithKillProb:
+    def __init__(self, predatorsID, preyGroupID, entitiesSizeList, selfishIndex, collisionMinDist, biteReward, killReward, killProportion):
+        self.predatorsID = list(predatorsID)
+        self.preyGroupID = list(preyGroupID)
+        self.sizes = np.array(entitiesSizeList, dtype=np.float64)
+        self.selfishIndex = selfishIndex
+        self.collisionMinDist = collisionMinDist
+        self.individualReward = (selfishIndex > 100)
+        self.biteReward = biteReward
+        self.killReward = killReward
+        self.killProportion = killProportion
+
+    def getPercentageOfRewards(self, predatorsPreyDistance, killerID):
+        if self.individualReward:
+            return np.eye(len(self.predatorsID))[killerID]
+        percentageRaw = (predatorsPreyDistance + 1 - self.collisionMinDist) ** (-self.selfishIndex)
+        return percentageRaw / np.sum(percentageRaw, axis=1, keepdims=True)
+
+    def __call__(self, states, actions, nextStates):
+        numWorlds = len(nextStates)
+        numPredators = len(self.predatorsID)
+        rewards = np.zeros((numWorlds, numPredators))
+        terminal = np.zeros(numWorlds, dtype=bool)
+        predatorsPos = nextStates[:, self.predatorsID, 0:2]
+
+        for preyID in self.preyGroupID:
+            predatorsPreyDistance = np.sqrt(np.sum(np.square(predatorsPos - nextStates[:, None, preyID, 0:2]), axis=-1))
+            isCollision = predatorsPreyDistance < self.sizes[self.predatorsID] + self.sizes[preyID]
+            isCollision = isCollision & ~terminal[:, None]
+
+            # random predator order and one kill draw per colliding predator; the first success in that order kills
+            orderKeys = np.random.uniform(size=(numWorlds, numPredators))
+            isKillDraw = np.random.uniform(size=(numWorlds, numPredators)) < self.killProportion
+            killerKeys = np.where(isCollision & isKillDraw, orderKeys, np.inf)
+            killerID = np.argmin(killerKeys, axis=1)
+            firstKillKey = killerKeys[np.arange(numWorlds), killerID]
+            hasKill = np.isfinite(firstKillKey)
+
+            isBite = isCollision & (orderKeys < firstKillKey[:, None])
+            rewards += isBite * self.biteReward
+            killRewardPercent = self.getPercentageOfRewards(predatorsPreyDistance, killerID)
+            rewards += hasKill[:, None] * self.killReward * killRewardPercent
+            terminal = terminal | hasKill
+
+        return rewards, terminal
+
+
+class BatchRewardPrey:
+    def __init__(self, predatorsID, preyGroupID, entitiesSizeList, collisionPunishment):
+        self.predatorsID = list(predatorsID)
+        self.preyGroupID = list(preyGroupID)
+        self.sizes = np.array(entitiesSizeList, dtype=np.float64)
+        self.collisionPunishment = collisionPunishment
+
+    def punishForOutOfBound(self, preyPos):
+        x = np.abs(preyPos)
+        punishment = np.where(x < 0.9, 0, np.where(x < 1.0, (x - 0.9) * 10, np.minimum(np.exp(2 * x - 2), 10)))
+        return np.sum(punishment, axis=-1)
+
+    def __call__(self, states, actions, nextStates):
+        preyPos = nextStates[:, self.preyGroupID, 0:2]
+        predatorsPos = nextStates[:, self.predatorsID, 0:2]
+        dist = np.sqrt(np.sum(np.square(predatorsPos[:, None, :, :] - preyPos[:, :, None, :]), axis=-1))
+        minDist = self.sizes[self.preyGroupID][:, None] + self.sizes[self.predatorsID][None, :]
+        numCollisions = np.sum(dist < minDist, axis=-1)
+        return - self.punishForOutOfBound(preyPos) - self.collisionPunishment * numCollisions
+
+
+class BatchGetActionCost:
+    def __init__(self, costActionRatio, reshapeAction):
+        self.costActionRatio = costActionRatio
+        self.reshapeAction = reshapeAction
+
+    def __call__(self, agentsActions):
+        actionMagnitude = np.sqrt(np.sum(np.square(self.reshapeAction(agentsActions)), axis=-1))
+        return self.costActionRatio * actionMagnitude
+
+
+class BatchObserveKNearest:
+    # observations of all agents from one distance computation per step: only the k nearest other predators and
+    # blocks are encoded, sorted by distance, each as (dx, dy, present) with absent slots zero-padded, so the
+    # observation width stays fixed as numPredators grows
+    def __init__(self, predatorsID, preyGroupID, blocksID, numNearestPredators, numNearestBlocks):
+        self.predatorsID = list(predatorsID)
+        self.preyGroupID = list(preyGroupID)
+        self.blocksID = list(blocksID)
+        self.agentsID = self.predatorsID + self.preyGroupID
+        self.numNearestPredators = numNearestPredators
+        self.numNearestBlocks = numNearestBlocks
+        self.isSelf = np.array([[agentID == predatorID for predatorID in self.predatorsID] for agentID in self.agentsID])
+        self.otherPreyID = [[preyID for preyID in self.preyGroupID if preyID != agentID] for agentID in self.agentsID]
+
+    def getNearest(self, relativePos, isExcluded, numNearest):
+        dist = np.sqrt(np.sum(np.square(relativePos), axis=-1))
+        dist = np.where(isExcluded, np.inf, dist)
+        nearestIndex = np.argsort(dist, axis=-1)[..., :numNearest]
+        nearestDist = np.take_along_axis(dist, nearestIndex, axis=-1)
+        nearestPos = np.take_along_axis(relativePos, nearestIndex[..., None], axis=-2)
+        isPresent = np.isfinite(nearestDist)
+        nearest = np.concatenate([np.where(isPresent[..., None], nearestPos, 0), isPresent[..., None]], axis=-1)
+
+        numMissing = numNearest - nearest.shape[-2]
+        if numMissing > 0:
+            padding = np.zeros(nearest.shape[:-2] + (numMissing, 3))
+            nearest = np.concatenate([nearest, padding], axis=-2)
+        return nearest.reshape(nearest.shape[:-2] + (-1,))
+
+    def __call__(self, states):
+        pos = states[:, :, 0:2]
+        agentsPos = pos[:, self.agentsID]
+        relativePredatorsPos = pos[:, None, self.predatorsID] - agentsPos[:, :, None]
+        relativeBlocksPos = pos[:, None, self.blocksID] - agentsPos[:, :, None]
+        nearestPredators = self.getNearest(relativePredatorsPos, self.isSelf[None], self.numNearestPredators)
+        nearestBlocks = self.getNearest(relativeBlocksPos, np.zeros(relativeBlocksPos.shape[:-1], dtype=bool), self.numNearestBlocks)
+
+        numWorlds = len(states)
+        observations = []
+        for agentIndex, agentID in enumerate(self.agentsID):
+            otherPreyID = self.otherPreyID[agentIndex]
+            otherPreyPos = (pos[:, otherPreyID] - agentsPos[:, agentIndex, None]).reshape(numWorlds, -1)
+            otherPreyVel = states[:, otherPreyID, 2:4].reshape(numWorlds, -1)
+            observations.append(np.concatenate([states[:, agentID, 2:4], agentsPos[:, agentIndex], nearestBlocks[:, agentIndex],
+                                                nearestPredators[:, agentIndex], otherPreyPos, otherPreyVel], axis=1))
+        return observations
@@ -0,0 +1,115 @@
+import os
+import csv
+import time
+import queue
+import multiprocessing
+import numpy as np
+
+from src.functionTools.experiment import buildEnvFromCondition, getNumDecisionSteps
+from src.functionTools.vectorizedEvaluation import SampleTrajKillsInLockstep, EvaluateTrajKillsInLockstep
+from src.maddpg.trainer.numpyActor import ActByActorWeights
+
+# Kill statistics of the policy while it trains: the trainer puts actor weights on a queue every few episodes, and a
+# separate low-priority process evaluates them with numpy actors in lockstep worlds, so the trainer neither waits for
+# the evaluation nor shares its TensorFlow sessions or random state with it.
+
+evaluatorThreadVariables = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+
+
+class EvaluateActorWeights:
+    # every snapshot is evaluated on the same worlds and action noise (numpy seeded with evalSeed before each
+    # evaluation), so differences between snapshots come from the weights only
+    def __init__(self, condition, numTrajectories, evalSeed, numWorlds = 1000):
+        batchEnv = buildEnvFromCondition(condition, batch=True)
+        self.batchObserve = batchEnv['observe']
+        self.predatorsID = batchEnv['predatorsID']
+        sampleTrajKillsInLockstep = SampleTrajKillsInLockstep(getNumDecisionSteps(condition), batchEnv['reset'], batchEnv['transit'],
+                                                              batchEnv['rewardFunc'], self.predatorsID, condition['killReward'],
+                                                              condition['actionRepeat'])
+        self.evaluateTrajKills = EvaluateTrajKillsInLockstep(sampleTrajKillsInLockstep, min(numWorlds, numTrajectories))
+        self.numTrajectories = numTrajectories
+        self.evalSeed = evalSeed
+
+    def __call__(self, allAgentsActorWeights):
+        actors = [ActByActorWeights(actorWeights) for actorWeights in allAgentsActorWeights]
+        batchPolicy = lambda states: np.stack([actor(agentObs) for actor, agentObs in zip(actors, self.batchObserve(states))], axis=1)
+        np.random.seed(self.evalSeed)
+        trajKills, meanTrajKill, seTrajKill, trajPerSecond = self.evaluateTrajKills(batchPolicy, self.numTrajectories)
+        return meanTrajKill, seTrajKill
+
+
+def runBackgroundEvaluator(condition, numTrajectories, evalSeed, recordPath, weightsQueue, niceness = 10):
+    # process target; reads (episode, mean episode reward per agent, actor weights per agent) until None arrives
+    os.nice(niceness)
+    evaluateActorWeights = EvaluateActorWeights(condition, numTrajectories, evalSeed)
+    predatorsID = evaluateActorWeights.predatorsID
+    while True:
+        message = weightsQueue.get()
+        if message is None:
+            break
+        episode, meanEpisodeReward, allAgentsActorWeights = message
+        startTime = time.perf_counter()
+        meanTrajKill, seTrajKill = evaluateActorWeights(allAgentsActorWeights)
+        record = {'episode': episode, 'trainEpisodeReward': np.sum(meanEpisodeReward),
+                  'trainPredatorsEpisodeReward': np.sum(np.asarray(meanEpisodeReward)[predatorsID]), 'numTrajectories': numTrajectories,
+                  'meanTrajKill': meanTrajKill, 'seTrajKill': seTrajKill, 'evalSeconds': time.perf_counter() - startTime}
+        writeHeader = not os.path.exists(recordPath)
+        with open(recordPath, 'a', newline='') as recordFile:
+            writer = csv.DictWriter(recordFile, fieldnames=list(record.keys()))
+            if writeHeader:
+                writer.writeheader()
+            writer.writerow(record)
+        print("evaluation at episode {}: train episode reward {:.3f}, meanTrajKill {:.3f}, se {:.3f}".format(
+            episode, record['trainEpisodeReward'], meanTrajKill, seTrajKill))
+
+
+class BackgroundEvaluator:
+    # a spawned process rather than a fork, so it shares none of the trainer's TensorFlow sessions and thread pools,
+    # and with single-threaded BLAS so it takes one core at most. The spawned child imports the trainer's main module
+    # again, which therefore keeps TensorFlow out of its top-level imports. The queue holds one snapshot: a newer one
+    # replaces a snapshot the evaluator has not started on, so a slow evaluator skips snapshots instead of piling them up
+    def __init__(self, condition, numTrajectories, evalSeed, recordPath):
+        context = multiprocessing.get_context('spawn')
+        self.weightsQueue = context.Queue(maxsize=1)
+        self.process = context.Process(target=runBackgroundEvaluator, args=(condition, numTrajectories, evalSeed, recordPath, self.weightsQueue),
+                                       daemon=True)
+        self.pendingMessage = None
+
+    def start(self):
+        trainerThreadSettings = {variable: os.environ.get(variable) for variable in evaluatorThreadVariables}
+        os.environ.update({variable: '1' for variable in evaluatorThreadVariables})
+        try:
+            self.process.start()
+        finally:
+            [os.environ.pop(variable) if setting is None else os.environ.update({variable: setting})
+             for variable, setting in trainerThreadSettings.items()]
+
+    def put(self, message):
+        # a snapshot still on its way into the pipe can be neither taken back nor joined by another; the newest one
+        # then waits here and goes out with the next put or close
+        self.pendingMessage = message
+        try:
+            self.weightsQueue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.weightsQueue.put_nowait(self.pendingMessage)
+            self.pendingMessage = None
+        except queue.Full:
+            pass
+
+    def close(self):
+        # waits for the last snapshot, so the record covers the end of the run
+        messages = [] if self.pendingMessage is None else [self.pendingMessage]
+        for message in messages + [None]:
+            while self.process.is_alive():
+                try:
+                    self.weightsQueue.put(message, timeout=1)
+                    break
+                except queue.Full:
+                    pass
+        self.process.join()
+        if self.process.exitcode != 0:
+            print("background evaluator exited with code {}, snapshots it did not read are dropped".format(self.process.exitcode))
+        # snapshots left in the pipe by an evaluator that died would otherwise block the trainer's exit
+        self.weightsQueue.cancel_join_thread()
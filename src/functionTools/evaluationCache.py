@@ -0,0 +1,92 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+
+# observation mode, critic, training seed and action repeat change the policy evaluated even with the same weights
+recordConditionFields = ['numNearestPredators', 'numNearestBlocks', 'criticPooling', 'trainSeed', 'actionRepeat']
+cacheConditionFields = ['numPredators', 'speed', 'cost', 'selfish', 'killProportion', 'biteReward'] + recordConditionFields
+
+
+def getCheckpointFilesHash(modelPaths):
+    # a tensorflow checkpoint is the set of files sharing the path prefix; the .meta graph is skipped because it
+    # changes with code edits that leave the weights untouched. Plain files (actor snapshots) are hashed directly.
+    checkpointHash = hashlib.sha256()
+    for modelPath in modelPaths:
+        checkpointFiles = [modelPath] if os.path.isfile(modelPath) else \
+            sorted(path for path in glob.glob(modelPath + '.*') if not path.endswith('.meta'))
+        if len(checkpointFiles) == 0:
+            raise FileNotFoundError("no checkpoint files for {}".format(modelPath))
+        for checkpointFile in checkpointFiles:
+            checkpointHash.update(os.path.basename(checkpointFile).encode())
+            with open(checkpointFile, 'rb') as openedFile:
+                for block in iter(lambda: openedFile.read(1 << 20), b''):
+                    checkpointHash.update(block)
+    return checkpointHash.hexdigest()
+
+
+def getEvaluationCacheKey(condition, checkpointHash, seed, numTrajectories, **samplingSettings):
+    # samplingSettings holds anything else that changes the sampled numbers, e.g. targetSE or numWorlds
+    key = {field: condition[field] for field in cacheConditionFields}
+    key.update({'checkpointHash': checkpointHash, 'seed': seed, 'numTrajectories': numTrajectories})
+    key.update(samplingSettings)
+    return key
+
+
+class EvaluationCache:
+    # one json file per key, written atomically, so concurrent sweeps and daemons can share the directory
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
+        if not os.path.exists(self.cacheDir):
+            os.makedirs(self.cacheDir, exist_ok=True)
+
+    def getEntryPath(self, key):
+        keyHash = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.cacheDir, keyHash + '.json')
+
+    def get(self, key):
+        entryPath = self.getEntryPath(key)
+        if not os.path.exists(entryPath):
+            return None
+        with open(entryPath) as entryFile:
+            return json.load(entryFile)['result']
+
+    def put(self, key, result):
+        entryPath = self.getEntryPath(key)
+        temporaryPath = entryPath + '.' + str(os.getpid())
+        with open(temporaryPath, 'w') as entryFile:
+            json.dump({'key': key, 'result': result}, entryFile)
+        os.replace(temporaryPath, entryPath)
+
+    def __call__(self, key, evaluate):
+        result = self.get(key)
+        if result is None:
+            result = evaluate()
+            self.put(key, result)
+        return result
+
+
+def appendEvaluationRecord(path, record, fieldnames = None):
+    # a csv written before columns were added is first rewritten with them, left empty in its earlier rows
+    fieldnames = list(record.keys()) if fieldnames is None else list(fieldnames)
+    if os.path.exists(path):
+        with open(path, newline='') as recordFile:
+            reader = csv.DictReader(recordFile)
+            fileFieldnames = reader.fieldnames or []
+            rows = list(reader) if fileFieldnames != fieldnames else None
+        if rows is not None:
+            fieldnames += [field for field in fileFieldnames if field not in fieldnames]
+            temporaryPath = path + '.' + str(os.getpid())
+            with open(temporaryPath, 'w', newline='') as recordFile:
+                writer = csv.DictWriter(recordFile, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(temporaryPath, path)
+
+    writeHeader = not os.path.exists(path)
+    with open(path, 'a', newline='') as recordFile:
+        writer = csv.DictWriter(recordFile, fieldnames=fieldnames)
+        if writeHeader:
+            writer.writeheader()
+        writer.writerow(record)
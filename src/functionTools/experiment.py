@@ -0,0 +1,69 @@
+import os
+import re
+
+from src.environment.chasingEnv import BuildChasingEnv, BuildBatchChasingEnv
+
+# everything that identifies a trained model besides the swept numPredators / speed / cost / selfish
+fixedConditionParameters = {'numPrey': 1, 'numBlocks': 2, 'maxEpisode': 60000, 'maxTimeStep': 75, 'killReward': 10,
+                            'killProportion': 0.2, 'biteReward': 0.0, 'collisionReward': 10,
+                            'numNearestPredators': None, 'numNearestBlocks': None, 'criticPooling': None,
+                            'trainSeed': None, 'actionRepeat': 1}
+worldDim = 2
+actionDim = worldDim * 2 + 1
+layerWidth = [128, 128]
+
+
+def getCondition(numPredators, speed = 1.0, cost = 0.0, selfish = 0.0, **fixedParameterOverrides):
+    condition = {**fixedConditionParameters, 'numPredators': numPredators, 'speed': speed, 'cost': cost, 'selfish': selfish}
+    condition.update(fixedParameterOverrides)
+    return condition
+
+
+def getConditionName(condition):
+    # models observing only the k nearest predators / blocks, using a pooled critic, trained as one seed of an ensemble
+    # or acting every actionRepeat physics steps get a suffix; original names are unchanged
+    architectureSuffix = "" if condition['numNearestPredators'] is None and condition['numNearestBlocks'] is None else \
+        "kNearest{}predators{}blocks".format(condition['numNearestPredators'], condition['numNearestBlocks'])
+    architectureSuffix += "" if condition['criticPooling'] is None else "{}PooledCritic".format(condition['criticPooling'])
+    architectureSuffix += "" if condition['trainSeed'] is None else "seed{}".format(condition['trainSeed'])
+    architectureSuffix += "" if condition['actionRepeat'] == 1 else "actionRepeat{}".format(condition['actionRepeat'])
+    return "model{}predators{}prey{}blocks{}episodes{}stepPreySpeed{}PredatorActCost{}sensitive{}biteReward{}killPercent{}".format(
+        condition['numPredators'], condition['numPrey'], condition['numBlocks'], condition['maxEpisode'], condition['maxTimeStep'],
+        condition['speed'], condition['cost'], condition['selfish'], condition['biteReward'], condition['killProportion']) + architectureSuffix
+
+
+def getModelFileName(condition):
+    return getConditionName(condition) + "_agent"
+
+
+def findTrainedModelFileName(modelDir, condition):
+    # a run stopped early by train.py saves its final checkpoint with the number of episodes it trained in place of
+    # maxEpisode; the full-length checkpoint is used when there is one, otherwise the longest stopped run
+    fileName = getModelFileName(condition)
+    if os.path.exists(os.path.join(modelDir, fileName + '0.index')) or not os.path.isdir(modelDir):
+        return fileName
+    namePrefix, nameSuffix = getModelFileName({**condition, 'maxEpisode': '{EPISODES}'}).split('{EPISODES}')
+    checkpointPattern = re.compile(re.escape(namePrefix) + r'(\d+)' + re.escape(nameSuffix + '0.index') + '$')
+    trainedEpisodes = [int(match.group(1)) for match in map(checkpointPattern.match, os.listdir(modelDir)) if match is not None]
+    return getModelFileName({**condition, 'maxEpisode': max(trainedEpisodes)}) if trainedEpisodes else fileName
+
+
+def getTrajFileName(condition):
+    return getConditionName(condition) + "_Traj"
+
+
+def getNumDecisionSteps(condition):
+    # policy decisions per episode; every decision runs actionRepeat physics steps, so the episode spans maxTimeStep
+    # physics steps rounded up to a multiple of actionRepeat (76 for a repeat of 2 or 4 and 75 steps)
+    return -(-condition['maxTimeStep'] // condition['actionRepeat'])
+
+
+def buildEnvFromCondition(condition, batch = False):
+    BuildEnv = BuildBatchChasingEnv if batch else BuildChasingEnv
+    buildEnv = BuildEnv(condition['numPrey'], condition['killReward'], condition['killProportion'], condition['biteReward'],
+                        condition['collisionReward'], condition['numNearestPredators'], condition['numNearestBlocks'])
+    return buildEnv(condition['numPredators'], condition['numBlocks'], condition['speed'], condition['cost'], condition['selfish'])
+
+
+def getObsShape(env):
+    return [agentObs.shape[-1] for agentObs in env['observe'](env['reset']())]
@@ -0,0 +1,150 @@
+import json
+import random
+import time
+import numpy as np
+
+
+def seedStep(seed, stepIndex):
+    stepSeed = (seed * 1000003 + stepIndex) % (2 ** 32)
+    np.random.seed(stepSeed)
+    random.seed(stepSeed)
+
+
+class SampleRandomAction:
+    def __init__(self, numAgents, actionDim, seed):
+        self.numAgents = numAgents
+        self.actionDim = actionDim
+        self.randomState = np.random.RandomState(seed)
+
+    def __call__(self, state):
+        return [self.randomState.dirichlet(np.ones(self.actionDim)) for agentID in range(self.numAgents)]
+
+
+class SampleChasingAction:
+    def __init__(self, predatorsID, preyID, sampleRandomAction, chaseWeight = 0.7):
+        self.predatorsID = predatorsID
+        self.preyID = preyID
+        self.sampleRandomAction = sampleRandomAction
+        self.chaseWeight = chaseWeight
+
+    def __call__(self, state):
+        actions = self.sampleRandomAction(state)
+        preyPos = np.array(state[self.preyID][:2])
+        for predatorID in self.predatorsID:
+            direction = preyPos - np.array(state[predatorID][:2])
+            chaseAction = np.array([0, max(direction[0], 0), max(-direction[0], 0), max(direction[1], 0), max(-direction[1], 0)])
+            chaseAction = chaseAction / (np.sum(chaseAction) + 1e-8)
+            actions[predatorID] = self.chaseWeight * chaseAction + (1 - self.chaseWeight) * actions[predatorID]
+        return actions
+
+
+class RecordGoldenTrajectories:
+    def __init__(self, reset, transit, rewardFunc, isTerminal, sampleAction, maxTimeStep, seed):
+        self.reset = reset
+        self.transit = transit
+        self.rewardFunc = rewardFunc
+        self.isTerminal = isTerminal
+        self.sampleAction = sampleAction
+        self.maxTimeStep = maxTimeStep
+        self.seed = seed
+
+    def __call__(self, numTrajectories):
+        states, actions, rewards, nextStates, terminals = [], [], [], [], []
+        episodeOffsets = [0]
+        stepIndex = 0
+        for trajIndex in range(numTrajectories):
+            seedStep(self.seed, stepIndex)
+            state = self.reset()
+            for timeStep in range(self.maxTimeStep):
+                action = self.sampleAction(state)
+                seedStep(self.seed, stepIndex)
+                nextState = self.transit(state, action)
+                reward = self.rewardFunc(state, action, nextState)
+                terminal = self.isTerminal(nextState)
+
+                states.append(np.array(state, dtype=np.float64))
+                actions.append(np.array(action, dtype=np.float64))
+                rewards.append(np.array(reward, dtype=np.float64))
+                nextStates.append(np.array(nextState, dtype=np.float64))
+                terminals.append(bool(terminal))
+                stepIndex += 1
+
+                state = nextState
+                if terminal:
+                    break
+            episodeOffsets.append(stepIndex)
+
+        golden = {'states': np.array(states), 'actions': np.array(actions), 'rewards': np.array(rewards),
+                  'nextStates': np.array(nextStates), 'terminals': np.array(terminals),
+                  'episodeOffsets': np.array(episodeOffsets), 'seed': np.array(self.seed)}
+        return golden
+
+
+def saveGoldenTrajectories(golden, path, condition):
+    np.savez_compressed(path, condition=np.array(json.dumps(condition)), **golden)
+
+
+def loadGoldenTrajectories(path):
+    with np.load(path) as goldenFile:
+        golden = {key: goldenFile[key] for key in goldenFile.files}
+    condition = json.loads(str(golden.pop('condition')))
+    return golden, condition
+
+
+class ReplayGoldenTrajectories:
+    # the timed loop only steps the environment; inputs are prepared and outputs converted to arrays outside it
+    def __init__(self, transit, rewardFunc, isTerminal):
+        self.transit = transit
+        self.rewardFunc = rewardFunc
+        self.isTerminal = isTerminal
+
+    def __call__(self, golden):
+        seed = int(golden['seed'])
+        states = list(golden['states'])
+        actions = [list(action) for action in golden['actions']]
+        nextStates, rewards, terminals = [], [], []
+        startTime = time.perf_counter()
+        for stepIndex, (state, action) in enumerate(zip(states, actions)):
+            seedStep(seed, stepIndex)
+            nextState = self.transit(state, action)
+            rewards.append(self.rewardFunc(state, action, nextState))
+            terminals.append(self.isTerminal(nextState))
+            nextStates.append(nextState)
+        elapsed = time.perf_counter() - startTime
+        toArray = lambda steps: np.array([np.array(step, dtype=np.float64) for step in steps])
+        return toArray(nextStates), toArray(rewards), np.array([bool(terminal) for terminal in terminals]), elapsed
+
+
+class CompareWithGoldenTrajectories:
+    # the first, untimed replay of each implementation gives the outputs compared and warms caches; then the two are
+    # timed numTimedRepeats times in alternating order, so neither always runs first, and the medians are reported
+    def __init__(self, replayReference, replayCandidate, numTimedRepeats = 5):
+        self.replayReference = replayReference
+        self.replayCandidate = replayCandidate
+        self.numTimedRepeats = numTimedRepeats
+
+    def __call__(self, golden):
+        referenceNextStates, referenceRewards, referenceTerminals, referenceWarmupTime = self.replayReference(golden)
+        nextStates, rewards, terminals, candidateWarmupTime = self.replayCandidate(golden)
+        referenceTimes, candidateTimes = [], []
+        for repeat in range(self.numTimedRepeats):
+            timedReplays = [(self.replayReference, referenceTimes), (self.replayCandidate, candidateTimes)]
+            for replay, times in (timedReplays if repeat % 2 == 0 else timedReplays[::-1]):
+                times.append(replay(golden)[-1])
+        referenceTime = float(np.median(referenceTimes)) if referenceTimes else referenceWarmupTime
+        candidateTime = float(np.median(candidateTimes)) if candidateTimes else candidateWarmupTime
+
+        getStepMaxDeviation = lambda array, goldenArray: np.abs(array - goldenArray).reshape(len(goldenArray), -1).max(axis=1)
+        stateDeviation = getStepMaxDeviation(nextStates, golden['nextStates'])
+        rewardDeviation = getStepMaxDeviation(rewards, golden['rewards'])
+        terminalMismatch = terminals != golden['terminals']
+        referenceMatchesGolden = np.array_equal(referenceNextStates, golden['nextStates']) and \
+            np.array_equal(referenceRewards, golden['rewards']) and np.array_equal(referenceTerminals, golden['terminals'])
+
+        report = {'numSteps': len(golden['states']), 'numTrajectories': len(golden['episodeOffsets']) - 1,
+                  'stateDeviation': stateDeviation, 'rewardDeviation': rewardDeviation, 'terminalMismatch': terminalMismatch,
+                  'maxStateDeviation': float(stateDeviation.max()), 'maxRewardDeviation': float(rewardDeviation.max()),
+                  'numTerminalMismatches': int(terminalMismatch.sum()), 'referenceMatchesGolden': referenceMatchesGolden,
+                  'referenceTime': referenceTime, 'candidateTime': candidateTime, 'numTimedRepeats': self.numTimedRepeats,
+                  'speedup': referenceTime / candidateTime if candidateTime > 0 else float('inf')}
+        return report
@@ -1,4 +1,9 @@
+import glob
+import hashlib
+import json
+import os
 import pickle
+import numpy as np
 
 
 def saveVariables(model, path):
@@ -8,6 +13,11 @@ def saveVariables(model, path):
     print("Model saved in {}".format(path))
 
 
+def removeCheckpoint(path):
+    # the files saveVariables wrote for path; the 'checkpoint' index of the directory is left as it is
+    [os.remove(fileName) for fileName in [path + '.index', path + '.meta'] + glob.glob(glob.escape(path) + '.data-*') if os.path.exists(fileName)]
+
+
 def saveToPickle(data, path):
     pklFile = open(path, "wb")
     pickle.dump(data, pklFile)
@@ -26,4 +36,32 @@ def restoreVariables(model, path):
     saver = graph.get_collection_ref("saver")[0]
     saver.restore(model, path)
     print("Model restored from {}".format(path))
-    return model
\ No newline at end of file
+    return model
+
+
+def getWeightsHash(weights):
+    weightsHash = hashlib.sha256()
+    [weightsHash.update(np.ascontiguousarray(weight).tobytes()) for weight in weights]
+    return weightsHash.hexdigest()
+
+
+def getActorWeights(model):
+    return model.run(model.graph.get_collection_ref("actorTrainParams_")[0])
+
+
+def saveActorWeights(model, path, metadata, float16 = False):
+    graph = model.graph
+    actorTrainParams_ = graph.get_collection_ref("actorTrainParams_")[0]
+    weights = [weight.astype(np.float16 if float16 else np.float32) for weight in getActorWeights(model)]
+    header = {**metadata, 'paramNames': [param_.name for param_ in actorTrainParams_], 'dtype': str(weights[0].dtype),
+              'hash': getWeightsHash(weights)}
+    np.savez(path, header=np.array(json.dumps(header)), **{'param' + str(i): weight for i, weight in enumerate(weights)})
+
+
+def loadActorWeights(path):
+    with np.load(path) as snapshotFile:
+        header = json.loads(str(snapshotFile['header']))
+        weights = [snapshotFile['param' + str(i)] for i in range(len(header['paramNames']))]
+    if getWeightsHash(weights) != header['hash']:
+        raise ValueError("actor snapshot {} does not match its hash".format(path))
+    return weights, header
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import sys
+import random
+import resource
+import numpy as np
+
+# Memory of a training process: its resident set, the replay buffer (a deque of nested lists of small numpy arrays,
+# whose python object headers outweigh the float data) and what every agent session holds in TensorFlow.
+
+dequeBytesPerItem = 8 # one pointer per item in the deque's blocks
+mallocBytesPerArray = 32 # malloc headers and rounding of an array's data and shape buffers, unseen by getsizeof
+
+
+def getProcessRSS():
+    # current resident set size in bytes; the peak from getrusage where /proc is missing
+    try:
+        with open('/proc/self/statm') as statmFile:
+            return int(statmFile.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxRSS if sys.platform == 'darwin' else maxRSS * 1024
+
+
+def getObjectBytes(pyObject):
+    # deep size of a transition; a view is charged its share of the array it keeps alive, so a row of one agent's
+    # (1, actionDim) action batch carries that whole array and a row of a batch of seeds a 1 / numSeeds part of it
+    if isinstance(pyObject, np.ndarray):
+        base = pyObject.base
+        if not isinstance(base, np.ndarray) or base.nbytes == 0:
+            return sys.getsizeof(pyObject) + mallocBytesPerArray
+        return sys.getsizeof(pyObject) + mallocBytesPerArray + (sys.getsizeof(base) + mallocBytesPerArray) * pyObject.nbytes / base.nbytes
+    if isinstance(pyObject, (list, tuple)):
+        return sys.getsizeof(pyObject) + sum(getObjectBytes(item) for item in pyObject)
+    return sys.getsizeof(pyObject)
+
+
+def estimateTransitionBytes(transitions, numSamples = 100, seed = 0):
+    sampleIndices = random.Random(seed).sample(range(len(transitions)), min(numSamples, len(transitions)))
+    return np.mean([getObjectBytes(transitions[index]) for index in sampleIndices]) + dequeBytesPerItem
+
+
+def getReplayCapacity(bufferSize, transitionBytes, memoryLimit, numBuffers = 1, numResidentTransitions = 0, minCapacity = 1, shrink = True):
+    # projected footprint: the current resident set (graphs, sessions and the numResidentTransitions warm-start
+    # transitions already built) plus numBuffers full buffers; above memoryLimit (bytes, 0 = none) the capacity shrinks
+    # to fit, or training refuses to start when shrinking is not allowed or would leave less than minCapacity
+    residentBytes = getProcessRSS()
+    getProjectedBytes = lambda capacity: residentBytes + numBuffers * max(capacity - numResidentTransitions, 0) * transitionBytes
+    toGB = lambda numBytes: numBytes / 2 ** 30
+    print("memory: resident {:.2f} GB, {:.0f} bytes per transition, projected {:.2f} GB with {} buffer(s) of {} transitions".format(
+        toGB(residentBytes), transitionBytes, toGB(getProjectedBytes(bufferSize)), numBuffers, int(bufferSize)))
+    if memoryLimit <= 0 or getProjectedBytes(bufferSize) <= memoryLimit:
+        return int(bufferSize)
+
+    capacity = int((memoryLimit - residentBytes) / (numBuffers * transitionBytes)) + numResidentTransitions
+    if not shrink or capacity < minCapacity:
+        raise MemoryError("projected footprint {:.2f} GB exceeds the {:.2f} GB limit{}".format(
+            toGB(getProjectedBytes(bufferSize)), toGB(memoryLimit), "" if not shrink else
+            ", and a replay capacity that fits ({}) is below the minimum of {}".format(max(capacity, 0), minCapacity)))
+    print("memory: replay capacity shrunk from {} to {} transitions to fit the {:.2f} GB limit".format(int(bufferSize), capacity, toGB(memoryLimit)))
+    return capacity
+
+
+class GetSessionMemory:
+    # bytes of a session's variables (weights, target copies and Adam slots) and, where tf.contrib.memory_stats runs on
+    # the device, the allocator's bytes in use and peak; on cpu every session of the process shares one allocator
+    def __init__(self):
+        self.allocatorOps = {}
+
+    def __call__(self, model):
+        import tensorflow as tf
+        graph = model.graph
+        variables = graph.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)
+        sessionMemory = {'variableBytes': int(sum(np.prod(variable.shape.as_list()) * variable.dtype.base_dtype.size for variable in variables))}
+        if graph not in self.allocatorOps:
+            memoryStats = getattr(getattr(tf, 'contrib', None), 'memory_stats', None)
+            with graph.as_default():
+                self.allocatorOps[graph] = None if memoryStats is None else [memoryStats.BytesInUse(), memoryStats.MaxBytesInUse()]
+        if self.allocatorOps[graph] is not None:
+            try:
+                sessionMemory['allocatorBytesInUse'], sessionMemory['allocatorMaxBytesInUse'] = model.run(self.allocatorOps[graph])
+            except tf.errors.OpError: # no kernel for this device
+                self.allocatorOps[graph] = None
+        return sessionMemory
+
+
+class ReportMemory:
+    def __init__(self, reportRate, getReplayBuffers, getCurrentModels, getSessionMemory):
+        self.reportRate = reportRate
+        self.getReplayBuffers = getReplayBuffers
+        self.getCurrentModels = getCurrentModels
+        self.getSessionMemory = getSessionMemory
+        self.epsNum = 0
+
+    def __call__(self):
+        self.epsNum += 1
+        if self.epsNum % self.reportRate == 0:
+            replayBuffers = self.getReplayBuffers()
+            numTransitions = sum(len(replayBuffer) for replayBuffer in replayBuffers)
+            transitionBytes = estimateTransitionBytes(replayBuffers[0]) if numTransitions > 0 else 0
+            sessionsMemory = [self.getSessionMemory(model) for model in self.getCurrentModels()]
+            toMB = lambda numBytes: numBytes / 2 ** 20
+            allocatorReport = "" if 'allocatorBytesInUse' not in sessionsMemory[0] else ", tf allocator in use / peak MB per session {}".format(
+                [(round(toMB(sessionMemory['allocatorBytesInUse'])), round(toMB(sessionMemory['allocatorMaxBytesInUse']))) for sessionMemory in sessionsMemory])
+            print("memory at episode {}: rss {:.2f} GB, replay {} transitions x {:.0f} bytes = {:.2f} GB, tf variables MB per session {}{}".format(
+                self.epsNum, getProcessRSS() / 2 ** 30, numTransitions, transitionBytes, numTransitions * transitionBytes / 2 ** 30,
+                [round(toMB(sessionMemory['variableBytes']), 1) for sessionMemory in sessionsMemory], allocatorReport))
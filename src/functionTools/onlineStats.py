@@ -0,0 +1,43 @@
+import numpy as np
+
+
+class OnlineMeanVariance:
+    # Welford's algorithm, so summary statistics need constant memory however many values are added
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.sumSquaredDiff = 0.0
+
+    def __call__(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.sumSquaredDiff += delta * (value - self.mean)
+
+    def getVariance(self, ddof = 0):
+        return self.sumSquaredDiff / (self.count - ddof) if self.count > ddof else np.nan
+
+    def getStandardError(self):
+        return np.sqrt(self.getVariance(ddof=1) / self.count) if self.count > 1 else np.nan
+
+
+class SampleUntilStandardError:
+    # samples chunks until the standard error is at most targetStandardError (0 = sample maxTrajectories). The target
+    # counts only from minTrajectories on, and only once the values differ: a first chunk without a single kill has a
+    # standard error of 0 that says nothing about rare kills
+    def __init__(self, sampleTrajKills, chunkSize, targetStandardError, maxTrajectories, minTrajectories = 100):
+        self.sampleTrajKills = sampleTrajKills
+        self.chunkSize = chunkSize
+        self.targetStandardError = targetStandardError
+        self.maxTrajectories = maxTrajectories
+        self.minTrajectories = minTrajectories
+
+    def __call__(self, trajKillsStats):
+        while trajKillsStats.count < self.maxTrajectories:
+            numTrajectories = min(self.chunkSize, self.maxTrajectories - trajKillsStats.count)
+            [trajKillsStats(trajKills) for trajKills in self.sampleTrajKills(numTrajectories)]
+            reachedTarget = self.targetStandardError > 0 and trajKillsStats.count >= self.minTrajectories and \
+                trajKillsStats.sumSquaredDiff > 0 and trajKillsStats.getStandardError() <= self.targetStandardError
+            if reachedTarget:
+                break
+        return trajKillsStats
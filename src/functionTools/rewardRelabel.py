@@ -0,0 +1,123 @@
+import json
+import os
+import numpy as np
+
+from src.environment.vectorizedEnv import BatchReshapeAction, BatchGetActionCost
+from src.functionTools.trajectoryStore import ColumnarTrajectories
+
+# The selfish index and the action cost only change how a predator's reward is computed from (state, action, nextState),
+# not the physics or which predator bites and kills. So stored transitions can be given the predator rewards of other
+# (selfish, cost) settings: the kill and bite events are recovered once from the recorded rewards, and the rewards of
+# every target setting are recomputed from them in one vectorized pass. Prey rewards do not depend on either setting.
+
+
+def getRelabeledRewardField(selfish, cost):
+    return "rewardsSelfish{}Cost{}".format(float(selfish), float(cost))
+
+
+def getKillRewardPercent(selfishIndex, predatorsPreyDistance, killerID, collisionMinDist):
+    # GetAgentsPercentageOfRewards for a batch of steps; selfish index > 100 gives the whole kill reward to the killer
+    if selfishIndex > 100:
+        return np.eye(predatorsPreyDistance.shape[-1])[killerID]
+    percentageRaw = (predatorsPreyDistance + 1 - collisionMinDist) ** (-selfishIndex)
+    return percentageRaw / np.sum(percentageRaw, axis=-1, keepdims=True)
+
+
+class GetRewardEvents:
+    # kills, killers and bite rewards of recorded steps, given the (selfish, cost) setting they were recorded under.
+    # Where the recorded rewards cannot tell the killer (kill reward shared by distance), it is drawn uniformly among
+    # the predators in contact, which is how the environment picks it.
+    def __init__(self, predatorsID, preyGroupID, entitiesSizeList, killReward, biteReward, sourceSelfish, sourceCost, seed = 0):
+        if len(preyGroupID) != 1:
+            raise ValueError("reward relabeling supports one prey, got {}".format(len(preyGroupID)))
+        self.predatorsID = list(predatorsID)
+        self.preyID = preyGroupID[0]
+        sizes = np.array(entitiesSizeList, dtype=np.float64)
+        self.collisionMinDist = sizes[self.predatorsID] + sizes[self.preyID]
+        self.killReward = killReward
+        self.biteReward = biteReward
+        self.sourceSelfish = sourceSelfish
+        self.getSourceActionCost = BatchGetActionCost(sourceCost, BatchReshapeAction())
+        self.randomState = np.random.RandomState(seed)
+
+    def __call__(self, nextStates, actions, rewards, isReset, isLastStep):
+        predatorsPos = nextStates[:, self.predatorsID, 0:2]
+        preyPos = nextStates[:, None, self.preyID, 0:2]
+        predatorsPreyDistance = np.sqrt(np.sum(np.square(predatorsPos - preyPos), axis=-1))
+        isContact = predatorsPreyDistance < self.collisionMinDist
+
+        eventRewards = rewards[:, self.predatorsID] + self.getSourceActionCost(actions[:, self.predatorsID])
+        # a kill resets the world, except on the last recorded step, where only the reward shows it
+        isKillByReward = np.abs(np.sum(eventRewards, axis=1) - self.biteReward * np.sum(isContact, axis=1)) > self.killReward / 2
+        isKill = np.where(isLastStep, isKillByReward, isReset)
+
+        if self.sourceSelfish > 100:
+            killerID = np.argmax(np.where(isContact, eventRewards, -np.inf), axis=1)
+        else:
+            killerID = np.argmax(np.where(isContact, self.randomState.uniform(size=isContact.shape), -1), axis=1)
+        sourceKillRewards = isKill[:, None] * self.killReward * \
+            getKillRewardPercent(self.sourceSelfish, predatorsPreyDistance, killerID, self.collisionMinDist[0])
+        return {'predatorsPreyDistance': predatorsPreyDistance, 'isKill': isKill, 'killerID': killerID,
+                'biteRewards': eventRewards - sourceKillRewards}
+
+
+class RelabelPredatorRewards:
+    def __init__(self, killReward, collisionMinDist):
+        self.killReward = killReward
+        self.collisionMinDist = collisionMinDist
+        self.reshapeAction = BatchReshapeAction()
+
+    def __call__(self, rewardEvents, predatorsActions, targetSettings):
+        # returns predator rewards of shape (numSettings, numSteps, numPredators), one row per (selfish, cost) setting
+        actionMagnitude = np.sqrt(np.sum(np.square(self.reshapeAction(predatorsActions)), axis=-1))
+        isKill = rewardEvents['isKill'][:, None]
+        getKillRewards = lambda selfish: isKill * self.killReward * getKillRewardPercent(
+            selfish, rewardEvents['predatorsPreyDistance'], rewardEvents['killerID'], self.collisionMinDist)
+        killRewards = {selfish: getKillRewards(selfish) for selfish in set(selfish for selfish, cost in targetSettings)}
+        return np.array([rewardEvents['biteRewards'] + killRewards[selfish] - cost * actionMagnitude for selfish, cost in targetSettings])
+
+
+def relabelColumnarTrajectories(path, env, condition, targetSettings, chunkSize = 100000, seed = 0):
+    # adds one rewards column per target (selfish, cost) setting next to the recorded one; open the store with
+    # ColumnarTrajectories(path, rewardField=getRelabeledRewardField(selfish, cost)) to read it
+    if condition['actionRepeat'] != 1:
+        # a step's reward then sums the action cost and bites of every substep up to a kill, which the stored final
+        # state of the step does not show
+        raise ValueError("reward relabeling needs trajectories recorded with action repeat 1, got {}".format(condition['actionRepeat']))
+    trajectories = ColumnarTrajectories(path)
+    columns = trajectories.columns
+    numSteps = len(columns['actions'])
+    isLastStep = np.zeros(numSteps, dtype=bool)
+    isLastStep[trajectories.episodeOffsets[1:] - 1] = True
+    # states are pooled, so the world was reset exactly where a step does not start from the previous nextState
+    isReset = np.zeros(numSteps, dtype=bool)
+    isReset[:-1] = np.asarray(columns['stateIndex'][1:]) != np.asarray(columns['nextStateIndex'][:-1])
+
+    predatorsID = env['predatorsID']
+    getRewardEvents = GetRewardEvents(predatorsID, env['preyGroupID'], env['entitiesSizeList'], condition['killReward'],
+                                      condition['biteReward'], condition['selfish'], condition['cost'], seed)
+    relabelPredatorRewards = RelabelPredatorRewards(condition['killReward'], getRewardEvents.collisionMinDist[0])
+
+    fields = [getRelabeledRewardField(selfish, cost) for selfish, cost in targetSettings]
+    rewardColumns = [np.lib.format.open_memmap(os.path.join(path, field + '.npy'), mode='w+', dtype=columns['rewards'].dtype,
+                                               shape=columns['rewards'].shape) for field in fields]
+    for chunkStart in range(0, numSteps, chunkSize):
+        chunk = slice(chunkStart, min(chunkStart + chunkSize, numSteps))
+        nextStates = np.asarray(columns['states'][columns['nextStateIndex'][chunk]], dtype=np.float64)
+        actions = np.asarray(columns['actions'][chunk], dtype=np.float64)
+        rewards = np.asarray(columns['rewards'][chunk], dtype=np.float64)
+        rewardEvents = getRewardEvents(nextStates, actions, rewards, isReset[chunk], isLastStep[chunk])
+        predatorsRewards = relabelPredatorRewards(rewardEvents, actions[:, predatorsID], targetSettings)
+        for rewardColumn, settingPredatorsRewards in zip(rewardColumns, predatorsRewards):
+            rewardColumn[chunk] = rewards
+            rewardColumn[chunk, predatorsID] = settingPredatorsRewards
+    [rewardColumn.flush() for rewardColumn in rewardColumns]
+    del rewardColumns
+
+    metaPath = os.path.join(path, 'meta.json')
+    meta = {**trajectories.meta}
+    meta['relabeledRewards'] = {**meta.get('relabeledRewards', {}), **{field: {'selfish': selfish, 'cost': cost}
+                                                                       for field, (selfish, cost) in zip(fields, targetSettings)}}
+    with open(metaPath, 'w') as metaFile:
+        json.dump(meta, metaFile)
+    return fields
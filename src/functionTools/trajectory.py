@@ -1,22 +1,27 @@
+from src.maddpg.rlTools.RLrun import SampleRepeatedStep
+
+
 class SampleTrajectory:
-    def __init__(self, maxRunningSteps, transit, isTerminal, rewardFunc, reset):
+    # with actionRepeat > 1 every yielded step holds one policy decision over that many physics steps
+    def __init__(self, maxRunningSteps, transit, isTerminal, rewardFunc, reset, actionRepeat = 1):
         self.maxRunningSteps = maxRunningSteps
         self.transit = transit
         self.isTerminal = isTerminal
         self.rewardFunc = rewardFunc
         self.reset = reset
+        self.sampleRepeatedStep = SampleRepeatedStep(transit, rewardFunc, isTerminal, actionRepeat)
 
     def __call__(self, policy):
+        trajectory = list(self.generate(policy))
+        return trajectory
+
+    def generate(self, policy):
         state = self.reset()
-        trajectory = []
 
         for runningStep in range(self.maxRunningSteps):
             action = policy(state)
-            nextState = self.transit(state, action)
-            reward = self.rewardFunc(state, action, nextState)
-            trajectory.append((state, action, reward, nextState))
+            reward, nextState = self.sampleRepeatedStep(state, action)
+            yield (state, action, reward, nextState)
             state = nextState
             if self.isTerminal(state):
                 state = self.reset()
-
-        return trajectory
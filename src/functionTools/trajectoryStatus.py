@@ -0,0 +1,60 @@
+import numpy as np
+
+noContactStatus, biteStatus, killStatus = 0, 1, 2
+stateIDInTraj, nextStateIDInTraj = 0, 3
+
+
+def getTrajectoryStateArrays(trajectory):
+    states = np.array([timeStep[stateIDInTraj] for timeStep in trajectory])
+    nextStates = np.array([timeStep[nextStateIDInTraj] for timeStep in trajectory])
+    return states, nextStates
+
+
+class GetTrajectoryStatus:
+    # status of every agent at every step of one trajectory, shape (numSteps, numAgents):
+    # a predator touching a prey in nextState bites, and kills if the world was reset after that step;
+    # a prey touched by a predator is bitten or killed in the same way. As with CheckStatus, a kill on the
+    # last step cannot be told from the states alone and shows as a bite.
+    def __init__(self, predatorsID, preyGroupID, entitiesSizeList):
+        self.predatorsID = list(predatorsID)
+        self.preyGroupID = list(preyGroupID)
+        self.numAgents = len(self.predatorsID) + len(self.preyGroupID)
+        sizes = np.array(entitiesSizeList, dtype=np.float64)
+        self.collisionMinDist = sizes[self.predatorsID][:, None] + sizes[self.preyGroupID][None, :]
+
+    def __call__(self, states, nextStates):
+        states = np.asarray(states)
+        nextStates = np.asarray(nextStates)
+        predatorsPos = nextStates[:, self.predatorsID, 0:2]
+        preyPos = nextStates[:, self.preyGroupID, 0:2]
+        dist = np.sqrt(np.sum(np.square(predatorsPos[:, :, None, :] - preyPos[:, None, :, :]), axis=-1))
+        isContact = dist < self.collisionMinDist
+
+        isReset = np.zeros(len(states), dtype=bool)
+        isReset[:-1] = np.any(states[1:] != nextStates[:-1], axis=(1, 2))
+
+        status = np.full((len(states), self.numAgents), noContactStatus, dtype=np.int8)
+        contactStatus = np.where(isReset, killStatus, biteStatus)[:, None]
+        status[:, self.predatorsID] = np.where(np.any(isContact, axis=2), contactStatus, noContactStatus)
+        status[:, self.preyGroupID] = np.where(np.any(isContact, axis=1), contactStatus, noContactStatus)
+        return status
+
+
+def getStatusLabels(status, predatorsID):
+    # per-step agentsStatus lists in the form DrawState expects; predators in contact are always drawn as 'bite'
+    preyLabels = np.array([0, 'bite', 'kill'], dtype=object)
+    predatorLabels = np.array([0, 'bite', 'bite'], dtype=object)
+    labels = preyLabels[status]
+    labels[:, list(predatorsID)] = predatorLabels[status[:, list(predatorsID)]]
+    return labels.tolist()
+
+
+class CountTrajectoryContacts:
+    def __init__(self, getTrajectoryStatus):
+        self.getTrajectoryStatus = getTrajectoryStatus
+
+    def __call__(self, states, nextStates):
+        status = self.getTrajectoryStatus(states, nextStates)
+        biteSteps = np.sum(status == biteStatus, axis=0)
+        killSteps = np.sum(status == killStatus, axis=0)
+        return biteSteps, killSteps
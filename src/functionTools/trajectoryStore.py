@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import numpy as np
+
+from src.functionTools.loadSaveModel import loadFromPickle
+
+stateIDInTraj, actionIDInTraj, rewardIDInTraj, nextStateIDInTraj = 0, 1, 2, 3
+floatFields = ['states', 'actions', 'rewards']
+indexFields = ['stateIndex', 'nextStateIndex']
+
+
+class WriteColumnarTrajectories:
+    # states are pooled: a step's state is only stored when it differs from the previous nextState (trajectory start or
+    # reset after a kill); steps point into the pool through stateIndex / nextStateIndex. The store is written into a
+    # temporary directory that replaces path on close, so no column or relabeled rewards of an earlier store survive
+    def __init__(self, path, float16 = False):
+        self.path = path
+        self.writePath = path.rstrip(os.sep) + '.writing' + str(os.getpid())
+        self.floatDtype = np.float16 if float16 else np.float64
+        if os.path.exists(self.writePath):
+            shutil.rmtree(self.writePath)
+        os.makedirs(self.writePath)
+        self.rawFiles = {field: open(self.getRawPath(field), 'wb') for field in floatFields + indexFields}
+        self.rowShapes = {}
+        self.numRows = {field: 0 for field in floatFields + indexFields}
+        self.episodeOffsets = [0]
+        self.previousNextState = None
+
+    def getRawPath(self, field):
+        return os.path.join(self.writePath, field + '.raw')
+
+    def writeRows(self, field, rows):
+        dtype = np.int64 if field in indexFields else self.floatDtype
+        rows = np.asarray(rows, dtype=dtype)
+        self.rowShapes.setdefault(field, rows.shape[1:])
+        self.rawFiles[field].write(rows.tobytes())
+        self.numRows[field] += len(rows)
+
+    def appendStep(self, timeStep):
+        state = np.asarray(timeStep[stateIDInTraj])
+        if self.previousNextState is None or not np.array_equal(state, self.previousNextState):
+            self.writeRows('states', [state])
+        self.writeRows('stateIndex', [self.numRows['states'] - 1])
+        self.previousNextState = np.asarray(timeStep[nextStateIDInTraj])
+        self.writeRows('states', [self.previousNextState])
+        self.writeRows('nextStateIndex', [self.numRows['states'] - 1])
+        self.writeRows('actions', [timeStep[actionIDInTraj]])
+        self.writeRows('rewards', [timeStep[rewardIDInTraj]])
+
+    def endTrajectory(self):
+        self.previousNextState = None
+        self.episodeOffsets.append(self.numRows['actions'])
+
+    def __call__(self, trajectory):
+        [self.appendStep(timeStep) for timeStep in trajectory]
+        self.endTrajectory()
+
+    def close(self):
+        for field, rawFile in self.rawFiles.items():
+            rawFile.close()
+            dtype = np.int64 if field in indexFields else self.floatDtype
+            shape = (self.numRows[field],) + tuple(self.rowShapes.get(field, ()))
+            column = np.lib.format.open_memmap(os.path.join(self.writePath, field + '.npy'), mode='w+', dtype=dtype, shape=shape)
+            if self.numRows[field] > 0:
+                column[:] = np.memmap(self.getRawPath(field), dtype=dtype, mode='r', shape=shape)
+            column.flush()
+            del column
+            os.remove(self.getRawPath(field))
+
+        np.save(os.path.join(self.writePath, 'episodeOffsets.npy'), np.array(self.episodeOffsets, dtype=np.int64))
+        meta = {'version': 1, 'numEpisodes': len(self.episodeOffsets) - 1, 'floatDtype': np.dtype(self.floatDtype).name}
+        with open(os.path.join(self.writePath, 'meta.json'), 'w') as metaFile:
+            json.dump(meta, metaFile)
+
+        # a directory cannot be renamed over a non-empty one, so the earlier store is moved aside first
+        replacedPath = self.writePath + '.replaced'
+        if os.path.exists(self.path):
+            os.rename(self.path, replacedPath)
+        os.rename(self.writePath, self.path)
+        if os.path.exists(replacedPath):
+            shutil.rmtree(replacedPath)
+
+
+def saveColumnarTrajectories(trajList, path, float16 = False):
+    writeColumnarTrajectories = WriteColumnarTrajectories(path, float16)
+    [writeColumnarTrajectories(trajectory) for trajectory in trajList]
+    writeColumnarTrajectories.close()
+
+
+def convertPickledTrajectories(picklePath, path, float16 = False):
+    saveColumnarTrajectories(loadFromPickle(picklePath), path, float16)
+
+
+class ColumnarTrajectories:
+    # columns are memory-mapped (mmapMode), so only the episodes accessed are read from disk; rewardField selects
+    # another rewards column of the same steps, e.g. one written by rewardRelabel.py
+    def __init__(self, path, mmapMode = 'r', rewardField = 'rewards'):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as metaFile:
+            self.meta = json.load(metaFile)
+        loadColumn = lambda field: np.load(os.path.join(path, field + '.npy'), mmap_mode=mmapMode)
+        self.columns = {field: loadColumn(field) for field in floatFields + indexFields + ['episodeOffsets']}
+        if rewardField != 'rewards':
+            self.columns['rewards'] = loadColumn(rewardField)
+        self.episodeOffsets = self.columns['episodeOffsets']
+
+    def __len__(self):
+        return len(self.episodeOffsets) - 1
+
+    def getEpisodeArrays(self, episodeID):
+        stepSlice = slice(self.episodeOffsets[episodeID], self.episodeOffsets[episodeID + 1])
+        states = self.columns['states']
+        episodeArrays = {'states': states[self.columns['stateIndex'][stepSlice]],
+                         'actions': np.asarray(self.columns['actions'][stepSlice]),
+                         'rewards': np.asarray(self.columns['rewards'][stepSlice]),
+                         'nextStates': states[self.columns['nextStateIndex'][stepSlice]]}
+        return episodeArrays
+
+    def __getitem__(self, episodeID):
+        episodeArrays = self.getEpisodeArrays(episodeID)
+        trajectory = list(zip(episodeArrays['states'], episodeArrays['actions'], episodeArrays['rewards'], episodeArrays['nextStates']))
+        return trajectory
+
+    def __iter__(self):
+        return (self[episodeID] for episodeID in range(len(self)))
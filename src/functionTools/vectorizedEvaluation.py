@@ -0,0 +1,51 @@
+import time
+import numpy as np
+
+from src.maddpg.rlTools.RLrun import SampleRepeatedBatchStep
+
+
+class SampleTrajKillsInLockstep:
+    def __init__(self, maxRunningSteps, batchReset, batchTransit, batchRewardFunc, predatorsID, killReward, actionRepeat = 1):
+        self.maxRunningSteps = maxRunningSteps
+        self.batchReset = batchReset
+        self.sampleRepeatedBatchStep = SampleRepeatedBatchStep(batchTransit, batchRewardFunc, actionRepeat)
+        self.predatorsID = predatorsID
+        self.killReward = killReward
+
+    def __call__(self, batchPolicy, numWorlds):
+        states = self.batchReset(numWorlds)
+        trajKills = np.zeros(numWorlds)
+
+        for runningStep in range(self.maxRunningSteps):
+            actions = batchPolicy(states)
+            (rewards, terminal), nextStates = self.sampleRepeatedBatchStep(states, actions)
+            trajKills += np.sum(rewards[:, self.predatorsID], axis=1) / self.killReward
+            states = nextStates
+            if np.any(terminal):
+                states[terminal] = self.batchReset(int(np.sum(terminal)))
+
+        return trajKills
+
+
+class EvaluateTrajKillsInLockstep:
+    def __init__(self, sampleTrajKillsInLockstep, numWorlds):
+        self.sampleTrajKillsInLockstep = sampleTrajKillsInLockstep
+        self.numWorlds = numWorlds
+
+    def sampleTrajKills(self, batchPolicy, numTrajectories):
+        trajKillsChunks = []
+        numSampled = 0
+        while numSampled < numTrajectories:
+            numWorlds = min(self.numWorlds, numTrajectories - numSampled)
+            trajKillsChunks.append(self.sampleTrajKillsInLockstep(batchPolicy, numWorlds))
+            numSampled += numWorlds
+        return np.concatenate(trajKillsChunks)
+
+    def __call__(self, batchPolicy, numTrajectories):
+        startTime = time.perf_counter()
+        trajKills = self.sampleTrajKills(batchPolicy, numTrajectories)
+        elapsed = time.perf_counter() - startTime
+
+        meanTrajKill = np.mean(trajKills)
+        seTrajKill = np.std(trajKills) / np.sqrt(len(trajKills) - 1)
+        return trajKills, meanTrajKill, seTrajKill, numTrajectories / elapsed
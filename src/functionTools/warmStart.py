@@ -0,0 +1,74 @@
+import numpy as np
+
+from src.maddpg.rlTools.RLrun import SampleRepeatedBatchStep
+from src.functionTools.trajectoryStore import ColumnarTrajectories
+from src.functionTools.rewardRelabel import getRelabeledRewardField
+
+# Replay buffer warm-up data: columnar trajectory stores, either written by evaluate.py or generated here with a
+# scripted chaser, turned into (observation, action, reward, nextObservation) transitions with observations rebuilt
+# from the stored states in batch, so any observation mode can use the same store.
+
+
+class BatchChasePolicy:
+    # every predator puts chaseWeight of its action on moving straight at the prey, the rest of its action and the
+    # prey's action are random, as SampleChasingAction in goldenTrajectory.py does for one world
+    def __init__(self, predatorsID, preyID, numAgents, actionDim, chaseWeight = 0.7, seed = None):
+        self.predatorsID = list(predatorsID)
+        self.preyID = preyID
+        self.numAgents = numAgents
+        self.actionDim = actionDim
+        self.chaseWeight = chaseWeight
+        self.randomState = np.random.RandomState(seed)
+
+    def __call__(self, states):
+        numWorlds = len(states)
+        actions = self.randomState.dirichlet(np.ones(self.actionDim), size=(numWorlds, self.numAgents))
+        direction = states[:, None, self.preyID, 0:2] - states[:, self.predatorsID, 0:2]
+        chaseActions = np.stack([np.zeros(direction.shape[:2]), np.maximum(direction[..., 0], 0), np.maximum(-direction[..., 0], 0),
+                                 np.maximum(direction[..., 1], 0), np.maximum(-direction[..., 1], 0)], axis=-1)
+        chaseActions = chaseActions / (np.sum(chaseActions, axis=-1, keepdims=True) + 1e-8)
+        actions[:, self.predatorsID] = self.chaseWeight * chaseActions + (1 - self.chaseWeight) * actions[:, self.predatorsID]
+        return actions
+
+
+class WriteScriptedTrajectories:
+    # numWorlds trajectories of maxRunningSteps decisions in lockstep; a world is reset in place after a kill, as in
+    # SampleTrajectory, so the store looks like one evaluate.py writes
+    def __init__(self, batchReset, batchTransit, batchRewardFunc, batchPolicy, maxRunningSteps, actionRepeat = 1):
+        self.batchReset = batchReset
+        self.sampleRepeatedBatchStep = SampleRepeatedBatchStep(batchTransit, batchRewardFunc, actionRepeat)
+        self.batchPolicy = batchPolicy
+        self.maxRunningSteps = maxRunningSteps
+
+    def __call__(self, numWorlds, writeTrajectories):
+        states = self.batchReset(numWorlds)
+        steps = []
+        for runningStep in range(self.maxRunningSteps):
+            actions = self.batchPolicy(states)
+            (rewards, terminal), nextStates = self.sampleRepeatedBatchStep(states, actions)
+            steps.append((states, actions, rewards, nextStates.copy()))
+            states = nextStates
+            if np.any(terminal):
+                states[terminal] = self.batchReset(int(np.sum(terminal)))
+        [writeTrajectories([tuple(field[worldID] for field in step) for step in steps]) for worldID in range(numWorlds)]
+
+
+def getWarmStartRewardField(trajectories, selfish, cost):
+    # a store relabeled for this run's reward setting (rewardRelabel.py) is read through that column
+    relabeledField = getRelabeledRewardField(selfish, cost)
+    return relabeledField if relabeledField in trajectories.meta.get('relabeledRewards', {}) else 'rewards'
+
+
+def getReplayTransitions(trajectoryPath, batchObserve, maxTransitions, selfish, cost):
+    trajectories = ColumnarTrajectories(trajectoryPath)
+    trajectories = ColumnarTrajectories(trajectoryPath, rewardField=getWarmStartRewardField(trajectories, selfish, cost))
+    columns = trajectories.columns
+    numTransitions = min(len(columns['actions']), maxTransitions)
+
+    observeStates = lambda indexField: batchObserve(np.asarray(columns['states'][columns[indexField][:numTransitions]], dtype=np.float64))
+    allAgentsObservations, allAgentsNextObservations = observeStates('stateIndex'), observeStates('nextStateIndex')
+    actions = np.asarray(columns['actions'][:numTransitions], dtype=np.float64)
+    rewards = np.asarray(columns['rewards'][:numTransitions], dtype=np.float64)
+    getAgentsRow = lambda allAgentsRows, step: [agentRows[step] for agentRows in allAgentsRows]
+    return [(getAgentsRow(allAgentsObservations, step), list(actions[step]), list(rewards[step]), getAgentsRow(allAgentsNextObservations, step))
+            for step in range(numTransitions)]
@@ -1,25 +1,27 @@
 import numpy as np
 import random
 import os
+import time
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 from collections import deque
 
 
 class UpdateParameters:
-    def __init__(self, paramUpdateInterval, tau = None):
+    def __init__(self, paramUpdateInterval, tau = None, traceRun = None):
         self.paramUpdateInterval = paramUpdateInterval
         self.tau = tau
+        self.traceRun = traceRun
         self.runTime = 0
 
     def __call__(self, model):
         if self.runTime % self.paramUpdateInterval == 0:
             graph = model.graph
             updateParam_ = graph.get_collection_ref("updateParam_")[0]
-            if self.tau is not None:
-                tau_ = graph.get_collection_ref("tau_")[0]
-                model.run(updateParam_, feed_dict={tau_: self.tau})
+            feedDict = {graph.get_collection_ref("tau_")[0]: self.tau} if self.tau is not None else None
+            if self.traceRun is not None:
+                self.traceRun(model, 'updateParameters', updateParam_, feedDict)
             else:
-                model.run(updateParam_)
+                model.run(updateParam_, feed_dict=feedDict)
         self.runTime += 1
 
         return model
@@ -37,6 +39,53 @@ class SampleOneStep:
         return reward, nextState
 
 
+class SampleRepeatedStep:
+    # action repeat: the action is held for actionRepeat physics steps whose rewards are summed into one transition;
+    # a terminal state (kill) ends the repeat early. actionRepeat = 1 is SampleOneStep
+    def __init__(self, transit, getReward, isTerminal, actionRepeat):
+        self.transit = transit
+        self.getReward = getReward
+        self.isTerminal = isTerminal
+        self.actionRepeat = actionRepeat
+
+    def __call__(self, state, action):
+        nextState = self.transit(state, action)
+        reward = self.getReward(state, action, nextState)
+        for substep in range(1, self.actionRepeat):
+            if self.isTerminal(nextState):
+                break
+            state = nextState
+            nextState = self.transit(state, action)
+            reward = list(np.add(reward, self.getReward(state, action, nextState)))
+
+        return reward, nextState
+
+
+class SampleRepeatedBatchStep:
+    # SampleRepeatedStep for the batched environment, whose reward function also returns the terminal flag of every
+    # world; worlds that reached a terminal state stop stepping while the others finish the repeat
+    def __init__(self, batchTransit, batchRewardFunc, actionRepeat):
+        self.batchTransit = batchTransit
+        self.batchRewardFunc = batchRewardFunc
+        self.actionRepeat = actionRepeat
+
+    def __call__(self, states, actions):
+        nextStates = self.batchTransit(states, actions)
+        rewards, terminal = self.batchRewardFunc(states, actions, nextStates)
+        for substep in range(1, self.actionRepeat):
+            isRunning = ~terminal
+            if not np.any(isRunning):
+                break
+            runningStates, runningActions = nextStates[isRunning], actions[isRunning]
+            runningNextStates = self.batchTransit(runningStates, runningActions)
+            runningRewards, runningTerminal = self.batchRewardFunc(runningStates, runningActions, runningNextStates)
+            nextStates[isRunning] = runningNextStates
+            rewards[isRunning] += runningRewards
+            terminal[isRunning] = runningTerminal
+
+        return (rewards, terminal), nextStates
+
+
 class SampleFromMemory:
     def __init__(self, minibatchSize):
         self.minibatchSize = minibatchSize
@@ -48,6 +97,21 @@ class SampleFromMemory:
         return sample
 
 
+class SampleEnsembleFromMemory:
+    # one replay buffer per seed, sampled independently; returns per-agent arrays of shape (numSeeds, minibatchSize, dim)
+    # and rewards of shape (numSeeds, minibatchSize, numAgents)
+    def __init__(self, sampleFromMemory):
+        self.sampleFromMemory = sampleFromMemory
+
+    def __call__(self, memoryBuffers):
+        seedsBatches = [list(zip(*self.sampleFromMemory(memoryBuffer))) for memoryBuffer in memoryBuffers]
+        numAgents = len(seedsBatches[0][0][0])
+        getAgentsArrays = lambda field: [np.array([[transitionField[agentID] for transitionField in seedBatch[field]] for seedBatch in seedsBatches])
+                                         for agentID in range(numAgents)]
+        rewards = np.array([seedBatch[2] for seedBatch in seedsBatches])
+        return getAgentsArrays(0), getAgentsArrays(1), rewards, getAgentsArrays(3)
+
+
 class RunTimeStep:
     def __init__(self, actOneStep, sampleOneStep, learnFromBuffer, observe = None):
         self.actOneStep = actOneStep
@@ -74,6 +138,30 @@ class RunTimeStep:
         return reward, nextState, replayBuffer
 
 
+class RunLockstepTimeStep:
+    # one world per seed of an ensemble, advanced together with the batched environment; each seed appends its own
+    # transitions to its own buffer. Episode ends and resets of the worlds are left to RunLockstepAlgorithm
+    def __init__(self, actOneStep, sampleOneStep, learnFromBuffer, observe):
+        self.actOneStep = actOneStep
+        self.sampleOneStep = sampleOneStep
+        self.learnFromBuffer = learnFromBuffer
+        self.observe = observe
+        self.runTime = 0
+
+    def __call__(self, states, replayBuffers):
+        observations = self.observe(states)
+        actions = self.actOneStep(observations, self.runTime)
+        (rewards, terminal), nextStates = self.sampleOneStep(states, np.stack(actions, axis=1))
+        nextObservations = self.observe(nextStates)
+        for seed, replayBuffer in enumerate(replayBuffers):
+            replayBuffer.append(([agentObs[seed] for agentObs in observations], [agentAction[seed] for agentAction in actions],
+                                 rewards[seed], [agentObs[seed] for agentObs in nextObservations]))
+
+        self.learnFromBuffer(replayBuffers, self.runTime)
+        self.runTime += 1
+        return (rewards, terminal), nextStates, replayBuffers
+
+
 class StartLearn:
     def __init__(self, learningStartBufferSize, learnInterval):
         self.learningStartBufferSize = learningStartBufferSize
@@ -124,19 +212,116 @@ class SaveModel:
         self.epsNum += 1
         if self.epsNum % self.modelSaveRate == 0:
             modelSavePathToUse = self.modelSavePath + str(self.epsNum) + "eps" if self.saveAllmodels else self.modelSavePath
+            self.save(modelSavePathToUse)
+
+    def save(self, modelSavePath):
+        model = self.getCurrentModel()
+        with model.as_default():
+            self.saveVariables(model, modelSavePath)
+
+
+class SaveActorSnapshot:
+    def __init__(self, snapshotRate, saveActorWeights, getCurrentModel, snapshotSavePath, metadata, float16 = False):
+        self.snapshotRate = snapshotRate
+        self.saveActorWeights = saveActorWeights
+        self.getCurrentModel = getCurrentModel
+        self.snapshotSavePath = snapshotSavePath
+        self.metadata = metadata
+        self.float16 = float16
+        self.epsNum = 0
+
+    def __call__(self):
+        self.epsNum += 1
+        if self.epsNum % self.snapshotRate == 0:
             model = self.getCurrentModel()
-            with model.as_default():
-                self.saveVariables(model, modelSavePathToUse)
+            snapshotPath = self.snapshotSavePath + str(self.epsNum) + "eps.npz"
+            self.saveActorWeights(model, snapshotPath, {**self.metadata, 'episode': self.epsNum}, self.float16)
+
+
+class TrackEpisodeRewards:
+    # runEpisode that also keeps every episode's reward per agent, for hooks reporting recent training reward
+    def __init__(self, runEpisode):
+        self.runEpisode = runEpisode
+        self.episodeRewards = []
+
+    def __call__(self, replayBuffer):
+        replayBuffer, episodeReward = self.runEpisode(replayBuffer)
+        self.episodeRewards.append(episodeReward)
+        return replayBuffer, episodeReward
+
+    def getMeanEpisodeReward(self, numLastEpisodes):
+        return np.mean(self.episodeRewards[-numLastEpisodes:], axis=0)
+
+
+class SendActorWeights:
+    # every evaluationRate episodes, puts the episode, the mean reward per agent over those episodes and the actor
+    # weights of all agents on a queue read by a background evaluator
+    def __init__(self, evaluationRate, getActorWeights, getCurrentModels, getMeanEpisodeReward, weightsQueue):
+        self.evaluationRate = evaluationRate
+        self.getActorWeights = getActorWeights
+        self.getCurrentModels = getCurrentModels
+        self.getMeanEpisodeReward = getMeanEpisodeReward
+        self.weightsQueue = weightsQueue
+        self.epsNum = 0
+
+    def __call__(self):
+        self.epsNum += 1
+        if self.epsNum % self.evaluationRate == 0:
+            allAgentsActorWeights = [self.getActorWeights(model) for model in self.getCurrentModels()]
+            self.weightsQueue.put((self.epsNum, self.getMeanEpisodeReward(self.evaluationRate), allAgentsActorWeights))
+
+
+class StopTraining:
+    # called with every episode's reward; stops once the metric averaged over windows of windowSize episodes has not
+    # beaten the best window by more than tolerance for patience windows in a row (not before minEpisodes), or once the
+    # wall-clock or CPU time since construction reaches its budget in seconds (None = no budget)
+    def __init__(self, getEpisodeMetric, windowSize, tolerance, patience, minEpisodes = 0, wallClockBudget = None, cpuTimeBudget = None):
+        self.getEpisodeMetric = getEpisodeMetric
+        self.windowSize = windowSize
+        self.tolerance = tolerance
+        self.patience = patience
+        self.minEpisodes = minEpisodes
+        self.wallClockBudget = wallClockBudget
+        self.cpuTimeBudget = cpuTimeBudget
+        self.startTime = time.time()
+        self.startCpuTime = time.process_time()
+        self.windowMetrics = []
+        self.bestWindowMetric = -np.inf
+        self.numWindowsWithoutImprovement = 0
+        self.numEpisodes = 0
+        self.stopReason = None
+
+    def __call__(self, episodeReward):
+        self.numEpisodes += 1
+        if self.getEpisodeMetric is not None:
+            self.windowMetrics.append(self.getEpisodeMetric(episodeReward))
+            if len(self.windowMetrics) == self.windowSize:
+                windowMetric = np.mean(self.windowMetrics)
+                self.windowMetrics = []
+                if windowMetric > self.bestWindowMetric + self.tolerance:
+                    self.numWindowsWithoutImprovement = 0
+                else:
+                    self.numWindowsWithoutImprovement += 1
+                self.bestWindowMetric = max(self.bestWindowMetric, windowMetric)
+                if self.numWindowsWithoutImprovement >= self.patience and self.numEpisodes >= self.minEpisodes:
+                    self.stopReason = "windowed metric {:.4f} within {} of the best for {} windows".format(
+                        windowMetric, self.tolerance, self.numWindowsWithoutImprovement)
+        if self.wallClockBudget is not None and time.time() - self.startTime >= self.wallClockBudget:
+            self.stopReason = "wall-clock budget of {}s spent".format(self.wallClockBudget)
+        if self.cpuTimeBudget is not None and time.process_time() - self.startCpuTime >= self.cpuTimeBudget:
+            self.stopReason = "cpu time budget of {}s spent".format(self.cpuTimeBudget)
+        return self.stopReason is not None
 
 
 class RunAlgorithm:
-    def __init__(self, runEpisode, maxEpisode, saveModels, numAgents = 1, printEpsFrequency = 1000):
+    def __init__(self, runEpisode, maxEpisode, saveModels, numAgents = 1, printEpsFrequency = 1000, stopTraining = None):
         self.runEpisode = runEpisode
         self.maxEpisode = maxEpisode
         self.saveModels = saveModels
         self.numAgents = numAgents
         self.printEpsFrequency = printEpsFrequency
         self.multiAgent = (self.numAgents > 1)
+        self.stopTraining = stopTraining
 
     def __call__(self, replayBuffer):
         episodeRewardList = []
@@ -160,6 +345,67 @@ class RunAlgorithm:
                 episodeRewardList.append(episodeReward)
                 print('episode {}: mean eps reward {}'.format(len(episodeRewardList), np.mean(episodeRewardList)))
 
+            if self.stopTraining is not None and self.stopTraining(episodeReward):
+                print("training stopped after {} episodes: {}".format(episodeID + 1, self.stopTraining.stopReason))
+                break
+
         return episodeRewardList
 
 
+class RunLockstepAlgorithm:
+    # RunEpisode and RunAlgorithm for the worlds of an ensemble: each seed plays its own episodes, ended by a kill or
+    # maxTimeStep decision steps as in single-seed training, and a world is reset when its episode ends. Every seed
+    # counts its episodes and runs its hooks and its stopTraining after each of them; a seed is done after maxEpisode
+    # episodes or once stopped, when finishSeed(seed, numEpisodes, isStopped) runs. Done seeds keep stepping (the
+    # learner trains all seeds at once) but run no more hooks, and training ends when all seeds are done
+    def __init__(self, batchReset, runTimeStep, maxTimeStep, maxEpisode, seedsSaveModels, seedsStopTraining = None, finishSeed = None,
+                 printEpsFrequency = 1000):
+        self.batchReset = batchReset
+        self.runTimeStep = runTimeStep
+        self.maxTimeStep = maxTimeStep
+        self.maxEpisode = maxEpisode
+        self.seedsSaveModels = seedsSaveModels
+        self.seedsStopTraining = seedsStopTraining
+        self.finishSeed = finishSeed
+        self.printEpsFrequency = printEpsFrequency
+
+    def __call__(self, replayBuffers):
+        numSeeds = len(replayBuffers)
+        seedsEpisodeRewardList = [list() for seed in range(numSeeds)]
+        isDone = np.zeros(numSeeds, dtype=bool)
+        states = self.batchReset(numSeeds)
+        timeSteps = np.zeros(numSeeds, dtype=int)
+        episodeRewards = 0
+
+        while not np.all(isDone):
+            (rewards, terminal), states, replayBuffers = self.runTimeStep(states, replayBuffers)
+            timeSteps += 1
+            episodeRewards = episodeRewards + np.array(rewards)
+            # RunEpisode does not check the state after the first step of an episode
+            episodeEnd = (terminal & (timeSteps > 1)) | (timeSteps >= self.maxTimeStep)
+            for seed in np.flatnonzero(episodeEnd & ~isDone):
+                isDone[seed] = self.endEpisode(seed, episodeRewards[seed].copy(), seedsEpisodeRewardList[seed])
+            if np.any(episodeEnd):
+                states[episodeEnd] = self.batchReset(int(np.sum(episodeEnd)))
+                timeSteps[episodeEnd] = 0
+                episodeRewards[episodeEnd] = 0
+
+        return seedsEpisodeRewardList
+
+    def endEpisode(self, seed, episodeReward, episodeRewardList):
+        episodeRewardList.append(np.sum(episodeReward))
+        [saveModel() for saveModel in self.seedsSaveModels[seed]]
+        numEpisodes = len(episodeRewardList)
+        if (numEpisodes - 1) % self.printEpsFrequency == 0:
+            print("seed {} episodes: {}, last {} eps mean episode reward: {}".format(
+                seed, numEpisodes - 1, self.printEpsFrequency, np.mean(episodeRewardList[-self.printEpsFrequency:])))
+
+        stopTraining = None if self.seedsStopTraining is None else self.seedsStopTraining[seed]
+        isStopped = stopTraining is not None and stopTraining(episodeReward)
+        if isStopped:
+            print("seed {} training stopped after {} episodes: {}".format(seed, numEpisodes, stopTraining.stopReason))
+        if not isStopped and numEpisodes < self.maxEpisode:
+            return False
+        if self.finishSeed is not None:
+            self.finishSeed(seed, numEpisodes, isStopped)
+        return True
@@ -136,15 +136,20 @@ def huber_loss(x, delta=1.0):
 # ================================================================
 
 
-def minimize_and_clip(optimizer, objective, var_list, clip_val=10):
+def minimize_and_clip(optimizer, objective, var_list, clip_val=10, norm_collection=None):
     """Minimized `objective` using `optimizer` w.r.t. variables in
     `var_list` while ensure the norm of the gradients for each
-    variable is clipped to `clip_val`
+    variable is clipped to `clip_val`. If `norm_collection` is given,
+    the global norm of the unclipped gradients is added to that collection.
     """    
-    if clip_val is None:
+    if clip_val is None and norm_collection is None:
         return optimizer.minimize(objective, var_list=var_list)
     else:
         gradients = optimizer.compute_gradients(objective, var_list=var_list)
+        if norm_collection is not None:
+            tf.add_to_collection(norm_collection, tf.global_norm([grad for grad, var in gradients if grad is not None]))
+        if clip_val is None:
+            return optimizer.apply_gradients(gradients)
         for i, (grad, var) in enumerate(gradients):
             if grad is not None:
                 gradients[i] = (tf.clip_by_norm(grad, clip_val), var)
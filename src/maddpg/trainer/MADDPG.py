@@ -1,20 +1,141 @@
 import tensorflow as tf
 import numpy as np
+import hashlib
+import json
 import os
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 import tensorflow.contrib.layers as layers
+from tensorflow.python.client import timeline
 import src.maddpg.rlTools.tf_util as U
 
 
+def getObjectName(graphObject):
+    return [getObjectName(item) for item in graphObject] if isinstance(graphObject, (list, tuple)) else graphObject.name
+
+
+def exportGraphToCache(graph, graphCachePath):
+    # collections holding python lists (e.g. allAgentsStates_) or savers are not serializable by export_meta_graph,
+    # so every custom collection is also stored by name and re-registered on import
+    standardKeys = {getattr(tf.GraphKeys, key) for key in dir(tf.GraphKeys) if key.isupper() and not key.startswith('_')}
+    customCollections = {key: [getObjectName(item) for item in graph.get_collection(key)]
+                         for key in graph.get_all_collection_keys() if key not in standardKeys and key != "saver"}
+    saver = graph.get_collection("saver")[0]
+
+    temporaryPath = graphCachePath + '.' + str(os.getpid())
+    with open(temporaryPath + '.json', 'w') as collectionsFile:
+        json.dump(customCollections, collectionsFile)
+    standardCollections = [key for key in graph.get_all_collection_keys() if key in standardKeys]
+    tf.train.export_meta_graph(filename=temporaryPath + '.meta', graph=graph, saver_def=saver.saver_def, collection_list=standardCollections)
+    os.replace(temporaryPath + '.json', graphCachePath + '.json')
+    os.replace(temporaryPath + '.meta', graphCachePath + '.meta')
+
+
+def importGraphFromCache(graphCachePath):
+    with open(graphCachePath + '.json') as collectionsFile:
+        customCollections = json.load(collectionsFile)
+
+    graph = tf.Graph()
+    with graph.as_default():
+        saver = tf.train.import_meta_graph(graphCachePath + '.meta')
+        variablesByName = {variable.name: variable for variable in tf.global_variables()}
+        getObject = lambda name: [getObject(item) for item in name] if isinstance(name, list) else \
+            variablesByName[name] if name in variablesByName else graph.as_graph_element(name)
+        for key, names in customCollections.items():
+            graph.clear_collection(key)
+            [tf.add_to_collection(key, getObject(name)) for name in names]
+        tf.add_to_collection("saver", saver)
+    return graph
+
+
 class BuildMADDPGModels:
-    def __init__(self, actionDim, numAgents, obsShapeList, actionRange = 1):
+    def __init__(self, actionDim, numAgents, obsShapeList, actionRange = 1, graphCacheDir = None, criticPooling = None):
         self.actionDim = actionDim
         self.numAgents = numAgents
         self.obsShapeList = obsShapeList
         self.actionRange = actionRange
         self.gradNormClipping = 0.5
+        self.graphCacheDir = graphCacheDir
+        self.criticPooling = criticPooling # None: critic on the concatenation of all agents, 'mean' / 'attention': pooled critic
+
+    def getGraphSourceFiles(self):
+        # the python sources the graph is built from; tensorflow's own layers are covered by its version
+        return [__file__, U.__file__]
+
+    def getGraphCachePath(self, layersWidths, agentID):
+        sourceHash = hashlib.sha1()
+        for sourcePath in self.getGraphSourceFiles():
+            with open(sourcePath, 'rb') as sourceFile:
+                sourceHash.update(sourceFile.read())
+        sourceHash = sourceHash.hexdigest()
+        graphKey = [self.actionDim, self.numAgents, list(self.obsShapeList), list(layersWidths), agentID,
+                    self.actionRange, self.gradNormClipping, self.criticPooling, sourceHash, tf.__version__]
+        graphKeyHash = hashlib.sha1(json.dumps(graphKey).encode()).hexdigest()
+        return os.path.join(self.graphCacheDir, 'agent{}_{}'.format(agentID, graphKeyHash))
 
     def __call__(self, layersWidths, agentID):
+        graphCachePath = self.getGraphCachePath(layersWidths, agentID) if self.graphCacheDir is not None else None
+        if graphCachePath is not None and os.path.exists(graphCachePath + '.meta'):
+            graph = importGraphFromCache(graphCachePath)
+        else:
+            graph = self.buildGraph(layersWidths, agentID)
+            if graphCachePath is not None:
+                if not os.path.exists(self.graphCacheDir):
+                    os.makedirs(self.graphCacheDir, exist_ok=True)
+                exportGraphToCache(graph, graphCachePath)
+
+        with graph.as_default():
+            model = tf.Session(graph=graph)
+            model.run(tf.global_variables_initializer())
+
+        return model
+
+    def buildConcatCritic(self, allAgentsStates_, allAgentsActions_, agentID, layersWidths):
+        criticActivation_ = tf.concat(allAgentsStates_ + allAgentsActions_, axis=1)
+        for i in range(len(layersWidths)):
+            criticActivation_ = layers.fully_connected(criticActivation_, num_outputs=layersWidths[i], activation_fn=tf.nn.relu)
+
+        criticActivation_ = layers.fully_connected(criticActivation_, num_outputs=1, activation_fn=None)
+        return criticActivation_
+
+    def buildPooledCritic(self, allAgentsStates_, allAgentsActions_, agentID, layersWidths):
+        # each agent's (observation, action) pair goes through one encoder shared by all agents and the other agents'
+        # embeddings are pooled, so the critic weights do not grow with numAgents. Observations are zero-padded to the
+        # widest one; agents with the same observation width (predators / prey) share a type flag.
+        maxObsDim = max(self.obsShapeList)
+        agentTypes = sorted(set(self.obsShapeList))
+        paddedStates_ = [agentState_ if agentObsDim == maxObsDim else tf.pad(agentState_, [[0, 0], [0, maxObsDim - agentObsDim]])
+                         for agentState_, agentObsDim in zip(allAgentsStates_, self.obsShapeList)]
+        typeFeatures = np.eye(len(agentTypes), dtype=np.float32)[[agentTypes.index(agentObsDim) for agentObsDim in self.obsShapeList]]
+        typeFeatures_ = tf.tile(tf.constant(typeFeatures)[None], [tf.shape(allAgentsStates_[0])[0], 1, 1])
+        pairs_ = tf.concat([tf.stack(paddedStates_, axis=1), tf.stack(allAgentsActions_, axis=1), typeFeatures_], axis=2)
+
+        # the first hidden layer is the shared encoder, the remaining ones form the Q head on [own, pooled others] embeddings
+        embeddingWidth = layersWidths[0]
+        embeddings_ = layers.fully_connected(pairs_, num_outputs=embeddingWidth, activation_fn=tf.nn.relu, scope='pairEncoder')
+
+        selfEmbedding_ = embeddings_[:, agentID]
+        othersEmbeddings_ = tf.concat([embeddings_[:, :agentID], embeddings_[:, agentID + 1:]], axis=1)
+        if self.criticPooling == 'attention':
+            query_ = layers.fully_connected(selfEmbedding_, num_outputs=embeddingWidth, activation_fn=None, scope='attentionQuery')
+            keys_ = layers.fully_connected(othersEmbeddings_, num_outputs=embeddingWidth, activation_fn=None, scope='attentionKey')
+            attentionWeights_ = tf.nn.softmax(tf.reduce_sum(keys_ * query_[:, None], axis=-1) / np.sqrt(embeddingWidth), axis=1)
+            pooledEmbedding_ = tf.reduce_sum(attentionWeights_[:, :, None] * othersEmbeddings_, axis=1)
+        else:
+            pooledEmbedding_ = tf.reduce_mean(othersEmbeddings_, axis=1)
+
+        criticActivation_ = tf.concat([selfEmbedding_, pooledEmbedding_], axis=1)
+        for i in range(1, len(layersWidths)):
+            criticActivation_ = layers.fully_connected(criticActivation_, num_outputs=layersWidths[i], activation_fn=tf.nn.relu, scope='qHidden' + str(i))
+
+        criticActivation_ = layers.fully_connected(criticActivation_, num_outputs=1, activation_fn=None, scope='qOutput')
+        return criticActivation_
+
+    def buildCritic(self, allAgentsStates_, allAgentsActions_, agentID, layersWidths):
+        if self.criticPooling is None:
+            return self.buildConcatCritic(allAgentsStates_, allAgentsActions_, agentID, layersWidths)
+        return self.buildPooledCritic(allAgentsStates_, allAgentsActions_, agentID, layersWidths)
+
+    def buildGraph(self, layersWidths, agentID):
         agentStr = 'Agent'+ str(agentID)
         graph = tf.Graph()
         with graph.as_default():
@@ -82,29 +203,15 @@ class BuildMADDPGModels:
 
 
             with tf.variable_scope("critic/trainHidden/"+ agentStr):
-                criticTrainActivationOfGivenAction_ = tf.concat(allAgentsStates_ + allAgentsActions_, axis=1)
-
-                for i in range(len(layersWidths)):
-                    criticTrainActivationOfGivenAction_ = layers.fully_connected(criticTrainActivationOfGivenAction_, num_outputs= layersWidths[i], activation_fn=tf.nn.relu)
-
-                criticTrainActivationOfGivenAction_ = layers.fully_connected(criticTrainActivationOfGivenAction_, num_outputs= 1, activation_fn= None)
+                criticTrainActivationOfGivenAction_ = self.buildCritic(allAgentsStates_, allAgentsActions_, agentID, layersWidths)
 
             with tf.variable_scope("critic/trainHidden/" + agentStr, reuse= True):
                 criticInputActionList = allAgentsActions_ + []
                 criticInputActionList[agentID] = noisyTrainAction_
-                criticTrainActivation_ = tf.concat(allAgentsStates_ + criticInputActionList, axis=1)
-
-                for i in range(len(layersWidths)):
-                    criticTrainActivation_ = layers.fully_connected(criticTrainActivation_, num_outputs=layersWidths[i], activation_fn=tf.nn.relu)
-
-                criticTrainActivation_ = layers.fully_connected(criticTrainActivation_, num_outputs=1, activation_fn=None)
+                criticTrainActivation_ = self.buildCritic(allAgentsStates_, criticInputActionList, agentID, layersWidths)
 
             with tf.variable_scope("critic/targetHidden/"+ agentStr):
-                criticTargetActivation_ = tf.concat(allAgentsNextStates_ + allAgentsNextActionsByTargetNet_, axis=1)
-                for i in range(len(layersWidths)):
-                    criticTargetActivation_ = layers.fully_connected(criticTargetActivation_, num_outputs= layersWidths[i],activation_fn=tf.nn.relu)
-
-                criticTargetActivation_ = layers.fully_connected(criticTargetActivation_, num_outputs= 1,activation_fn=None)
+                criticTargetActivation_ = self.buildCritic(allAgentsNextStates_, allAgentsNextActionsByTargetNet_, agentID, layersWidths)
 
             with tf.variable_scope("updateParameters/"+ agentStr):
                 actorTrainParams_ = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope='actor/trainHidden/'+ agentStr)
@@ -143,7 +250,7 @@ class BuildMADDPGModels:
                 actorLoss_ = pg_loss + p_reg * 1e-3
 
                 actorOptimizer = tf.train.AdamOptimizer(learningRate_, name='actorOptimizer')
-                actorTrainOpt_ = U.minimize_and_clip(actorOptimizer, actorLoss_, actorTrainParams_, self.gradNormClipping)
+                actorTrainOpt_ = U.minimize_and_clip(actorOptimizer, actorLoss_, actorTrainParams_, self.gradNormClipping, norm_collection="actorGradNorm_")
 
                 tf.add_to_collection("actorLoss_", actorLoss_)
                 tf.add_to_collection("actorTrainOpt_", actorTrainOpt_)
@@ -156,7 +263,7 @@ class BuildMADDPGModels:
                 tf.add_to_collection("valueLoss_", criticLoss_)
 
                 criticOptimizer = tf.train.AdamOptimizer(learningRate_, name='criticOptimizer')
-                crticTrainOpt_ = U.minimize_and_clip(criticOptimizer, criticLoss_, criticTrainParams_, self.gradNormClipping)
+                crticTrainOpt_ = U.minimize_and_clip(criticOptimizer, criticLoss_, criticTrainParams_, self.gradNormClipping, norm_collection="criticGradNorm_")
 
                 tf.add_to_collection("crticTrainOpt_", crticTrainOpt_)
 
@@ -165,16 +272,32 @@ class BuildMADDPGModels:
                 tf.add_to_collection("criticLossSummary", criticLossSummary)
                 tf.summary.scalar("criticLossSummary", criticLossSummary)
 
+                criticGradNorm_ = graph.get_collection_ref("criticGradNorm_")[0]
+                criticSummaries = ["criticSummaries"]
+                tf.summary.scalar("criticLoss", criticLoss_, collections=criticSummaries)
+                tf.summary.scalar("targetQMean", tf.reduce_mean(yi_), collections=criticSummaries)
+                tf.summary.scalar("QMean", tf.reduce_mean(criticTrainActivationOfGivenAction_), collections=criticSummaries)
+                tf.summary.scalar("QMax", tf.reduce_max(criticTrainActivationOfGivenAction_), collections=criticSummaries)
+                tf.summary.scalar("QMin", tf.reduce_min(criticTrainActivationOfGivenAction_), collections=criticSummaries)
+                tf.summary.scalar("criticGradNorm", criticGradNorm_, collections=criticSummaries)
+                criticSummary_ = tf.summary.merge(tf.get_collection("criticSummaries"))
+                tf.add_to_collection("criticSummary_", criticSummary_)
+
+                actorGradNorm_ = graph.get_collection_ref("actorGradNorm_")[0]
+                actorSummaries = ["actorSummaries"]
+                tf.summary.scalar("actorLoss", actorLoss_, collections=actorSummaries)
+                tf.summary.scalar("policyQMean", tf.reduce_mean(trainQ), collections=actorSummaries)
+                tf.summary.scalar("actorGradNorm", actorGradNorm_, collections=actorSummaries)
+                actorSummary_ = tf.summary.merge(tf.get_collection("actorSummaries"))
+                tf.add_to_collection("actorSummary_", actorSummary_)
+
             fullSummary = tf.summary.merge_all()
             tf.add_to_collection("summaryOps", fullSummary)
 
             saver = tf.train.Saver(max_to_keep=None)
             tf.add_to_collection("saver", saver)
 
-            model = tf.Session(graph=graph)
-            model.run(tf.global_variables_initializer())
-
-        return model
+        return graph
 
 
 class ActOneStep:
@@ -199,6 +322,17 @@ def actByPolicyTrainNoisy(model, allAgentsStatesBatch):
     return noisyTrainAction
 
 
+def actByPolicyTrainNoisyBatch(model, allAgentsObservations):
+    graph = model.graph
+    allAgentsStates_ = graph.get_collection_ref("allAgentsStates_")[0]
+    noisyTrainAction_ = graph.get_collection_ref("noisyTrainAction_")[0]
+    stateDict = {agentState_: observations for agentState_, observations in zip(allAgentsStates_, allAgentsObservations)}
+
+    noisyTrainAction = model.run(noisyTrainAction_, feed_dict= stateDict)
+
+    return noisyTrainAction
+
+
 def actByPolicyTargetNoisyForNextState(model, allAgentsNextStatesBatch):
     graph = model.graph
     allAgentsNextStates_ = graph.get_collection_ref("allAgentsNextStates_")[0]
@@ -211,12 +345,110 @@ def actByPolicyTargetNoisyForNextState(model, allAgentsNextStatesBatch):
 
 
 
+class WriteSummary:
+    def __init__(self, summaryInterval, logDir):
+        self.summaryInterval = summaryInterval
+        self.logDir = logDir
+        self.writers = {}
+
+    def isSummaryStep(self, learnStep):
+        return self.summaryInterval > 0 and learnStep % self.summaryInterval == 0
+
+    def __call__(self, agentID, agentModel, summary, learnStep):
+        if agentID not in self.writers:
+            agentLogDir = os.path.join(self.logDir, 'agent' + str(agentID))
+            self.writers[agentID] = tf.summary.FileWriter(agentLogDir, agentModel.graph)
+        self.writers[agentID].add_summary(summary, learnStep)
+
+    def close(self):
+        [writer.close() for writer in self.writers.values()]
+
+
+def runWithoutTrace(agentModel, callName, fetches, feedDict):
+    return agentModel.run(fetches, feed_dict=feedDict)
+
+
+class TraceRun:
+    # drop-in for runWithoutTrace: every traceInterval-th call of each learner session.run (per agent and call name) runs
+    # with FULL_TRACE, is written as a Chrome trace (chrome://tracing) and adds its op times to the agent's op summary
+    def __init__(self, traceInterval, traceDir, modelsList, numTopOps = 20):
+        self.traceInterval = traceInterval
+        self.traceDir = traceDir
+        self.agentIDs = {model.graph: agentID for agentID, model in enumerate(modelsList)}
+        self.numTopOps = numTopOps
+        self.callCounts = {}
+        self.tracedCallCounts = {}
+        self.opStats = {}
+
+    def __call__(self, agentModel, callName, fetches, feedDict):
+        agentID = self.agentIDs[agentModel.graph]
+        callCount = self.callCounts.get((agentID, callName), 0)
+        self.callCounts[(agentID, callName)] = callCount + 1
+        if callCount % self.traceInterval != 0:
+            return agentModel.run(fetches, feed_dict=feedDict)
+
+        runMetadata = tf.RunMetadata()
+        result = agentModel.run(fetches, feed_dict=feedDict, options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+                                run_metadata=runMetadata)
+        agentTraceDir = os.path.join(self.traceDir, 'agent' + str(agentID))
+        if not os.path.exists(agentTraceDir):
+            os.makedirs(agentTraceDir)
+        chromeTrace = timeline.Timeline(runMetadata.step_stats, graph=agentModel.graph).generate_chrome_trace_format()
+        with open(os.path.join(agentTraceDir, '{}{}.json'.format(callName, callCount)), 'w') as traceFile:
+            traceFile.write(chromeTrace)
+
+        self.tracedCallCounts[(agentID, callName)] = self.tracedCallCounts.get((agentID, callName), 0) + 1
+        agentOpStats = self.opStats.setdefault(agentID, {})
+        for deviceStats in runMetadata.step_stats.dev_stats:
+            for nodeStats in deviceStats.node_stats:
+                opType = nodeStats.timeline_label.split(' = ')[1].split('(')[0] if ' = ' in nodeStats.timeline_label else ''
+                totalMicros = agentOpStats.get((callName, nodeStats.node_name), (0, opType))[0]
+                agentOpStats[(callName, nodeStats.node_name)] = (totalMicros + nodeStats.all_end_rel_micros, opType)
+        self.writeOpSummary()
+        return result
+
+    def getOpSummary(self):
+        # per agent graph: mean op time per traced call of each call name, the most expensive ops, and totals by op type
+        # and by scope (the op name up to the agent scope, e.g. critic/trainHidden, actorNetOutput, updateParameters)
+        opSummary = {}
+        for agentID, agentOpStats in sorted(self.opStats.items()):
+            getMeanMicros = lambda callName, totalMicros: totalMicros / self.tracedCallCounts[(agentID, callName)]
+            opMeanMicros = [(callName, opName, opType, getMeanMicros(callName, totalMicros))
+                            for (callName, opName), (totalMicros, opType) in agentOpStats.items()]
+            agentMeanMicros = sum(meanMicros for callName, opName, opType, meanMicros in opMeanMicros)
+            getScope = lambda opName: opName.split('/Agent' + str(agentID))[0]
+            sumBy = lambda getKey: {key: sum(meanMicros for callName, opName, opType, meanMicros in opMeanMicros if getKey(callName, opName, opType) == key)
+                                    for key in set(getKey(*opStats[:3]) for opStats in opMeanMicros)}
+            sortByMicros = lambda microsByKey: sorted(microsByKey.items(), key=lambda item: -item[1])
+            opSummary['agent' + str(agentID)] = {
+                'tracedCalls': {callName: count for (tracedAgentID, callName), count in self.tracedCallCounts.items() if tracedAgentID == agentID},
+                'meanMicrosByCall': dict(sortByMicros(sumBy(lambda callName, opName, opType: callName))),
+                'topOps': [{'call': callName, 'op': opName, 'type': opType, 'meanMicros': meanMicros, 'share': meanMicros / agentMeanMicros}
+                           for callName, opName, opType, meanMicros in sorted(opMeanMicros, key=lambda opStats: -opStats[3])[:self.numTopOps]],
+                'meanMicrosByType': dict(sortByMicros(sumBy(lambda callName, opName, opType: opType))),
+                'meanMicrosByScope': dict(sortByMicros(sumBy(lambda callName, opName, opType: callName + ':' + getScope(opName))))}
+        return opSummary
+
+    def writeOpSummary(self):
+        with open(os.path.join(self.traceDir, 'opSummary.json'), 'w') as summaryFile:
+            json.dump(self.getOpSummary(), summaryFile, indent=1)
+
+    def printOpSummary(self, numOpsToPrint = 10):
+        for agentName, agentSummary in self.getOpSummary().items():
+            print("{}: mean microseconds per traced call {}".format(agentName, {callName: round(meanMicros) for callName, meanMicros in agentSummary['meanMicrosByCall'].items()}))
+            [print("  {:>8.0f}us {:5.1%} {:<18} {:<14} {}".format(op['meanMicros'], op['share'], op['call'], op['type'], op['op']))
+             for op in agentSummary['topOps'][:numOpsToPrint]]
+
+
 class TrainCriticBySASR:
-    def __init__(self, actByPolicyTargetNoisyForNextState, criticLearningRate, gamma):
+    def __init__(self, actByPolicyTargetNoisyForNextState, criticLearningRate, gamma, writeSummary = None, runSession = runWithoutTrace):
         self.actByPolicyTargetNoisyForNextState = actByPolicyTargetNoisyForNextState
         self.criticLearningRate = criticLearningRate
         self.gamma = gamma
+        self.writeSummary = writeSummary
+        self.runSession = runSession
         self.runCount = 0
+        self.agentsRunCount = {}
 
     def __call__(self, agentID, allAgentsModels, allAgentsStateBatch, allAgentsActionsBatch, allAgentsNextStatesBatch, allAgentsRewardBatch):
         agentModel = allAgentsModels[agentID]
@@ -234,7 +466,6 @@ class TrainCriticBySASR:
 
         valueLoss_ = graph.get_collection_ref("valueLoss_")[0]
         crticTrainOpt_ = graph.get_collection_ref("crticTrainOpt_")[0]
-        criticSummary_ = graph.get_collection_ref("summaryOps")[0]
         valueDict = {agentReward_: agentReward, learningRate_: self.criticLearningRate, gamma_: self.gamma}
 
         stateDict = {agentState_: [states[i] for states in allAgentsStateBatch] for i, agentState_ in enumerate(allAgentsStates_)}
@@ -243,12 +474,18 @@ class TrainCriticBySASR:
 
         getAgentNextAction = lambda agentID: self.actByPolicyTargetNoisyForNextState(allAgentsModels[agentID], allAgentsNextStatesBatch)
         nextActionDict = {nextAction_: getAgentNextAction(i) for i, nextAction_ in enumerate(allAgentsNextActionsByTargetNet_)}
+        feedDict = {**stateDict, **nextStateDict, **nextActionDict, **actionDict, **valueDict}
 
-
-        criticSummary, criticLoss, crticTrainOpt = agentModel.run([criticSummary_, valueLoss_, crticTrainOpt_],
-                                               feed_dict={**stateDict, **nextStateDict, **nextActionDict, **actionDict, **valueDict} )
+        learnStep = self.agentsRunCount.get(agentID, 0)
+        if self.writeSummary is not None and self.writeSummary.isSummaryStep(learnStep):
+            criticSummary_ = graph.get_collection_ref("criticSummary_")[0]
+            criticSummary, criticLoss, crticTrainOpt = self.runSession(agentModel, 'trainCritic', [criticSummary_, valueLoss_, crticTrainOpt_], feedDict)
+            self.writeSummary(agentID, agentModel, criticSummary, learnStep)
+        else:
+            criticLoss, crticTrainOpt = self.runSession(agentModel, 'trainCritic', [valueLoss_, crticTrainOpt_], feedDict)
 
         self.runCount += 1
+        self.agentsRunCount[agentID] = learnStep + 1
 
         return criticLoss, agentModel
 
@@ -267,8 +504,11 @@ class TrainCritic:
 
 
 class TrainActorFromSA:
-    def __init__(self, actorLearningRatte):
+    def __init__(self, actorLearningRatte, writeSummary = None, runSession = runWithoutTrace):
         self.actorLearningRate = actorLearningRatte
+        self.writeSummary = writeSummary
+        self.runSession = runSession
+        self.agentsRunCount = {}
 
     def __call__(self, agentID, agentModel, allAgentsStateBatch, allAgentsActionsBatch):
         graph = agentModel.graph
@@ -282,7 +522,16 @@ class TrainActorFromSA:
         actionDict = {agentAction_: [actions[i] for actions in allAgentsActionsBatch] for i, agentAction_ in enumerate(allAgentsActions_)}
         valueDict = {learningRate_: self.actorLearningRate}
 
-        actorTrainOpt = agentModel.run(actorTrainOpt_, feed_dict={**stateDict, **actionDict, **valueDict} )
+        feedDict = {**stateDict, **actionDict, **valueDict}
+
+        learnStep = self.agentsRunCount.get(agentID, 0)
+        if self.writeSummary is not None and self.writeSummary.isSummaryStep(learnStep):
+            actorSummary_ = graph.get_collection_ref("actorSummary_")[0]
+            actorSummary, actorTrainOpt = self.runSession(agentModel, 'trainActor', [actorSummary_, actorTrainOpt_], feedDict)
+            self.writeSummary(agentID, agentModel, actorSummary, learnStep)
+        else:
+            actorTrainOpt = self.runSession(agentModel, 'trainActor', actorTrainOpt_, feedDict)
+        self.agentsRunCount[agentID] = learnStep + 1
 
         return agentModel
 
@@ -0,0 +1,248 @@
+import tensorflow as tf
+import numpy as np
+import os
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+import src.maddpg.rlTools.tf_util as U
+from src.maddpg.trainer.MADDPG import BuildMADDPGModels
+
+# S independent seeds of one agent in one graph: every weight gets a leading seed dimension and every tensor has shape
+# (numSeeds, batchSize, width), so one session run trains all seeds with batched matmuls. Variable names are the ones
+# of the single-seed graph in MADDPG.py, which lets SaveSeedVariables write each seed as an ordinary checkpoint.
+
+
+def stackedFullyConnected(inputs_, numSeeds, numOutputs, activation_fn = tf.nn.relu):
+    with tf.variable_scope(None, default_name='fully_connected'):
+        numInputs = int(inputs_.shape[-1])
+        initLimit = np.sqrt(6 / (numInputs + numOutputs)) # glorot uniform per seed, as in layers.fully_connected
+        weights_ = tf.get_variable('weights', [numSeeds, numInputs, numOutputs], initializer=tf.random_uniform_initializer(-initLimit, initLimit))
+        biases_ = tf.get_variable('biases', [numSeeds, 1, numOutputs], initializer=tf.zeros_initializer())
+        outputs_ = tf.matmul(inputs_, weights_) + biases_
+        return outputs_ if activation_fn is None else activation_fn(outputs_)
+
+
+def minimizeAndClipPerSeed(optimizer, objective, varList, clipVal):
+    # the gradient norm of each seed's slice is clipped on its own, as U.minimize_and_clip does for a single seed
+    gradients = optimizer.compute_gradients(objective, var_list=varList)
+    clippedGradients = []
+    for grad, var in gradients:
+        seedNorm = tf.sqrt(tf.reduce_sum(tf.square(grad), axis=list(range(1, len(var.shape))), keepdims=True))
+        clippedGradients.append((grad * clipVal / tf.maximum(seedNorm, clipVal), var))
+    return optimizer.apply_gradients(clippedGradients)
+
+
+class BuildEnsembleMADDPGModels(BuildMADDPGModels):
+    def __init__(self, numSeeds, actionDim, numAgents, obsShapeList, actionRange = 1, graphCacheDir = None):
+        super().__init__(actionDim, numAgents, obsShapeList, actionRange, graphCacheDir)
+        self.numSeeds = numSeeds
+
+    def getGraphSourceFiles(self):
+        return super().getGraphSourceFiles() + [__file__]
+
+    def getGraphCachePath(self, layersWidths, agentID):
+        return super().getGraphCachePath(layersWidths, agentID) + '_ensemble{}seeds'.format(self.numSeeds)
+
+    def buildActor(self, agentState_, layersWidths):
+        actorActivation_ = agentState_
+        for i in range(len(layersWidths)):
+            actorActivation_ = stackedFullyConnected(actorActivation_, self.numSeeds, layersWidths[i])
+        return stackedFullyConnected(actorActivation_, self.numSeeds, self.actionDim, activation_fn=None)
+
+    def buildCritic(self, allAgentsStates_, allAgentsActions_, agentID, layersWidths):
+        criticActivation_ = tf.concat(allAgentsStates_ + allAgentsActions_, axis=2)
+        for i in range(len(layersWidths)):
+            criticActivation_ = stackedFullyConnected(criticActivation_, self.numSeeds, layersWidths[i])
+        return stackedFullyConnected(criticActivation_, self.numSeeds, 1, activation_fn=None)
+
+    def buildGraph(self, layersWidths, agentID):
+        agentStr = 'Agent'+ str(agentID)
+        numSeeds = self.numSeeds
+        graph = tf.Graph()
+        with graph.as_default():
+            with tf.variable_scope("inputs/"+ agentStr):
+                allAgentsStates_ = [tf.placeholder(dtype=tf.float32, shape=[numSeeds, None, agentObsDim], name="state"+str(i)) for i, agentObsDim in enumerate(self.obsShapeList)]
+                allAgentsNextStates_ = [tf.placeholder(dtype=tf.float32, shape=[numSeeds, None, agentObsDim], name="nextState"+str(i)) for i, agentObsDim in enumerate(self.obsShapeList)]
+
+                allAgentsActions_ = [tf.placeholder(dtype=tf.float32, shape=[numSeeds, None, self.actionDim], name="action"+str(i)) for i in range(self.numAgents)]
+                allAgentsNextActionsByTargetNet_ = [tf.placeholder(dtype=tf.float32, shape=[numSeeds, None, self.actionDim], name= "actionTarget"+str(i)) for i in range(self.numAgents)]
+
+                agentReward_ = tf.placeholder(tf.float32, [numSeeds, None, 1], name='reward_')
+
+                tf.add_to_collection("allAgentsStates_", allAgentsStates_)
+                tf.add_to_collection("allAgentsNextStates_", allAgentsNextStates_)
+                tf.add_to_collection("allAgentsActions_", allAgentsActions_)
+                tf.add_to_collection("allAgentsNextActionsByTargetNet_", allAgentsNextActionsByTargetNet_)
+                tf.add_to_collection("agentReward_", agentReward_)
+
+            with tf.variable_scope("trainingParams" + agentStr):
+                learningRate_ = tf.constant(0, dtype=tf.float32)
+                tau_ = tf.constant(0, dtype=tf.float32)
+                gamma_ = tf.constant(0, dtype=tf.float32)
+
+                tf.add_to_collection("learningRate_", learningRate_)
+                tf.add_to_collection("tau_", tau_)
+                tf.add_to_collection("gamma_", gamma_)
+
+            with tf.variable_scope("actor/trainHidden/"+ agentStr):
+                actorTrainActivation_ = self.buildActor(allAgentsStates_[agentID], layersWidths)
+
+            with tf.variable_scope("actor/targetHidden/"+ agentStr):
+                actorTargetActivation_ = self.buildActor(allAgentsNextStates_[agentID], layersWidths)
+
+            with tf.variable_scope("actorNetOutput/"+ agentStr):
+                trainAction_ = tf.multiply(actorTrainActivation_, self.actionRange, name='trainAction_')
+                targetAction_ = tf.multiply(actorTargetActivation_, self.actionRange, name='targetAction_')
+
+                sampleNoiseTrain_ = tf.random_uniform(tf.shape(trainAction_))
+                noisyTrainAction_ = U.softmax(trainAction_ - tf.log(-tf.log(sampleNoiseTrain_)), axis=-1)
+
+                sampleNoiseTarget_ = tf.random_uniform(tf.shape(targetAction_))
+                noisyTargetAction_ = U.softmax(targetAction_ - tf.log(-tf.log(sampleNoiseTarget_)), axis=-1)
+
+                tf.add_to_collection("trainAction_", trainAction_)
+                tf.add_to_collection("targetAction_", targetAction_)
+
+                tf.add_to_collection("noisyTrainAction_", noisyTrainAction_)
+                tf.add_to_collection("noisyTargetAction_", noisyTargetAction_)
+
+            with tf.variable_scope("critic/trainHidden/"+ agentStr):
+                criticTrainActivationOfGivenAction_ = self.buildCritic(allAgentsStates_, allAgentsActions_, agentID, layersWidths)
+
+            with tf.variable_scope("critic/trainHidden/" + agentStr, reuse= True):
+                criticInputActionList = allAgentsActions_ + []
+                criticInputActionList[agentID] = noisyTrainAction_
+                criticTrainActivation_ = self.buildCritic(allAgentsStates_, criticInputActionList, agentID, layersWidths)
+
+            with tf.variable_scope("critic/targetHidden/"+ agentStr):
+                criticTargetActivation_ = self.buildCritic(allAgentsNextStates_, allAgentsNextActionsByTargetNet_, agentID, layersWidths)
+
+            with tf.variable_scope("updateParameters/"+ agentStr):
+                actorTrainParams_ = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope='actor/trainHidden/'+ agentStr)
+                actorTargetParams_ = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope='actor/targetHidden/'+ agentStr)
+                criticTrainParams_ = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope='critic/trainHidden/'+ agentStr)
+                criticTargetParams_ = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope='critic/targetHidden/'+ agentStr)
+
+                trainParams_ = actorTrainParams_ + criticTrainParams_
+                targetParams_ = actorTargetParams_ + criticTargetParams_
+                updateParam_ = [targetParam_.assign((1 - tau_) * targetParam_ + tau_ * trainParam_) for trainParam_, targetParam_ in zip(trainParams_, targetParams_)]
+                hardReplaceTargetParam_ = [tf.assign(trainParam_, targetParam_) for trainParam_, targetParam_ in zip(trainParams_, targetParams_)]
+
+                tf.add_to_collection("actorTrainParams_", actorTrainParams_)
+                tf.add_to_collection("actorTargetParams_", actorTargetParams_)
+                tf.add_to_collection("criticTrainParams_", criticTrainParams_)
+                tf.add_to_collection("criticTargetParams_", criticTargetParams_)
+                tf.add_to_collection("updateParam_", updateParam_)
+                tf.add_to_collection("hardReplaceTargetParam_", hardReplaceTargetParam_)
+
+            # per-seed losses are summed, so each seed's gradient is the one it would get when trained alone
+            with tf.variable_scope("trainActorNet/"+ agentStr):
+                pg_loss = -tf.reduce_mean(criticTrainActivation_[:, :, 0], axis=1)
+                p_reg = tf.reduce_mean(tf.square(actorTrainActivation_), axis=[1, 2])
+                actorLoss_ = pg_loss + p_reg * 1e-3
+
+                actorOptimizer = tf.train.AdamOptimizer(learningRate_, name='actorOptimizer')
+                actorTrainOpt_ = minimizeAndClipPerSeed(actorOptimizer, tf.reduce_sum(actorLoss_), actorTrainParams_, self.gradNormClipping)
+
+                tf.add_to_collection("actorLoss_", actorLoss_)
+                tf.add_to_collection("actorTrainOpt_", actorTrainOpt_)
+
+            with tf.variable_scope("trainCriticNet/"+ agentStr):
+                yi_ = agentReward_ + gamma_ * criticTargetActivation_
+                criticLoss_ = tf.reduce_mean(tf.squared_difference(yi_, criticTrainActivationOfGivenAction_), axis=[1, 2])
+
+                tf.add_to_collection("yi_", yi_)
+                tf.add_to_collection("valueLoss_", criticLoss_)
+
+                criticOptimizer = tf.train.AdamOptimizer(learningRate_, name='criticOptimizer')
+                crticTrainOpt_ = minimizeAndClipPerSeed(criticOptimizer, tf.reduce_sum(criticLoss_), criticTrainParams_, self.gradNormClipping)
+
+                tf.add_to_collection("crticTrainOpt_", crticTrainOpt_)
+
+            saver = tf.train.Saver(max_to_keep=None)
+            tf.add_to_collection("saver", saver)
+
+        return graph
+
+
+def actByEnsembleTrainNoisy(model, allAgentsObservations):
+    # one observation per seed and agent, shape (numSeeds, obsDim); returns actions of shape (numSeeds, actionDim)
+    graph = model.graph
+    allAgentsStates_ = graph.get_collection_ref("allAgentsStates_")[0]
+    noisyTrainAction_ = graph.get_collection_ref("noisyTrainAction_")[0]
+    stateDict = {agentState_: observations[:, None] for agentState_, observations in zip(allAgentsStates_, allAgentsObservations)}
+    return model.run(noisyTrainAction_, feed_dict=stateDict)[:, 0]
+
+
+def actByEnsembleTargetNoisy(model, allAgentsNextStates):
+    graph = model.graph
+    allAgentsNextStates_ = graph.get_collection_ref("allAgentsNextStates_")[0]
+    noisyTargetAction_ = graph.get_collection_ref("noisyTargetAction_")[0]
+    nextStateDict = {agentNextState_: nextStates for agentNextState_, nextStates in zip(allAgentsNextStates_, allAgentsNextStates)}
+    return model.run(noisyTargetAction_, feed_dict=nextStateDict)
+
+
+class TrainEnsembleCritic:
+    def __init__(self, actByEnsembleTargetNoisy, criticLearningRate, gamma):
+        self.actByEnsembleTargetNoisy = actByEnsembleTargetNoisy
+        self.criticLearningRate = criticLearningRate
+        self.gamma = gamma
+
+    def __call__(self, agentID, allAgentsModels, miniBatch):
+        allAgentsStates, allAgentsActions, allAgentsRewards, allAgentsNextStates = miniBatch
+        agentModel = allAgentsModels[agentID]
+        graph = agentModel.graph
+
+        allAgentsStates_ = graph.get_collection_ref("allAgentsStates_")[0]
+        allAgentsNextStates_ = graph.get_collection_ref("allAgentsNextStates_")[0]
+        allAgentsNextActionsByTargetNet_ = graph.get_collection_ref("allAgentsNextActionsByTargetNet_")[0]
+        agentReward_ = graph.get_collection_ref("agentReward_")[0]
+        allAgentsActions_ = graph.get_collection_ref("allAgentsActions_")[0]
+        learningRate_ = graph.get_collection_ref("learningRate_")[0]
+        gamma_ = graph.get_collection_ref("gamma_")[0]
+        crticTrainOpt_ = graph.get_collection_ref("crticTrainOpt_")[0]
+
+        feedDict = {agentReward_: allAgentsRewards[:, :, agentID:agentID + 1], learningRate_: self.criticLearningRate, gamma_: self.gamma}
+        feedDict.update(zip(allAgentsStates_, allAgentsStates))
+        feedDict.update(zip(allAgentsActions_, allAgentsActions))
+        feedDict.update(zip(allAgentsNextStates_, allAgentsNextStates))
+        feedDict.update({nextAction_: self.actByEnsembleTargetNoisy(allAgentsModels[i], allAgentsNextStates)
+                         for i, nextAction_ in enumerate(allAgentsNextActionsByTargetNet_)})
+        agentModel.run(crticTrainOpt_, feed_dict=feedDict)
+        return agentModel
+
+
+class TrainEnsembleActor:
+    def __init__(self, actorLearningRate):
+        self.actorLearningRate = actorLearningRate
+
+    def __call__(self, agentID, agentModel, miniBatch):
+        allAgentsStates, allAgentsActions, allAgentsRewards, allAgentsNextStates = miniBatch
+        graph = agentModel.graph
+        allAgentsStates_ = graph.get_collection_ref("allAgentsStates_")[0]
+        allAgentsActions_ = graph.get_collection_ref("allAgentsActions_")[0]
+        learningRate_ = graph.get_collection_ref("learningRate_")[0]
+        actorTrainOpt_ = graph.get_collection_ref("actorTrainOpt_")[0]
+
+        feedDict = {learningRate_: self.actorLearningRate}
+        feedDict.update(zip(allAgentsStates_, allAgentsStates))
+        feedDict.update(zip(allAgentsActions_, allAgentsActions))
+        agentModel.run(actorTrainOpt_, feed_dict=feedDict)
+        return agentModel
+
+
+class SaveSeedVariables:
+    # copies one seed's slice of every ensemble variable into the single-seed graph of the same agent (exportModel,
+    # built by BuildMADDPGModels) and saves that, so the checkpoint is the one a single-seed run would write
+    def __init__(self, seed, exportModel, saveVariables):
+        self.seed = seed
+        self.exportModel = exportModel
+        self.saveVariables = saveVariables
+
+    def __call__(self, ensembleModel, path):
+        exportVariables = self.exportModel.graph.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)
+        ensembleVariablesByName = {variable.name: variable for variable in ensembleModel.graph.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)}
+        values = ensembleModel.run([ensembleVariablesByName[variable.name] for variable in exportVariables])
+        for variable, value in zip(exportVariables, values):
+            variableShape = variable.shape.as_list()
+            seedValue = value if list(value.shape) == variableShape else value[self.seed]
+            variable.load(seedValue.reshape(variableShape), self.exportModel)
+        self.saveVariables(self.exportModel, path)
@@ -0,0 +1,24 @@
+import numpy as np
+
+
+class ActByActorWeights:
+    # numpy forward pass of the actor built in BuildMADDPGModels: relu hidden layers, linear output,
+    # then the same gumbel-softmax noise as noisyTrainAction_
+    def __init__(self, actorWeights, actionRange = 1, noisy = True):
+        weights = [np.asarray(weight, dtype=np.float32) for weight in actorWeights]
+        self.layers = list(zip(weights[0::2], weights[1::2]))
+        self.actionRange = actionRange
+        self.noisy = noisy
+
+    def __call__(self, agentStatesBatch):
+        activation = np.asarray(agentStatesBatch, dtype=np.float32)
+        for weight, bias in self.layers[:-1]:
+            activation = np.maximum(activation @ weight + bias, 0)
+        weight, bias = self.layers[-1]
+        action = (activation @ weight + bias) * self.actionRange
+
+        if self.noisy:
+            sampleNoise = np.random.uniform(size=action.shape)
+            action = action - np.log(-np.log(sampleNoise))
+        expAction = np.exp(action - np.max(action, axis=-1, keepdims=True))
+        return expAction / np.sum(expAction, axis=-1, keepdims=True)
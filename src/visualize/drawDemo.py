@@ -3,8 +3,14 @@ import numpy as np
 import os
 
 
+def getHeadlessScreen(screenWidth, screenHeight):
+    # plain offscreen surface: drawing and saving need no display, so this works on servers without SDL video
+    return pg.Surface((screenWidth, screenHeight))
+
+
 class DrawBackground:
-    def __init__(self, screen, screenColor, xBoundary, yBoundary, lineColor, lineWidth, xObstacles = None, yObstacles = None):
+    def __init__(self, screen, screenColor, xBoundary, yBoundary, lineColor, lineWidth, xObstacles = None, yObstacles = None,
+                 handleEvents = True):
         self.screen = screen
         self.screenColor = screenColor
         self.xBoundary = xBoundary
@@ -13,14 +19,16 @@ class DrawBackground:
         self.lineWidth = lineWidth
         self.xObstacles = xObstacles
         self.yObstacles = yObstacles
+        self.handleEvents = handleEvents
 
     def __call__(self):
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                pg.quit()
-            if event.type == pg.KEYDOWN:
-                if event.key == pg.K_ESCAPE:
-                    exit()
+        if self.handleEvents:
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    pg.quit()
+                if event.type == pg.KEYDOWN:
+                    if event.key == pg.K_ESCAPE:
+                        exit()
         self.screen.fill(self.screenColor)
         rectPos = [self.xBoundary[0], self.yBoundary[0], self.xBoundary[1], self.yBoundary[1]]
         pg.draw.rect(self.screen, self.lineColor, rectPos, self.lineWidth)
@@ -53,7 +61,8 @@ class DrawCircleOutside:
 
 class DrawState:
     def __init__(self, fps, screen, colorSpace, circleSizeSpace, agentIdsToDraw, positionIndex, saveImage,
-                 imagePath, preyGroupID, predatorsID, drawBackGround, drawCircleOutside = None, viewRatio = 1):
+                 imagePath, preyGroupID, predatorsID, drawBackGround, drawCircleOutside = None, viewRatio = 1, display = True,
+                 recordFrame = None):
         self.fps = fps
         self.screen = screen
         self.viewRatio = viewRatio
@@ -68,6 +77,9 @@ class DrawState:
         self.drawCircleOutside = drawCircleOutside
         self.preyGroupID = preyGroupID
         self.predatorsID = predatorsID
+        self.display = display
+        self.recordFrame = recordFrame
+        self.frameCount = len(os.listdir(self.imagePath)) if self.saveImage else 0
 
         self.biteCount = 0
         self.killCount = 0
@@ -113,16 +125,48 @@ class DrawState:
             else:
                 pg.draw.circle(self.screen, agentColor, agentPos, circleSize)
 
-        pg.display.flip()
-        
+        if self.display:
+            pg.display.flip()
+
         if self.saveImage == True:
-            filenameList = os.listdir(self.imagePath)
-            pg.image.save(self.screen, self.imagePath + '/' + str(len(filenameList))+'.png')
-        
-        fpsClock.tick(self.fps)
+            pg.image.save(self.screen, self.imagePath + '/' + str(self.frameCount)+'.png')
+            self.frameCount += 1
+
+        if self.recordFrame is not None:
+            self.recordFrame(self.screen)
+
+        if self.display:
+            fpsClock.tick(self.fps)
         return self.screen
 
 
+class WriteFramesPerTrajectory:
+    # keeps one trajectory's frames in memory and encodes them into a single file: a frame stack of shape
+    # (numFrames, screenHeight, screenWidth, 3) as .npy or compressed .npz, or an animated .gif / .mp4 when imageio is
+    # installed (imageio-ffmpeg too for .mp4)
+    def __init__(self, frameFormat = 'npy', fps = 10):
+        self.frameFormat = frameFormat
+        self.fps = fps
+        self.frames = []
+
+    def __call__(self, screen):
+        frame = np.frombuffer(pg.image.tostring(screen, 'RGB'), dtype=np.uint8)
+        self.frames.append(frame.reshape(screen.get_height(), screen.get_width(), 3))
+
+    def writeTrajectory(self, pathWithoutExtension):
+        path = pathWithoutExtension + '.' + self.frameFormat
+        frames = np.stack(self.frames)
+        self.frames = []
+        if self.frameFormat == 'npy':
+            np.save(path, frames)
+        elif self.frameFormat == 'npz':
+            np.savez_compressed(path, frames=frames)
+        else:
+            import imageio
+            imageio.mimsave(path, list(frames), fps=self.fps)
+        return path
+
+
 class ChaseTrialWithKillNotation:
     def __init__(self, stateIndex, drawState, checkStatus):
         self.stateIndex = stateIndex
@@ -137,7 +181,22 @@ class ChaseTrialWithKillNotation:
 
             state = timeStep[self.stateIndex]
             posterior = None
-            screen = self.drawState(state, agentsStatus, posterior)
+            self.drawState(state, agentsStatus, posterior)
+        return
+
+
+class ChaseTrialWithPrecomputedStatus:
+    # agentsStatus for all steps comes from one call on the whole trajectory instead of CheckStatus per frame
+    def __init__(self, stateIndex, drawState, getTrajAgentsStatus):
+        self.stateIndex = stateIndex
+        self.drawState = drawState
+        self.getTrajAgentsStatus = getTrajAgentsStatus
+
+    def __call__(self, trajectory):
+        trajAgentsStatus = self.getTrajAgentsStatus(trajectory)
+        for timeStep, agentsStatus in zip(trajectory, trajAgentsStatus):
+            state = timeStep[self.stateIndex]
+            self.drawState(state, agentsStatus)
         return
 
 
@@ -0,0 +1,132 @@
+import json
+import os
+import multiprocessing
+import numpy as np
+from pygame.color import THECOLORS
+
+from src.functionTools.trajectoryStore import ColumnarTrajectories
+from src.functionTools.trajectoryStatus import GetTrajectoryStatus, getTrajectoryStateArrays, getStatusLabels
+from src.visualize.drawDemo import DrawBackground, DrawCircleOutside, DrawState, ChaseTrialWithPrecomputedStatus, \
+    getHeadlessScreen, WriteFramesPerTrajectory
+
+
+class BuildHeadlessChaseTrial:
+    # plain parameters only, so it can be sent to pool workers; every worker builds its own surface from it
+    def __init__(self, numPredators, numPrey, numBlocks, frameFormat = 'npz', screenWidth = 700, screenHeight = 700,
+                 viewRatio = 1.5, fps = 10):
+        self.numPredators = numPredators
+        self.numPrey = numPrey
+        self.numBlocks = numBlocks
+        self.frameFormat = frameFormat
+        self.screenWidth = screenWidth
+        self.screenHeight = screenHeight
+        self.viewRatio = viewRatio
+        self.fps = fps
+
+    def __call__(self, trajOutputPath):
+        numPredators, numPrey, numBlocks = self.numPredators, self.numPrey, self.numBlocks
+        predatorsID = list(range(numPredators))
+        preyGroupID = list(range(numPredators, numPredators + numPrey))
+
+        screen = getHeadlessScreen(self.screenWidth, self.screenHeight)
+        drawBackground = DrawBackground(screen, THECOLORS['black'], [0, self.screenWidth], [0, self.screenHeight],
+                                        THECOLORS['white'], 4, handleEvents=False)
+
+        circleColorSpace = [THECOLORS['white']] * numPredators + [THECOLORS['green']] * numPrey + [THECOLORS['grey']] * numBlocks
+        preySize = int(0.05 * self.screenWidth / (2 * self.viewRatio))
+        predatorSize = int(0.075 * self.screenWidth / (3 * self.viewRatio))
+        blockSize = int(0.2 * self.screenWidth / (2 * self.viewRatio))
+        circleSizeSpace = [predatorSize] * numPredators + [preySize] * numPrey + [blockSize] * numBlocks
+        positionIndex = [0, 1]
+        agentIdsToDraw = list(range(numPredators + numPrey + numBlocks))
+        drawCircleOutside = DrawCircleOutside(screen, predatorsID, positionIndex, [THECOLORS['red']] * numPredators,
+                                              int(predatorSize * 1.5), viewRatio=self.viewRatio)
+
+        savePngFrames = self.frameFormat == 'png'
+        if savePngFrames and not os.path.exists(trajOutputPath):
+            os.makedirs(trajOutputPath)
+        writeFrames = None if savePngFrames else WriteFramesPerTrajectory(self.frameFormat, self.fps)
+        drawState = DrawState(self.fps, screen, circleColorSpace, circleSizeSpace, agentIdsToDraw, positionIndex, savePngFrames,
+                              trajOutputPath, preyGroupID, predatorsID, drawBackground, drawCircleOutside=drawCircleOutside,
+                              viewRatio=self.viewRatio, display=False, recordFrame=writeFrames)
+
+        stateID = 0
+        entitiesSizeList = [0.075] * numPredators + [0.05] * numPrey + [0.2] * numBlocks
+        getTrajectoryStatus = GetTrajectoryStatus(predatorsID, preyGroupID, entitiesSizeList)
+        getTrajAgentsStatus = lambda trajectory: getStatusLabels(getTrajectoryStatus(*getTrajectoryStateArrays(trajectory)), predatorsID)
+        chaseTrial = ChaseTrialWithPrecomputedStatus(stateID, drawState, getTrajAgentsStatus)
+        return chaseTrial, writeFrames
+
+
+def getTrajOutputPath(outputDir, trajID):
+    return os.path.join(outputDir, 'traj{}'.format(trajID))
+
+
+# per-process state of pool workers, set once by initializeRenderWorker
+workerTrajectories = None
+workerBuildChaseTrial = None
+workerOutputDir = None
+
+
+def initializeRenderWorker(trajectoryPath, buildChaseTrial, outputDir):
+    global workerTrajectories, workerBuildChaseTrial, workerOutputDir
+    workerTrajectories = ColumnarTrajectories(trajectoryPath)
+    workerBuildChaseTrial = buildChaseTrial
+    workerOutputDir = outputDir
+
+
+def renderTrajectoryInWorker(trajID):
+    trajOutputPath = getTrajOutputPath(workerOutputDir, trajID)
+    chaseTrial, writeFrames = workerBuildChaseTrial(trajOutputPath)
+    trajectory = workerTrajectories[trajID]
+    chaseTrial(trajectory)
+    outputPath = trajOutputPath if writeFrames is None else writeFrames.writeTrajectory(trajOutputPath)
+    return trajID, outputPath, len(trajectory)
+
+
+class RenderTrajectoriesInPool:
+    def __init__(self, numWorkers, buildChaseTrial, trajectoryPath, outputDir):
+        self.numWorkers = numWorkers
+        self.buildChaseTrial = buildChaseTrial
+        self.trajectoryPath = trajectoryPath
+        self.outputDir = outputDir
+
+    def __call__(self, trajIDs):
+        if not os.path.exists(self.outputDir):
+            os.makedirs(self.outputDir)
+        initArgs = (self.trajectoryPath, self.buildChaseTrial, self.outputDir)
+        with multiprocessing.Pool(self.numWorkers, initializer=initializeRenderWorker, initargs=initArgs) as pool:
+            rendered = list(pool.imap_unordered(renderTrajectoryInWorker, trajIDs))
+
+        rendered.sort(key=lambda renderedTraj: renderedTraj[0])
+        renderIndex = [{'trajID': trajID, 'path': os.path.relpath(outputPath, self.outputDir), 'numFrames': numFrames}
+                       for trajID, outputPath, numFrames in rendered]
+        with open(os.path.join(self.outputDir, 'renderIndex.json'), 'w') as indexFile:
+            json.dump(renderIndex, indexFile)
+        return renderIndex
+
+
+def stitchRenderedTrajectories(outputDir, renderIndex, frameFormat, fps = 10):
+    # one file with all trajectories in trajID order; frame stacks are copied into a memmap one trajectory at a time
+    if frameFormat == 'png':
+        return None
+    stitchedPath = os.path.join(outputDir, 'allTrajectories.' + ('npy' if frameFormat in ['npy', 'npz'] else frameFormat))
+    trajPaths = [os.path.join(outputDir, renderedTraj['path']) for renderedTraj in renderIndex]
+    if frameFormat in ['npy', 'npz']:
+        loadFrames = (lambda path: np.load(path)) if frameFormat == 'npy' else (lambda path: np.load(path)['frames'])
+        numFrames = sum(renderedTraj['numFrames'] for renderedTraj in renderIndex)
+        firstFrames = loadFrames(trajPaths[0])
+        stitched = np.lib.format.open_memmap(stitchedPath, mode='w+', dtype=firstFrames.dtype, shape=(numFrames,) + firstFrames.shape[1:])
+        frameOffset = 0
+        for trajPath in trajPaths:
+            frames = loadFrames(trajPath)
+            stitched[frameOffset: frameOffset + len(frames)] = frames
+            frameOffset += len(frames)
+        stitched.flush()
+        del stitched
+    else:
+        import imageio
+        with imageio.get_writer(stitchedPath, fps=fps) as writer:
+            for trajPath in trajPaths:
+                [writer.append_data(frame) for frame in imageio.get_reader(trajPath)]
+    return stitchedPath
@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.maddpg.rlTools.RLrun import SampleOneStep, SampleRepeatedStep, SampleRepeatedBatchStep
+from src.functionTools.experiment import getCondition, getNumDecisionSteps
+
+# a world whose state is a counter per agent: each physics step adds the action, the reward is the new counter and
+# the world is terminal once an agent's counter reaches killThreshold
+killThreshold = 5.0
+transit = lambda state, action: np.asarray(state) + np.asarray(action)
+getReward = lambda state, action, nextState: list(np.asarray(nextState, dtype=float))
+isTerminal = lambda state: bool(np.any(np.asarray(state) >= killThreshold))
+
+
+def batchRewardFunc(states, actions, nextStates):
+    return np.asarray(nextStates, dtype=float).copy(), np.any(nextStates >= killThreshold, axis=1)
+
+
+def testRepeatOneIsSampleOneStep():
+    state, action = np.array([0.0, 1.0]), np.array([1.0, 0.5])
+    reward, nextState = SampleRepeatedStep(transit, getReward, isTerminal, 1)(state, action)
+    expectedReward, expectedNextState = SampleOneStep(transit, getReward)(state, action)
+    np.testing.assert_array_equal(reward, expectedReward)
+    np.testing.assert_array_equal(nextState, expectedNextState)
+
+
+def testRepeatSumsRewardsOfSingleSteps():
+    state, action = np.array([0.0, 0.0]), np.array([1.0, 0.5])
+    reward, nextState = SampleRepeatedStep(transit, getReward, isTerminal, 3)(state, action)
+    sampleOneStep = SampleOneStep(transit, getReward)
+    expectedReward = np.zeros(2)
+    for substep in range(3):
+        substepReward, state = sampleOneStep(state, action)
+        expectedReward += substepReward
+    np.testing.assert_allclose(reward, expectedReward)
+    np.testing.assert_array_equal(nextState, state)
+
+
+def testKillEndsRepeatEarly():
+    reward, nextState = SampleRepeatedStep(transit, getReward, isTerminal, 4)(np.array([3.0, 0.0]), np.array([1.0, 1.0]))
+    np.testing.assert_array_equal(nextState, [5.0, 2.0])
+    np.testing.assert_allclose(reward, [4.0 + 5.0, 1.0 + 2.0])
+
+
+def testBatchStepMatchesSequentialStepPerWorld():
+    rng = np.random.RandomState(0)
+    states, actions = rng.uniform(0, 4, size=(6, 2)), rng.uniform(0, 1, size=(6, 2))
+    (rewards, terminal), nextStates = SampleRepeatedBatchStep(transit, batchRewardFunc, 3)(states.copy(), actions)
+    sampleRepeatedStep = SampleRepeatedStep(transit, getReward, isTerminal, 3)
+    for world in range(len(states)):
+        reward, nextState = sampleRepeatedStep(states[world], actions[world])
+        np.testing.assert_allclose(rewards[world], reward)
+        np.testing.assert_allclose(nextStates[world], nextState)
+        assert terminal[world] == isTerminal(nextState)
+
+
+def testDecisionStepsRoundUp():
+    assert [getNumDecisionSteps(getCondition(3, actionRepeat=repeat)) for repeat in [1, 2, 3, 4]] == [75, 38, 25, 19]
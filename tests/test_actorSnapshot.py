@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from src.functionTools.loadSaveModel import saveActorWeights, loadActorWeights
+from src.maddpg.trainer.numpyActor import ActByActorWeights
+
+layerShapes = [(10, 8), (8,), (8, 8), (8,), (8, 5), (5,)]
+
+
+class ParamStub:
+    def __init__(self, name):
+        self.name = name
+
+
+class GraphStub:
+    def __init__(self, params):
+        self.collections = {"actorTrainParams_": [params]}
+
+    def get_collection_ref(self, name):
+        return self.collections[name]
+
+
+class ModelStub:
+    # the parts of an agent's session saveActorWeights uses: the actorTrainParams_ collection and run
+    def __init__(self, weights):
+        self.weights = weights
+        self.graph = GraphStub([ParamStub('actor/trainHidden/Agent0/param{}:0'.format(i)) for i in range(len(weights))])
+
+    def run(self, params_):
+        return [weight.copy() for weight in self.weights]
+
+
+def sampleWeights(seed):
+    rng = np.random.RandomState(seed)
+    return [rng.randn(*shape) for shape in layerShapes]
+
+
+def actByActorGraphOps(weights, states, sampleNoise, actionRange = 1):
+    # the actor of BuildMADDPGModels op by op for one state: relu fully connected layers, linear output, actionRange,
+    # gumbel noise and softmax
+    activation = states
+    for layer in range(len(weights) // 2 - 1):
+        activation = np.maximum(np.dot(activation, weights[2 * layer]) + weights[2 * layer + 1], 0)
+    trainAction = (np.dot(activation, weights[-2]) + weights[-1]) * actionRange
+    noisyAction = trainAction - np.log(-np.log(sampleNoise))
+    return np.exp(noisyAction) / np.sum(np.exp(noisyAction))
+
+
+def testSnapshotRoundTrip(tmp_path):
+    weights = sampleWeights(0)
+    path = str(tmp_path / 'snapshot.npz')
+    saveActorWeights(ModelStub(weights), path, {'agentID': 0, 'episode': 100})
+    loadedWeights, header = loadActorWeights(path)
+    assert header['agentID'] == 0 and header['episode'] == 100 and header['dtype'] == 'float32'
+    assert len(header['paramNames']) == len(weights)
+    [np.testing.assert_array_equal(loadedWeight, weight.astype(np.float32)) for loadedWeight, weight in zip(loadedWeights, weights)]
+
+
+def testFloat16SnapshotIsClose(tmp_path):
+    weights = sampleWeights(1)
+    path = str(tmp_path / 'snapshot.npz')
+    saveActorWeights(ModelStub(weights), path, {}, float16=True)
+    loadedWeights, header = loadActorWeights(path)
+    assert header['dtype'] == 'float16'
+    [np.testing.assert_allclose(loadedWeight, weight, rtol=1e-3, atol=1e-3) for loadedWeight, weight in zip(loadedWeights, weights)]
+
+
+def testChangedSnapshotIsRejected(tmp_path):
+    weights = sampleWeights(2)
+    path = str(tmp_path / 'snapshot.npz')
+    saveActorWeights(ModelStub(weights), path, {})
+    with np.load(path) as snapshotFile:
+        arrays = {name: snapshotFile[name] for name in snapshotFile.files}
+    arrays['param0'] = arrays['param0'] + 1
+    np.savez(path, **arrays)
+    with pytest.raises(ValueError):
+        loadActorWeights(path)
+
+
+def testNumpyActorMatchesActorGraphOps():
+    weights = sampleWeights(3)
+    states = np.random.RandomState(4).randn(6, 10)
+    np.random.seed(5)
+    actions = ActByActorWeights(weights, actionRange=2)(states)
+    np.random.seed(5)
+    sampleNoise = np.random.uniform(size=(6, 5))
+    expectedActions = [actByActorGraphOps(weights, state, noise, 2) for state, noise in zip(states, sampleNoise)]
+    np.testing.assert_allclose(actions, expectedActions, rtol=1e-4, atol=1e-6)
+
+    noiselessActions = ActByActorWeights(weights, noisy=False)(states)
+    np.testing.assert_allclose(noiselessActions, [actByActorGraphOps(weights, state, np.exp(-1.0)) for state in states], rtol=1e-4, atol=1e-6)
+
+
+def testNumpyActorMatchesActorGraph(tmp_path):
+    pytest.importorskip('tensorflow.contrib.layers')
+    from src.maddpg.trainer.MADDPG import BuildMADDPGModels
+    obsShape = [10, 10, 8]
+    model = BuildMADDPGModels(5, len(obsShape), obsShape, actionRange=2)([16, 16], 1)
+    path = str(tmp_path / 'snapshot.npz')
+    saveActorWeights(model, path, {'agentID': 1})
+    weights, header = loadActorWeights(path)
+
+    allAgentsStates = [np.random.RandomState(6).randn(6, agentObsDim) for agentObsDim in obsShape]
+    trainAction = model.run(model.graph.get_collection_ref("trainAction_")[0],
+                            feed_dict=dict(zip(model.graph.get_collection_ref("allAgentsStates_")[0], allAgentsStates)))
+    expectedActions = np.exp(trainAction) / np.sum(np.exp(trainAction), axis=-1, keepdims=True)
+    np.testing.assert_allclose(ActByActorWeights(weights, actionRange=2, noisy=False)(allAgentsStates[1]), expectedActions, rtol=1e-4, atol=1e-6)
@@ -0,0 +1,55 @@
+import csv
+import numpy as np
+
+from src.functionTools.backgroundEvaluation import EvaluateActorWeights, BackgroundEvaluator
+from src.functionTools.experiment import getCondition, buildEnvFromCondition, getNumDecisionSteps
+from src.functionTools.vectorizedEvaluation import SampleTrajKillsInLockstep, EvaluateTrajKillsInLockstep
+from src.maddpg.trainer.numpyActor import ActByActorWeights
+
+condition = getCondition(4, maxTimeStep=30, killProportion=1.0)
+numTrajectories = 20
+
+
+def sampleActorWeights(seed):
+    rng = np.random.RandomState(seed)
+    env = buildEnvFromCondition(condition, batch=True)
+    obsShape = [agentObs.shape[1] for agentObs in env['observe'](env['reset'](1))]
+    return [[rng.randn(obsDim, 8), rng.randn(8), rng.randn(8, 5), rng.randn(5)] for obsDim in obsShape]
+
+
+def evaluateInTrainer(allAgentsActorWeights, evalSeed):
+    # what evaluate.py does with actor snapshots, in the trainer's own process
+    env = buildEnvFromCondition(condition, batch=True)
+    actors = [ActByActorWeights(actorWeights) for actorWeights in allAgentsActorWeights]
+    batchPolicy = lambda states: np.stack([actor(agentObs) for actor, agentObs in zip(actors, env['observe'](states))], axis=1)
+    sampleTrajKillsInLockstep = SampleTrajKillsInLockstep(getNumDecisionSteps(condition), env['reset'], env['transit'], env['rewardFunc'],
+                                                          env['predatorsID'], condition['killReward'])
+    np.random.seed(evalSeed)
+    trajKills, meanTrajKill, seTrajKill, trajPerSecond = EvaluateTrajKillsInLockstep(sampleTrajKillsInLockstep, numTrajectories)(
+        batchPolicy, numTrajectories)
+    return meanTrajKill, seTrajKill
+
+
+def testEvaluationMatchesEvaluationInTrainerAndRepeats():
+    allAgentsActorWeights = sampleActorWeights(0)
+    evaluateActorWeights = EvaluateActorWeights(condition, numTrajectories, 3)
+    np.random.seed(100)
+    meanAndSE = evaluateActorWeights(allAgentsActorWeights)
+    assert meanAndSE == evaluateInTrainer(allAgentsActorWeights, 3) and meanAndSE[0] > 0
+    assert evaluateActorWeights(allAgentsActorWeights) == meanAndSE
+
+
+def testBackgroundEvaluatorRecordsLastSnapshot(tmp_path):
+    recordPath = str(tmp_path / 'duringTraining.csv')
+    backgroundEvaluator = BackgroundEvaluator(condition, numTrajectories, 3, recordPath)
+    backgroundEvaluator.start()
+    allAgentsActorWeights = sampleActorWeights(1)
+    [backgroundEvaluator.put((episode, np.ones(5), allAgentsActorWeights)) for episode in [10, 20, 30]]
+    backgroundEvaluator.close()
+
+    assert backgroundEvaluator.process.exitcode == 0
+    with open(recordPath) as recordFile:
+        records = list(csv.DictReader(recordFile))
+    assert 1 <= len(records) <= 3 and records[-1]['episode'] == '30'
+    meanTrajKill, seTrajKill = evaluateInTrainer(allAgentsActorWeights, 3)
+    assert float(records[-1]['meanTrajKill']) == meanTrajKill and float(records[-1]['trainEpisodeReward']) == 5.0
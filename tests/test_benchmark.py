@@ -0,0 +1,20 @@
+from benchmarks.benchmark import runBenchmarks, compareWithBaseline, getResultKey
+
+
+def testSmallSweepMeasuresEveryCase():
+    results = runBenchmarks([3, 4], [2], [32], [], 0.001, runLearner=False)
+    assert [getResultKey(result) for result in results] == [('environment', 3, 2, None), ('replay', 3, 2, 32),
+                                                            ('environment', 4, 2, None), ('replay', 4, 2, 32)]
+    assert all(value > 0 for result in results for metric, value in result.items() if metric.endswith('PerSec'))
+
+
+def testOnlySlowdownsBeyondToleranceAreRegressions():
+    baseline = [{'name': 'environment', 'numPredators': 3, 'numBlocks': 2, 'transitStepsPerSec': 100.0, 'observeCallsPerSec': 100.0},
+                {'name': 'replay', 'numPredators': 3, 'numBlocks': 2, 'batchSize': 32, 'replaySamplesPerSec': 100.0}]
+    results = [{'name': 'environment', 'numPredators': 3, 'numBlocks': 2, 'transitStepsPerSec': 85.0, 'observeCallsPerSec': 70.0},
+               {'name': 'replay', 'numPredators': 3, 'numBlocks': 2, 'batchSize': 32, 'replaySamplesPerSec': 150.0},
+               {'name': 'replay', 'numPredators': 6, 'numBlocks': 2, 'batchSize': 32, 'replaySamplesPerSec': 1.0}]
+    regressions = compareWithBaseline(results, baseline, 0.2)
+    assert regressions == [(('environment', 3, 2, None), 'observeCallsPerSec', 0.7)]
+    assert results[0]['transitStepsPerSecVsBaseline'] == 0.85 and results[1]['replaySamplesPerSecVsBaseline'] == 1.5
+    assert 'replaySamplesPerSecVsBaseline' not in results[2]
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pytest
+
+pg = pytest.importorskip('pygame')
+from src.visualize.drawDemo import DrawBackground, DrawState, getHeadlessScreen, WriteFramesPerTrajectory
+
+# DrawState positions agents with np.int, which numpy removed in 1.24 (requirements.txt pins 1.16)
+pytestmark = pytest.mark.skipif(not hasattr(np, 'int'), reason="drawDemo needs numpy < 1.24")
+
+numPredators, numPrey, numBlocks = 2, 1, 1
+predatorsID, preyGroupID = [0, 1], [2]
+screenSize = 120
+
+
+def buildHeadlessDrawState(saveImage, imagePath, recordFrame):
+    screen = getHeadlessScreen(screenSize, screenSize)
+    drawBackground = DrawBackground(screen, (0, 0, 0), [0, screenSize], [0, screenSize], (255, 255, 255), 2, handleEvents=False)
+    colors = [(255, 255, 255)] * numPredators + [(0, 255, 0)] * numPrey + [(128, 128, 128)] * numBlocks
+    sizes = [4] * numPredators + [3] * numPrey + [10] * numBlocks
+    return DrawState(10, screen, colors, sizes, list(range(numPredators + numPrey + numBlocks)), [0, 1], saveImage, imagePath,
+                     preyGroupID, predatorsID, drawBackground, display=False, recordFrame=recordFrame)
+
+
+def sampleStatesAndStatus(numSteps):
+    rng = np.random.RandomState(0)
+    states = rng.uniform(-0.9, 0.9, size=(numSteps, numPredators + numPrey + numBlocks, 4))
+    agentsStatus = [[0, 0, 0], ['bite', 0, 'bite'], [0, 0, 0], ['bite', 'bite', 'kill'], [0, 0, 0]]
+    return states, agentsStatus[:numSteps]
+
+
+def testRecordedFramesMatchSavedImages(tmp_path):
+    imagePath = str(tmp_path / 'png')
+    os.makedirs(imagePath)
+    writeFrames = WriteFramesPerTrajectory('npz')
+    drawState = buildHeadlessDrawState(True, imagePath, writeFrames)
+    states, agentsStatus = sampleStatesAndStatus(5)
+    [drawState(state, status) for state, status in zip(states, agentsStatus)]
+
+    frames = np.load(writeFrames.writeTrajectory(str(tmp_path / 'traj0')))['frames']
+    assert frames.shape == (5, screenSize, screenSize, 3) and writeFrames.frames == []
+    for frameIndex, frame in enumerate(frames):
+        savedImage = pg.image.load(os.path.join(imagePath, str(frameIndex) + '.png'))
+        np.testing.assert_array_equal(pg.surfarray.array3d(savedImage).transpose(1, 0, 2), frame)
+
+
+def testFramesShowAgentsAndStatus(tmp_path):
+    writeFrames = WriteFramesPerTrajectory('npy')
+    drawState = buildHeadlessDrawState(False, str(tmp_path), writeFrames)
+    states, agentsStatus = sampleStatesAndStatus(2)
+    [drawState(state, status) for state, status in zip(states, agentsStatus)]
+    frames = np.load(writeFrames.writeTrajectory(str(tmp_path / 'traj0')))
+    predatorPixel = [int((coordinate + 1) * screenSize / 2) for coordinate in states[1, 0, 0:2]]
+    np.testing.assert_array_equal(frames[1, predatorPixel[1], predatorPixel[0]], [100, 0, 0])
+    assert not np.any(np.all(frames[0] == [100, 0, 0], axis=-1))
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow.contrib.layers')
+
+from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainCriticBySASR
+from src.maddpg.trainer.ensembleMADDPG import BuildEnsembleMADDPGModels, TrainEnsembleCritic, SaveSeedVariables
+from src.functionTools.experiment import actionDim
+from src.functionTools.loadSaveModel import saveVariables, restoreVariables
+
+layersWidths = [16, 16]
+obsShape = [10, 10, 10, 8]
+numAgents, numSeeds, batchSize = len(obsShape), 3, 8
+
+
+def sampleEnsembleMiniBatch(rng):
+    allAgentsStates = [rng.randn(numSeeds, batchSize, agentObsDim) for agentObsDim in obsShape]
+    allAgentsActions = [rng.dirichlet(np.ones(actionDim), (numSeeds, batchSize)) for agentObsDim in obsShape]
+    allAgentsRewards = rng.randn(numSeeds, batchSize, numAgents)
+    allAgentsNextStates = [rng.randn(numSeeds, batchSize, agentObsDim) for agentObsDim in obsShape]
+    return allAgentsStates, allAgentsActions, allAgentsRewards, allAgentsNextStates
+
+
+def getSeedMiniBatch(ensembleMiniBatch, seed):
+    # one seed's slice in the per-sample layout TrainCriticBySASR takes
+    allAgentsStates, allAgentsActions, allAgentsRewards, allAgentsNextStates = ensembleMiniBatch
+    getSamples = lambda allAgentsValues: [[agentValues[seed, sample] for agentValues in allAgentsValues] for sample in range(batchSize)]
+    return getSamples(allAgentsStates), getSamples(allAgentsActions), getSamples(allAgentsNextStates), list(allAgentsRewards[seed])
+
+
+def getSeedModels(ensembleModel, buildMADDPGModels, modelDir):
+    exportModel = buildMADDPGModels(layersWidths, 0)
+    modelDir.mkdir(exist_ok=True)
+    seedModels = []
+    for seed in range(numSeeds):
+        path = str(modelDir / 'seed{}'.format(seed) / 'agent0')
+        SaveSeedVariables(seed, exportModel, saveVariables)(ensembleModel, path)
+        seedModels.append(restoreVariables(buildMADDPGModels(layersWidths, 0), path))
+    return seedModels
+
+
+def runOutputs(model, allAgentsStates, allAgentsNextStates, allAgentsNextActions):
+    # the deterministic actor action and, with no reward and gamma 1, the target critic's value
+    graph = model.graph
+    getCollection = lambda key: graph.get_collection_ref(key)[0]
+    feedDict = dict(zip(getCollection('allAgentsStates_'), allAgentsStates))
+    feedDict.update(zip(getCollection('allAgentsNextStates_'), allAgentsNextStates))
+    feedDict.update(zip(getCollection('allAgentsNextActionsByTargetNet_'), allAgentsNextActions))
+    feedDict.update({getCollection('agentReward_'): np.zeros(np.shape(allAgentsStates[0])[:-1] + (1,)), getCollection('gamma_'): 1.0})
+    return model.run([getCollection('trainAction_'), getCollection('yi_')], feed_dict=feedDict)
+
+
+def testEachSeedMatchesSingleSeedModel(tmp_path):
+    ensembleModel = BuildEnsembleMADDPGModels(numSeeds, actionDim, numAgents, obsShape)(layersWidths, 0)
+    seedModels = getSeedModels(ensembleModel, BuildMADDPGModels(actionDim, numAgents, obsShape), tmp_path)
+    allAgentsStates, allAgentsActions, allAgentsRewards, allAgentsNextStates = sampleEnsembleMiniBatch(np.random.RandomState(0))
+
+    ensembleOutputs = runOutputs(ensembleModel, allAgentsStates, allAgentsNextStates, allAgentsActions)
+    for seed, seedModel in enumerate(seedModels):
+        getSeed = lambda allAgentsValues: [agentValues[seed] for agentValues in allAgentsValues]
+        seedOutputs = runOutputs(seedModel, getSeed(allAgentsStates), getSeed(allAgentsNextStates), getSeed(allAgentsActions))
+        [np.testing.assert_allclose(ensembleOutput[seed], seedOutput, rtol=1e-5, atol=1e-6)
+         for ensembleOutput, seedOutput in zip(ensembleOutputs, seedOutputs)]
+
+
+def testEnsembleCriticStepMatchesSingleSeedSteps(tmp_path):
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape)
+    ensembleModel = BuildEnsembleMADDPGModels(numSeeds, actionDim, numAgents, obsShape)(layersWidths, 0)
+    seedModels = getSeedModels(ensembleModel, buildMADDPGModels, tmp_path / 'before')
+
+    # deterministic target actions, so the only difference between the runs is the batched graph
+    actByEnsembleTarget = lambda model, allAgentsNextStates: np.full((numSeeds, batchSize, actionDim), 1.0 / actionDim)
+    actBySeedTarget = lambda model, allAgentsNextStatesBatch: np.full((len(allAgentsNextStatesBatch), actionDim), 1.0 / actionDim)
+    ensembleMiniBatch = sampleEnsembleMiniBatch(np.random.RandomState(0))
+    TrainEnsembleCritic(actByEnsembleTarget, 0.01, 0.95)(0, [ensembleModel] * numAgents, ensembleMiniBatch)
+    trainCriticBySASR = TrainCriticBySASR(actBySeedTarget, 0.01, 0.95)
+    [trainCriticBySASR(0, [seedModel] * numAgents, *getSeedMiniBatch(ensembleMiniBatch, seed)) for seed, seedModel in enumerate(seedModels)]
+
+    trainedSeedModels = getSeedModels(ensembleModel, buildMADDPGModels, tmp_path / 'after')
+    for seedModel, trainedSeedModel in zip(seedModels, trainedSeedModels):
+        getCriticParams = lambda model: model.run(model.graph.get_collection_ref('criticTrainParams_')[0])
+        [np.testing.assert_allclose(trainedParam, param, rtol=1e-4, atol=1e-6)
+         for trainedParam, param in zip(getCriticParams(trainedSeedModel), getCriticParams(seedModel))]
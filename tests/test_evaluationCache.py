@@ -0,0 +1,43 @@
+import csv
+import os
+
+from src.functionTools.evaluationCache import EvaluationCache, getCheckpointFilesHash, getEvaluationCacheKey, appendEvaluationRecord
+from src.functionTools.experiment import getCondition
+
+
+def testCacheRoundTripAndKeyFields(tmp_path):
+    evaluationCache = EvaluationCache(str(tmp_path / 'cache'))
+    getKey = lambda condition: getEvaluationCacheKey(condition, 'hash', 0, 1000, targetSE=0.0, numWorlds=0)
+    evaluationCache.put(getKey(getCondition(3)), {'meanTrajKill': 1.5})
+    assert evaluationCache.get(getKey(getCondition(3))) == {'meanTrajKill': 1.5}
+    # the same weights under another action repeat, observation mode, critic or seed are another evaluation
+    for otherCondition in [getCondition(3, actionRepeat=2), getCondition(3, numNearestPredators=2), getCondition(3, criticPooling='mean'),
+                           getCondition(3, trainSeed=1), getCondition(3, cost=0.1)]:
+        assert evaluationCache.get(getKey(otherCondition)) is None
+    assert evaluationCache(getKey(getCondition(3, actionRepeat=2)), lambda: {'meanTrajKill': 0.5}) == {'meanTrajKill': 0.5}
+    assert evaluationCache.get(getKey(getCondition(3, actionRepeat=2))) == {'meanTrajKill': 0.5}
+
+
+def testCheckpointHashSkipsMetaGraph(tmp_path):
+    modelPath = str(tmp_path / 'model_agent0')
+    writeFile = lambda suffix, content: open(modelPath + suffix, 'w').write(content)
+    writeFile('.index', 'index')
+    writeFile('.data-00000-of-00001', 'weights')
+    writeFile('.meta', 'graph')
+    checkpointHash = getCheckpointFilesHash([modelPath])
+    writeFile('.meta', 'edited graph')
+    assert getCheckpointFilesHash([modelPath]) == checkpointHash
+    writeFile('.data-00000-of-00001', 'other weights')
+    assert getCheckpointFilesHash([modelPath]) != checkpointHash
+
+
+def testRecordWithNewColumnsRewritesEarlierFile(tmp_path):
+    path = str(tmp_path / 'record.csv')
+    appendEvaluationRecord(path, {'numPredators': 3, 'meanTrajKill': 1.0})
+    appendEvaluationRecord(path, {'numPredators': 3, 'actionRepeat': 2, 'meanTrajKill': 2.0})
+    appendEvaluationRecord(path, {'numPredators': 4, 'actionRepeat': 1, 'meanTrajKill': 3.0})
+    with open(path, newline='') as recordFile:
+        rows = list(csv.DictReader(recordFile))
+    assert [row['actionRepeat'] for row in rows] == ['', '2', '1']
+    assert [row['meanTrajKill'] for row in rows] == ['1.0', '2.0', '3.0']
+    assert sorted(os.listdir(str(tmp_path))) == ['record.csv']
@@ -0,0 +1,45 @@
+import csv
+import json
+import os
+
+from exec.evaluationDaemon import queueSubDirs, submitJob, claimNextJob, serve
+
+
+def makeQueue(tmp_path):
+    queueDir = str(tmp_path / 'queue')
+    [os.makedirs(os.path.join(queueDir, subDir)) for subDir in queueSubDirs]
+    return queueDir
+
+
+def evaluateJob(job):
+    if job['numPredators'] < 0:
+        raise ValueError("no predators")
+    return {'jobID': job['jobID'], 'numPredators': job['numPredators'], 'meanTrajKill': 2.0 * job['numPredators'],
+            'seTrajKill': 0.1, 'numTrajectories': 100, 'evalSeconds': 0.0}
+
+
+def testClaimedJobIsNotClaimedAgain(tmp_path):
+    queueDir = makeQueue(tmp_path)
+    jobID = submitJob(queueDir, {'numPredators': 3})
+    runningPath = claimNextJob(queueDir)
+    assert runningPath == os.path.join(queueDir, 'running', jobID + '.json')
+    assert claimNextJob(queueDir) is None
+    with open(runningPath) as jobFile:
+        assert json.load(jobFile) == {'numPredators': 3, 'jobID': jobID}
+
+
+def testServeRecordsResultsAndMovesJobs(tmp_path):
+    queueDir = makeQueue(tmp_path)
+    resultsPath = str(tmp_path / 'results.csv')
+    doneIDs = [submitJob(queueDir, {'numPredators': numPredators}) for numPredators in [3, 4]]
+    failedID = submitJob(queueDir, {'numPredators': -1})
+    serve(queueDir, resultsPath, evaluateJob, 0, exitWhenEmpty=True)
+
+    assert sorted(os.listdir(os.path.join(queueDir, 'done'))) == sorted(jobID + '.json' for jobID in doneIDs)
+    assert os.listdir(os.path.join(queueDir, 'failed')) == [failedID + '.json']
+    assert os.listdir(os.path.join(queueDir, 'pending')) == os.listdir(os.path.join(queueDir, 'running')) == []
+    with open(os.path.join(queueDir, 'failed', failedID + '.json')) as jobFile:
+        assert 'no predators' in jobFile.read()
+    with open(resultsPath) as resultsFile:
+        rows = list(csv.DictReader(resultsFile))
+    assert sorted((row['jobID'], float(row['meanTrajKill'])) for row in rows) == sorted(zip(doneIDs, [6.0, 8.0]))
@@ -0,0 +1,34 @@
+import numpy as np
+
+from src.environment.chasingEnv import BuildChasingEnv
+from src.functionTools.experiment import getCondition, getModelFileName, getTrajFileName, buildEnvFromCondition, getObsShape
+
+# the names train.py and evaluate.py built before sharing experiment construction, with the float values argparse gives
+originalNameFormat = "model{}predators{}prey{}blocks{}episodes{}stepPreySpeed{}PredatorActCost{}sensitive{}biteReward{}killPercent{}"
+
+
+def testDefaultNamesAreOriginalNames():
+    for numPredators, speed, cost, selfish in [(3, 1.0, 0.0, 0.0), (6, 1.15, 0.03, 10000.0)]:
+        condition = getCondition(numPredators, speed, cost, selfish)
+        conditionName = originalNameFormat.format(numPredators, 1, 2, 60000, 75, speed, cost, selfish, 0.0, 0.2)
+        assert getModelFileName(condition) == conditionName + "_agent"
+        assert getTrajFileName(condition) == conditionName + "_Traj"
+
+
+def testNonDefaultArchitecturesGetSuffixes():
+    condition = getCondition(4, numNearestPredators=2, numNearestBlocks=1, criticPooling='mean', trainSeed=3, actionRepeat=2)
+    assert getModelFileName(condition) == originalNameFormat.format(4, 1, 2, 60000, 75, 1.0, 0.0, 0.0, 0.0, 0.2) + \
+        "kNearest2predators1blocksmeanPooledCriticseed3actionRepeat2_agent"
+
+
+def testEnvFromConditionMatchesDirectlyBuiltEnv():
+    condition = getCondition(4, 1.15, 0.03, 2.0)
+    env = buildEnvFromCondition(condition)
+    directEnv = BuildChasingEnv(killReward=10, killProportion=0.2, biteReward=0.0, collisionReward=10)(4, 2, 1.15, 0.03, 2.0)
+    np.random.seed(0)
+    state = env['reset']()
+    action = list(np.random.uniform(0, 1, size=(env['numAgents'], 5)))
+    assert getObsShape(env) == getObsShape(directEnv) == [18, 18, 18, 18, 16]
+    np.testing.assert_array_equal(env['transit'](state, action), directEnv['transit'](state, action))
+    for agentObs, directAgentObs in zip(env['observe'](state), directEnv['observe'](state)):
+        np.testing.assert_array_equal(agentObs, directAgentObs)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from src.environment.chasingEnv import BuildChasingEnv
+from src.functionTools.goldenTrajectory import SampleRandomAction, SampleChasingAction, RecordGoldenTrajectories, ReplayGoldenTrajectories, \
+    CompareWithGoldenTrajectories, saveGoldenTrajectories, loadGoldenTrajectories
+
+condition = {'numPredators': 3, 'numBlocks': 2, 'preySpeedMultiplier': 1.0, 'costActionRatio': 0.0, 'selfishIndex': 0.0}
+
+
+def recordGolden(tmp_path):
+    env = BuildChasingEnv()(**condition)
+    sampleAction = SampleChasingAction(env['predatorsID'], env['preyGroupID'][0], SampleRandomAction(env['numAgents'], 5, 0))
+    golden = RecordGoldenTrajectories(env['reset'], env['transit'], env['rewardFunc'], env['isTerminal'], sampleAction, 30, 0)(4)
+    path = str(tmp_path / 'golden.npz')
+    saveGoldenTrajectories(golden, path, condition)
+    return loadGoldenTrajectories(path)
+
+
+def getReplay(env):
+    return ReplayGoldenTrajectories(env['transit'], env['rewardFunc'], env['isTerminal'])
+
+
+def testReferenceReproducesItself(tmp_path):
+    golden, loadedCondition = recordGolden(tmp_path)
+    assert loadedCondition == condition
+    replay = getReplay(BuildChasingEnv()(**condition))
+    report = CompareWithGoldenTrajectories(replay, getReplay(BuildChasingEnv()(**condition)), numTimedRepeats=2)(golden)
+    assert report['referenceMatchesGolden']
+    assert report['maxStateDeviation'] == 0 and report['maxRewardDeviation'] == 0 and report['numTerminalMismatches'] == 0
+    assert report['numSteps'] == len(golden['states']) and report['numTrajectories'] == 4
+
+
+def testPerturbedCandidateIsReported(tmp_path):
+    golden, loadedCondition = recordGolden(tmp_path)
+    env = BuildChasingEnv()(**condition)
+    candidateEnv = {**env, 'transit': lambda state, action: np.array(env['transit'](state, action)) + 1e-6}
+    report = CompareWithGoldenTrajectories(getReplay(env), getReplay(candidateEnv), numTimedRepeats=0)(golden)
+    assert report['referenceMatchesGolden']
+    np.testing.assert_allclose(report['maxStateDeviation'], 1e-6, rtol=1e-3)
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow.contrib.layers')
+
+from src.maddpg.trainer.MADDPG import BuildMADDPGModels
+from src.functionTools.experiment import getCondition, buildEnvFromCondition, getObsShape, actionDim
+from src.functionTools.loadSaveModel import saveVariables, restoreVariables
+
+layersWidths = [16, 16]
+batchSize = 8
+
+
+def getEnvShapes():
+    env = buildEnvFromCondition(getCondition(3))
+    return env['numAgents'], getObsShape(env)
+
+
+def getCriticFeed(graph, obsShape, rng):
+    getCollection = lambda key: graph.get_collection_ref(key)[0]
+    feedDict = {state_: rng.randn(batchSize, agentObsDim) for state_, agentObsDim in zip(getCollection('allAgentsStates_'), obsShape)}
+    feedDict.update({state_: rng.randn(batchSize, agentObsDim) for state_, agentObsDim in zip(getCollection('allAgentsNextStates_'), obsShape)})
+    feedDict.update({action_: rng.dirichlet(np.ones(actionDim), batchSize) for action_ in getCollection('allAgentsActions_')})
+    feedDict.update({action_: rng.dirichlet(np.ones(actionDim), batchSize) for action_ in getCollection('allAgentsNextActionsByTargetNet_')})
+    feedDict.update({getCollection('agentReward_'): rng.randn(batchSize, 1), getCollection('gamma_'): 0.95,
+                     getCollection('learningRate_'): 0.01})
+    return feedDict
+
+
+def runCriticStep(model, obsShape):
+    # the critic loss before and after one critic update, and the actor's deterministic action, all for fixed inputs
+    graph = model.graph
+    getCollection = lambda key: graph.get_collection_ref(key)[0]
+    feedDict = getCriticFeed(graph, obsShape, np.random.RandomState(0))
+    lossBefore, _ = model.run([getCollection('valueLoss_'), getCollection('crticTrainOpt_')], feed_dict=feedDict)
+    lossAfter = model.run(getCollection('valueLoss_'), feed_dict=feedDict)
+    trainAction = model.run(getCollection('trainAction_'), feed_dict=feedDict)
+    return lossBefore, lossAfter, trainAction
+
+
+@pytest.mark.parametrize('criticPooling', [None, 'mean'])
+def testCachedGraphMatchesBuiltGraph(tmp_path, monkeypatch, criticPooling):
+    numAgents, obsShape = getEnvShapes()
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape, graphCacheDir=str(tmp_path / 'graphCache'),
+                                          criticPooling=criticPooling)
+    builtModel = buildMADDPGModels(layersWidths, 1)
+    graphCachePath = buildMADDPGModels.getGraphCachePath(layersWidths, 1)
+    assert os.path.exists(graphCachePath + '.meta') and os.path.exists(graphCachePath + '.json')
+
+    def buildGraph(layersWidths, agentID):
+        raise AssertionError("the second build should import the cached graph")
+    monkeypatch.setattr(buildMADDPGModels, 'buildGraph', buildGraph)
+    cachedModel = buildMADDPGModels(layersWidths, 1)
+
+    assert sorted(cachedModel.graph.get_all_collection_keys()) == sorted(builtModel.graph.get_all_collection_keys())
+    checkpointPath = str(tmp_path / 'model' / 'agent1')
+    saveVariables(builtModel, checkpointPath)
+    restoreVariables(cachedModel, checkpointPath)
+    for builtResult, cachedResult in zip(runCriticStep(builtModel, obsShape), runCriticStep(cachedModel, obsShape)):
+        np.testing.assert_allclose(cachedResult, builtResult, rtol=1e-5, atol=1e-6)
+
+
+def testGraphCachePathChangesWithSettingsAndSources(tmp_path, monkeypatch):
+    numAgents, obsShape = getEnvShapes()
+    graphCacheDir = str(tmp_path)
+    getPath = lambda **settings: BuildMADDPGModels(actionDim, numAgents, obsShape, graphCacheDir=graphCacheDir, **settings)\
+        .getGraphCachePath(layersWidths, 0)
+    assert getPath() == getPath()
+    assert len({getPath(), getPath(criticPooling='mean'), getPath(actionRange=2)}) == 3
+    assert BuildMADDPGModels(actionDim, numAgents, obsShape, graphCacheDir=graphCacheDir).getGraphCachePath(layersWidths, 1) != getPath()
+
+    sourcePath = tmp_path / 'graphSource.py'
+    sourcePath.write_text("layers = 2\n")
+    monkeypatch.setattr(BuildMADDPGModels, 'getGraphSourceFiles', lambda self: [str(sourcePath)])
+    pathBeforeEdit = getPath()
+    sourcePath.write_text("layers = 3\n")
+    assert getPath() != pathBeforeEdit
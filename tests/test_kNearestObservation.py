@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.environment.vectorizedEnv import BatchObserveKNearest
+from src.functionTools.experiment import getCondition, buildEnvFromCondition
+
+numPredators, numBlocks = 4, 3
+predatorsID, preyGroupID, blocksID = [0, 1, 2, 3], [4], [5, 6, 7]
+
+
+def observeKNearestOfOneAgent(state, agentID, numNearestPredators, numNearestBlocks):
+    # one agent, one world at a time: sort the other predators and the blocks by distance, keep k of each
+    agentPos = state[agentID, 0:2]
+
+    def encodeNearest(entitiesID, numNearest):
+        relativePos = sorted((state[entityID, 0:2] - agentPos for entityID in entitiesID), key=np.linalg.norm)[:numNearest]
+        encoded = [list(pos) + [1.0] for pos in relativePos] + [[0.0, 0.0, 0.0]] * (numNearest - len(relativePos))
+        return np.concatenate(encoded)
+
+    otherPredatorsID = [predatorID for predatorID in predatorsID if predatorID != agentID]
+    otherPreyID = [preyID for preyID in preyGroupID if preyID != agentID]
+    otherPreyPos = [state[preyID, 0:2] - agentPos for preyID in otherPreyID]
+    otherPreyVel = [state[preyID, 2:4] for preyID in otherPreyID]
+    return np.concatenate([state[agentID, 2:4], agentPos, encodeNearest(blocksID, numNearestBlocks),
+                           encodeNearest(otherPredatorsID, numNearestPredators)] + otherPreyPos + otherPreyVel)
+
+
+def testBatchObservationMatchesPerAgentSorting():
+    states = np.random.RandomState(0).uniform(-1, 1, size=(6, numPredators + 1 + numBlocks, 4))
+    for numNearestPredators, numNearestBlocks in [(2, 1), (3, 3), (5, 4)]:
+        observe = BatchObserveKNearest(predatorsID, preyGroupID, blocksID, numNearestPredators, numNearestBlocks)
+        observations = observe(states)
+        for agentID, agentObs in zip(predatorsID + preyGroupID, observations):
+            numOtherPredators = numPredators - (agentID in predatorsID)
+            assert agentObs.shape[1] == 4 + 3 * numNearestBlocks + 3 * numNearestPredators + 4 * (agentID in predatorsID)
+            for world, state in enumerate(states):
+                expectedObs = observeKNearestOfOneAgent(state, agentID, numNearestPredators, numNearestBlocks)
+                np.testing.assert_allclose(agentObs[world], expectedObs)
+            presentPredators = agentObs[:, 4 + 3 * numNearestBlocks + 2: 4 + 3 * numNearestBlocks + 3 * numNearestPredators: 3]
+            assert np.all(np.sum(presentPredators, axis=1) == min(numNearestPredators, numOtherPredators))
+
+
+def testSequentialEnvObservesLikeBatchEnv():
+    condition = getCondition(numPredators, numBlocks=numBlocks, numNearestPredators=2, numNearestBlocks=None)
+    env, batchEnv = buildEnvFromCondition(condition), buildEnvFromCondition(condition, batch=True)
+    states = batchEnv['reset'](5)
+    batchObservations = batchEnv['observe'](states)
+    assert [agentObs.shape[1] for agentObs in batchObservations] == [4 + 3 * numBlocks + 3 * 2 + 4] * numPredators + [4 + 3 * numBlocks + 3 * 2]
+    for world, state in enumerate(states):
+        for agentObs, batchAgentObs in zip(env['observe'](state), batchObservations):
+            np.testing.assert_array_equal(agentObs, batchAgentObs[world])
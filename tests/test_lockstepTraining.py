@@ -0,0 +1,60 @@
+import numpy as np
+
+from src.maddpg.rlTools.RLrun import RunEpisode, RunAlgorithm, RunLockstepAlgorithm
+
+# every seed's world is a step counter that is terminal from its seed's kill step on; each step rewards both agents 1
+maxTimeStep, maxEpisode = 5, 4
+seedsKillStep = [3, 1, 10]
+
+
+def runLockstepTimeStep(states, replayBuffers):
+    nextStates = states + 1
+    terminal = nextStates[:, 0] >= np.array(seedsKillStep)[:len(states)]
+    [replayBuffer.append(state) for replayBuffer, state in zip(replayBuffers, states)]
+    return (np.ones((len(states), 2)), terminal), nextStates, replayBuffers
+
+
+def getSequentialEpisodeRewards(killStep, stopTraining = None):
+    runTimeStep = lambda state, replayBuffer: (np.ones(2), state + 1, replayBuffer + [state])
+    runEpisode = RunEpisode(lambda: 0, runTimeStep, maxTimeStep, lambda state: state >= killStep)
+    return RunAlgorithm(runEpisode, maxEpisode, [lambda: None], numAgents=2, stopTraining=stopTraining)([])
+
+
+class StopAfterEpisodes:
+    def __init__(self, numEpisodes):
+        self.numEpisodes = numEpisodes
+        self.episodeRewards = []
+        self.stopReason = "stopped after {} episodes".format(numEpisodes)
+
+    def __call__(self, episodeReward):
+        self.episodeRewards.append(episodeReward)
+        return len(self.episodeRewards) >= self.numEpisodes
+
+
+def testLockstepEpisodesMatchSequentialEpisodes():
+    seedsNumSaves = np.zeros(len(seedsKillStep), dtype=int)
+    seedsSaveModels = [[lambda seed=seed: seedsNumSaves.__setitem__(seed, seedsNumSaves[seed] + 1)] for seed in range(len(seedsKillStep))]
+    batchReset = lambda numWorlds: np.zeros((numWorlds, 1))
+    replayBuffers = [list() for seed in seedsKillStep]
+    seedsEpisodeRewardList = RunLockstepAlgorithm(batchReset, runLockstepTimeStep, maxTimeStep, maxEpisode, seedsSaveModels)(replayBuffers)
+
+    for seed, killStep in enumerate(seedsKillStep):
+        assert seedsEpisodeRewardList[seed] == getSequentialEpisodeRewards(killStep)
+    assert [len(episodeRewardList) for episodeRewardList in seedsEpisodeRewardList] == [maxEpisode] * len(seedsKillStep)
+    np.testing.assert_array_equal(seedsNumSaves, maxEpisode)
+    # the fastest seed keeps stepping until the slowest is done
+    assert len(replayBuffers[1]) == len(replayBuffers[2]) == maxEpisode * maxTimeStep
+
+
+def testStoppedSeedFinishesEarly():
+    finishedSeeds = []
+    seedsStopTraining = [None, StopAfterEpisodes(2), None]
+    finishSeed = lambda seed, numEpisodes, isStopped: finishedSeeds.append((seed, numEpisodes, isStopped))
+    batchReset = lambda numWorlds: np.zeros((numWorlds, 1))
+    seedsEpisodeRewardList = RunLockstepAlgorithm(batchReset, runLockstepTimeStep, maxTimeStep, maxEpisode, [[] for seed in seedsKillStep],
+                                                  seedsStopTraining, finishSeed)([list() for seed in seedsKillStep])
+
+    sequentialStopTraining = StopAfterEpisodes(2)
+    assert seedsEpisodeRewardList[1] == getSequentialEpisodeRewards(seedsKillStep[1], sequentialStopTraining)
+    np.testing.assert_array_equal(seedsStopTraining[1].episodeRewards, sequentialStopTraining.episodeRewards)
+    assert sorted(finishedSeeds) == [(0, maxEpisode, False), (1, 2, True), (2, maxEpisode, False)]
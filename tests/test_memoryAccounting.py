@@ -0,0 +1,55 @@
+import tracemalloc
+from collections import deque
+import numpy as np
+import pytest
+
+from src.functionTools import memoryAccounting
+from src.functionTools.memoryAccounting import estimateTransitionBytes, getReplayCapacity
+
+numAgents, obsDim, actionDim = 4, 16, 5
+
+
+def makeTransition(rng):
+    # the transitions RunTimeStep appends: per-agent observations, per-agent rows of (1, actionDim) action batches,
+    # per-agent rewards and next observations
+    observation = [rng.rand(obsDim) for agentID in range(numAgents)]
+    action = [rng.rand(1, actionDim)[0] for agentID in range(numAgents)]
+    reward = list(rng.rand(numAgents))
+    nextObservation = [rng.rand(obsDim) for agentID in range(numAgents)]
+    return (observation, action, reward, nextObservation)
+
+
+def testEstimateMatchesTracedBufferMemory():
+    rng = np.random.RandomState(0)
+    numTransitions = 20000
+    tracemalloc.start()
+    startBytes = tracemalloc.get_traced_memory()[0]
+    replayBuffer = deque(maxlen=numTransitions)
+    [replayBuffer.append(makeTransition(rng)) for step in range(numTransitions)]
+    bufferBytes = tracemalloc.get_traced_memory()[0] - startBytes
+    tracemalloc.stop()
+    # tracemalloc sees python and numpy allocations but not malloc's own headers, which the estimate includes
+    assert 0.9 * bufferBytes < estimateTransitionBytes(replayBuffer) * numTransitions < 1.3 * bufferBytes
+
+
+@pytest.fixture
+def residentBytes(monkeypatch):
+    monkeypatch.setattr(memoryAccounting, 'getProcessRSS', lambda: 2 ** 30)
+    return 2 ** 30
+
+
+def testCapacityFitsMemoryLimit(residentBytes):
+    assert getReplayCapacity(1e6, 1000, 0) == 1000000
+    assert getReplayCapacity(1e6, 1000, residentBytes + 2 * 10 ** 9) == 1000000
+    assert getReplayCapacity(1e6, 1000, residentBytes + 10 ** 8, numBuffers=2) == 50000
+    # warm-start transitions already built are part of the resident set
+    assert getReplayCapacity(1e6, 1000, residentBytes + 10 ** 8, numResidentTransitions=30000) == 130000
+
+
+def testCapacityBelowMinimumOrWithoutShrinkingRefuses(residentBytes):
+    with pytest.raises(MemoryError):
+        getReplayCapacity(1e6, 1000, residentBytes + 10 ** 8, minCapacity=200000)
+    with pytest.raises(MemoryError):
+        getReplayCapacity(1e6, 1000, residentBytes + 10 ** 8, shrink=False)
+    with pytest.raises(MemoryError):
+        getReplayCapacity(1e6, 1000, residentBytes // 2)
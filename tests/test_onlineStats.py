@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.functionTools.onlineStats import OnlineMeanVariance, SampleUntilStandardError
+
+
+class SampleFixedKills:
+    def __init__(self, trajKills):
+        self.trajKills = list(trajKills)
+        self.chunkSizes = []
+
+    def __call__(self, numTrajectories):
+        self.chunkSizes.append(numTrajectories)
+        chunk, self.trajKills = self.trajKills[:numTrajectories], self.trajKills[numTrajectories:]
+        return chunk
+
+
+def testOnlineMeanVarianceMatchesNumpy():
+    values = np.random.RandomState(0).poisson(0.3, size=1000).astype(float)
+    onlineMeanVariance = OnlineMeanVariance()
+    [onlineMeanVariance(value) for value in values]
+    assert onlineMeanVariance.count == len(values)
+    np.testing.assert_allclose(onlineMeanVariance.mean, np.mean(values))
+    np.testing.assert_allclose(onlineMeanVariance.getVariance(ddof=1), np.var(values, ddof=1))
+    np.testing.assert_allclose(onlineMeanVariance.getStandardError(), np.std(values, ddof=1) / np.sqrt(len(values)))
+
+
+def testSamplesExactlyMaxWithoutTarget():
+    sampleTrajKills = SampleFixedKills(np.ones(1000))
+    trajKillsStats = SampleUntilStandardError(sampleTrajKills, 100, 0, 250)(OnlineMeanVariance())
+    assert trajKillsStats.count == 250 and sampleTrajKills.chunkSizes == [100, 100, 50]
+
+
+def testStopsOnceStandardErrorReachesTarget():
+    trajKills = np.random.RandomState(1).binomial(1, 0.5, size=100000)
+    trajKillsStats = SampleUntilStandardError(SampleFixedKills(trajKills), 100, 0.02, 100000)(OnlineMeanVariance())
+    assert trajKillsStats.getStandardError() <= 0.02
+    assert trajKillsStats.count < 1000
+
+
+def testFirstChunkWithoutKillsDoesNotConverge():
+    # the first chunks have no kill, so their standard error is 0; sampling goes on until kills show up
+    trajKills = np.concatenate([np.zeros(300), np.random.RandomState(2).binomial(1, 0.5, size=100000)])
+    trajKillsStats = SampleUntilStandardError(SampleFixedKills(trajKills), 100, 0.05, 100000)(OnlineMeanVariance())
+    assert trajKillsStats.count > 300 and trajKillsStats.mean > 0
+    assert trajKillsStats.getStandardError() <= 0.05
+
+
+def testNoKillsAtAllSamplesMax():
+    trajKillsStats = SampleUntilStandardError(SampleFixedKills(np.zeros(1000)), 100, 0.05, 500)(OnlineMeanVariance())
+    assert trajKillsStats.count == 500
+
+
+def testSmallChunksWaitForMinimumTrajectories():
+    trajKills = np.random.RandomState(3).binomial(1, 0.5, size=1000)
+    trajKillsStats = SampleUntilStandardError(SampleFixedKills(trajKills), 10, 1.0, 1000)(OnlineMeanVariance())
+    assert trajKillsStats.count == 100
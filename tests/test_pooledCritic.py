@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow.contrib.layers')
+
+from src.maddpg.trainer.MADDPG import BuildMADDPGModels
+from src.functionTools.experiment import actionDim
+
+layersWidths = [16, 16]
+batchSize = 8
+predatorObsDim, preyObsDim = 10, 8
+
+
+def getObsShape(numPredators):
+    return [predatorObsDim] * numPredators + [preyObsDim]
+
+
+def getNumCriticParams(model):
+    return sum(np.prod(param.shape) for param in model.graph.get_collection_ref('criticTrainParams_')[0])
+
+
+def getTargetQ(model, nextStates, nextActions):
+    # with no reward and gamma 1, yi_ is the target critic's value of the next states and actions
+    graph = model.graph
+    getCollection = lambda key: graph.get_collection_ref(key)[0]
+    feedDict = dict(zip(getCollection('allAgentsNextStates_'), nextStates))
+    feedDict.update(zip(getCollection('allAgentsNextActionsByTargetNet_'), nextActions))
+    feedDict.update({getCollection('agentReward_'): np.zeros((batchSize, 1)), getCollection('gamma_'): 1.0})
+    return model.run(getCollection('yi_'), feed_dict=feedDict)
+
+
+def sampleStatesAndActions(obsShape, rng):
+    states = [rng.randn(batchSize, agentObsDim) for agentObsDim in obsShape]
+    actions = [rng.dirichlet(np.ones(actionDim), batchSize) for agentObsDim in obsShape]
+    return states, actions
+
+
+@pytest.mark.parametrize('criticPooling', ['mean', 'attention'])
+def testPooledCriticIsInvariantToOrderOfOtherAgents(criticPooling):
+    obsShape = getObsShape(4)
+    model = BuildMADDPGModels(actionDim, len(obsShape), obsShape, criticPooling=criticPooling)(layersWidths, 1)
+    states, actions = sampleStatesAndActions(obsShape, np.random.RandomState(0))
+    targetQ = getTargetQ(model, states, actions)
+
+    # agent 1 is the critic's own agent; the other predators 0, 2, 3 are reordered
+    permutation = [3, 1, 0, 2, 4]
+    permutedTargetQ = getTargetQ(model, [states[i] for i in permutation], [actions[i] for i in permutation])
+    np.testing.assert_allclose(permutedTargetQ, targetQ, rtol=1e-5, atol=1e-6)
+
+    ownSwap = [1, 0, 2, 3, 4]
+    assert not np.allclose(getTargetQ(model, [states[i] for i in ownSwap], [actions[i] for i in ownSwap]), targetQ)
+
+
+def testConcatCriticDependsOnOrderOfOtherAgents():
+    obsShape = getObsShape(4)
+    model = BuildMADDPGModels(actionDim, len(obsShape), obsShape)(layersWidths, 1)
+    states, actions = sampleStatesAndActions(obsShape, np.random.RandomState(0))
+    permutation = [3, 1, 0, 2, 4]
+    permutedTargetQ = getTargetQ(model, [states[i] for i in permutation], [actions[i] for i in permutation])
+    assert not np.allclose(permutedTargetQ, getTargetQ(model, states, actions))
+
+
+@pytest.mark.parametrize('criticPooling', ['mean', 'attention'])
+def testPooledCriticParamsDoNotGrowWithNumAgents(criticPooling):
+    getModel = lambda numPredators, criticPooling: BuildMADDPGModels(actionDim, numPredators + 1, getObsShape(numPredators),
+                                                                     criticPooling=criticPooling)(layersWidths, 0)
+    assert getNumCriticParams(getModel(3, criticPooling)) == getNumCriticParams(getModel(8, criticPooling))
+    assert getNumCriticParams(getModel(3, None)) < getNumCriticParams(getModel(8, None))
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip('pygame')
+from src.functionTools.trajectoryStore import saveColumnarTrajectories
+from src.visualize.renderTrajectories import BuildHeadlessChaseTrial, RenderTrajectoriesInPool, stitchRenderedTrajectories, \
+    initializeRenderWorker, renderTrajectoryInWorker
+
+# DrawState positions agents with np.int, which numpy removed in 1.24 (requirements.txt pins 1.16)
+pytestmark = pytest.mark.skipif(not hasattr(np, 'int'), reason="drawDemo needs numpy < 1.24")
+
+numPredators, numPrey, numBlocks = 2, 1, 1
+
+
+def saveTrajectories(path, numTrajectories, seed):
+    rng = np.random.RandomState(seed)
+    trajectories = []
+    for trajID in range(numTrajectories):
+        states = rng.uniform(-0.9, 0.9, size=(4 + trajID, numPredators + numPrey + numBlocks, 4))
+        trajectories.append([(state, rng.uniform(size=(3, 5)), rng.uniform(size=3), nextState)
+                             for state, nextState in zip(states[:-1], states[1:])])
+    saveColumnarTrajectories(trajectories, path)
+    return trajectories
+
+
+def testPoolRenderingMatchesSerialRendering(tmp_path):
+    trajectoryPath = str(tmp_path / 'store')
+    trajectories = saveTrajectories(trajectoryPath, 3, 0)
+    buildChaseTrial = BuildHeadlessChaseTrial(numPredators, numPrey, numBlocks, frameFormat='npz', screenWidth=100, screenHeight=100)
+    poolDir, serialDir = str(tmp_path / 'pool'), str(tmp_path / 'serial')
+    renderIndex = RenderTrajectoriesInPool(2, buildChaseTrial, trajectoryPath, poolDir)([2, 0, 1])
+
+    assert [renderedTraj['trajID'] for renderedTraj in renderIndex] == [0, 1, 2]
+    assert [renderedTraj['numFrames'] for renderedTraj in renderIndex] == [len(trajectory) for trajectory in trajectories]
+    assert os.path.exists(os.path.join(poolDir, 'renderIndex.json'))
+
+    os.makedirs(serialDir)
+    initializeRenderWorker(trajectoryPath, buildChaseTrial, serialDir)
+    for renderedTraj in renderIndex:
+        trajID, serialPath, numFrames = renderTrajectoryInWorker(renderedTraj['trajID'])
+        poolFrames = np.load(os.path.join(poolDir, renderedTraj['path']))['frames']
+        np.testing.assert_array_equal(poolFrames, np.load(serialPath)['frames'])
+
+    stitchedFrames = np.load(stitchRenderedTrajectories(poolDir, renderIndex, 'npz'))
+    np.testing.assert_array_equal(stitchedFrames, np.concatenate(
+        [np.load(os.path.join(poolDir, renderedTraj['path']))['frames'] for renderedTraj in renderIndex]))
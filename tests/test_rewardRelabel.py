@@ -0,0 +1,88 @@
+import numpy as np
+
+from src.environment.vectorizedEnv import BatchReshapeAction
+from src.functionTools.experiment import getCondition, buildEnvFromCondition
+from src.functionTools.rewardRelabel import GetRewardEvents, RelabelPredatorRewards, relabelColumnarTrajectories, \
+    getRelabeledRewardField
+from src.functionTools.trajectoryStore import saveColumnarTrajectories, ColumnarTrajectories
+
+numPredators, numSteps = 3, 200
+sourceParameters = {'killProportion': 0.5, 'biteReward': 1.0}
+
+
+def moveSomePredatorsOntoPrey(states, rng):
+    preyID = numPredators
+    isContact = rng.uniform(size=states.shape[:-2] + (numPredators,)) < 0.3
+    offset = rng.uniform(-0.05, 0.05, size=isContact.shape + (2,))
+    states[..., :numPredators, 0:2] = np.where(isContact[..., None], states[..., None, preyID, 0:2] + offset, states[..., :numPredators, 0:2])
+    return states
+
+
+def getBatchEnvRewards(selfish, cost, nextStates, actions, seed):
+    # the batch env draws its kills independently of selfish and cost, so one seed gives the same events for every setting
+    np.random.seed(seed)
+    batchEnv = buildEnvFromCondition(getCondition(numPredators, cost=cost, selfish=selfish, **sourceParameters), batch=True)
+    return batchEnv['rewardFunc'](nextStates, actions, nextStates)
+
+
+def testRelabeledRewardsMatchEnvironmentRewards():
+    rng = np.random.RandomState(0)
+    env = buildEnvFromCondition(getCondition(numPredators, **sourceParameters))
+    nextStates = moveSomePredatorsOntoPrey(np.stack([env['reset']() for step in range(numSteps)]), rng)
+    actions = rng.uniform(0, 1, size=(numSteps, env['numAgents'], 5))
+    predatorsID = env['predatorsID']
+
+    for sourceSelfish, sourceCost in [(0.0, 0.1), (200.0, 0.1)]:
+        rewards, isKill = getBatchEnvRewards(sourceSelfish, sourceCost, nextStates, actions, 1)
+        assert 0 < np.sum(isKill) < numSteps
+        getRewardEvents = GetRewardEvents(predatorsID, env['preyGroupID'], env['entitiesSizeList'], 10, 1.0, sourceSelfish, sourceCost)
+        rewardEvents = getRewardEvents(nextStates, actions, rewards, isKill, np.zeros(numSteps, dtype=bool))
+        np.testing.assert_array_equal(rewardEvents['isKill'], isKill)
+
+        # a selfish (> 100) target needs the killer, which is only known when the source was selfish too
+        targetSettings = [(sourceSelfish, sourceCost), (0.0, 0.0), (2.0, 0.3)] + [(200.0, 0.3)] * (sourceSelfish > 100)
+        relabeledRewards = RelabelPredatorRewards(10, getRewardEvents.collisionMinDist[0])(rewardEvents, actions[:, predatorsID], targetSettings)
+        for (selfish, cost), settingRewards in zip(targetSettings, relabeledRewards):
+            expectedRewards, expectedIsKill = getBatchEnvRewards(selfish, cost, nextStates, actions, 1)
+            np.testing.assert_array_equal(expectedIsKill, isKill)
+            np.testing.assert_allclose(settingRewards, expectedRewards[:, predatorsID], atol=1e-9)
+
+
+def sampleTrajectories(env, numTrajectories, numTrajectorySteps, rng):
+    # rollouts of the sequential environment with random actions, in which predators often land on the prey
+    trajectories = []
+    for trajectoryID in range(numTrajectories):
+        state = env['reset']()
+        trajectory = []
+        for step in range(numTrajectorySteps):
+            action = list(rng.uniform(0, 1, size=(env['numAgents'], 5)))
+            nextState = moveSomePredatorsOntoPrey(np.array(env['transit'](state, action)), rng)
+            reward = env['rewardFunc'](state, action, nextState)
+            trajectory.append((state, action, reward, nextState))
+            state = env['reset']() if env['isTerminal'](nextState) else nextState
+        trajectories.append(trajectory)
+    return trajectories
+
+
+def testRelabelStoreKeepsRecordedSettingAndShiftsActionCost(tmp_path):
+    np.random.seed(0)
+    condition = getCondition(numPredators, cost=0.1, selfish=0.0, **sourceParameters)
+    env = buildEnvFromCondition(condition)
+    path = str(tmp_path / 'store')
+    saveColumnarTrajectories(sampleTrajectories(env, 4, 50, np.random.RandomState(1)), path)
+
+    targetSettings = [(0.0, 0.1), (0.0, 0.4)]
+    fields = relabelColumnarTrajectories(path, env, condition, targetSettings)
+    assert fields == [getRelabeledRewardField(selfish, cost) for selfish, cost in targetSettings]
+
+    store = ColumnarTrajectories(path)
+    assert set(store.meta['relabeledRewards']) == set(fields)
+    rewards = np.asarray(store.columns['rewards'])
+    assert np.any(np.sum(rewards[:, env['predatorsID']], axis=1) > 5)
+    np.testing.assert_allclose(ColumnarTrajectories(path, rewardField=fields[0]).columns['rewards'], rewards, atol=1e-9)
+
+    predatorsActions = np.asarray(store.columns['actions'])[:, env['predatorsID']]
+    actionMagnitude = np.sqrt(np.sum(np.square(BatchReshapeAction()(predatorsActions)), axis=-1))
+    expectedRewards = rewards.copy()
+    expectedRewards[:, env['predatorsID']] -= (0.4 - 0.1) * actionMagnitude
+    np.testing.assert_allclose(ColumnarTrajectories(path, rewardField=fields[1]).columns['rewards'], expectedRewards, atol=1e-9)
@@ -0,0 +1,82 @@
+import os
+import numpy as np
+
+from src.functionTools.experiment import getCondition, getModelFileName, findTrainedModelFileName
+from src.functionTools.loadSaveModel import removeCheckpoint
+from src.maddpg.rlTools.RLrun import StopTraining, RunAlgorithm
+
+
+def getStopEpisode(metrics, windowSize, tolerance, patience, minEpisodes):
+    # the stopping rule over the whole metric sequence at once: window means, running best, windows without a gain
+    windowMetrics = np.mean(np.reshape(metrics[:len(metrics) // windowSize * windowSize], (-1, windowSize)), axis=1)
+    bestBefore = np.maximum.accumulate(np.concatenate([[-np.inf], windowMetrics[:-1]]))
+    numWindowsWithoutImprovement = 0
+    for windowID, (windowMetric, bestMetric) in enumerate(zip(windowMetrics, bestBefore)):
+        numWindowsWithoutImprovement = 0 if windowMetric > bestMetric + tolerance else numWindowsWithoutImprovement + 1
+        stopEpisode = (windowID + 1) * windowSize
+        if numWindowsWithoutImprovement >= patience and stopEpisode >= minEpisodes:
+            return stopEpisode
+    return None
+
+
+def runStopTraining(stopTraining, metrics):
+    for episode, metric in enumerate(metrics):
+        if stopTraining(metric):
+            return episode + 1
+    return None
+
+
+def testPlateauStopMatchesWindowedRule():
+    rng = np.random.RandomState(0)
+    metrics = np.concatenate([np.linspace(0, 3, 400), np.full(600, 3.0)]) + rng.normal(0, 0.2, size=1000)
+    for windowSize, tolerance, patience, minEpisodes in [(50, 0.05, 3, 0), (50, 0.05, 3, 900), (100, 0.0, 2, 0), (20, 1.0, 4, 0)]:
+        stopTraining = StopTraining(lambda metric: metric, windowSize, tolerance, patience, minEpisodes)
+        expectedStopEpisode = getStopEpisode(metrics, windowSize, tolerance, patience, minEpisodes)
+        assert runStopTraining(stopTraining, metrics) == expectedStopEpisode
+        assert (stopTraining.stopReason is None) == (expectedStopEpisode is None)
+    assert runStopTraining(StopTraining(lambda metric: metric, 50, 0.05, 3, 2000), metrics) is None
+
+
+def testSpentBudgetStops():
+    stopTraining = StopTraining(None, 10, 0.0, 1, wallClockBudget=0)
+    assert stopTraining(0.0) and 'wall-clock' in stopTraining.stopReason
+    stopTraining = StopTraining(None, 10, 0.0, 1, wallClockBudget=3600, cpuTimeBudget=3600)
+    assert runStopTraining(stopTraining, np.zeros(100)) is None
+
+
+def testStoppedRunIsPrefixOfFullRun():
+    episodeRewards = iter(np.arange(100, dtype=float))
+    runEpisode = lambda replayBuffer: (replayBuffer, np.array([next(episodeRewards), 1.0]))
+    fullRewards = RunAlgorithm(runEpisode, 30, [lambda: None] * 2, numAgents=2)([])
+    # a flat metric improves on -inf in the first window only, so the third window of 4 ends the run
+    episodeRewards = iter(np.arange(100, dtype=float))
+    stopTraining = StopTraining(lambda episodeReward: 0.0, 4, 0.0, 2)
+    stoppedRewards = RunAlgorithm(runEpisode, 30, [lambda: None] * 2, numAgents=2, stopTraining=stopTraining)([])
+    assert stoppedRewards == fullRewards[:12] and stopTraining.numEpisodes == 12
+
+
+def writeCheckpoint(modelDir, fileName):
+    for extension in ['.index', '.meta', '.data-00000-of-00001']:
+        open(os.path.join(modelDir, fileName + extension), 'w').close()
+
+
+def testTrainedModelFileNamePrefersFullRun(tmp_path):
+    modelDir = str(tmp_path)
+    condition = getCondition(3)
+    stoppedFileName = lambda numEpisodes: getModelFileName({**condition, 'maxEpisode': numEpisodes})
+    assert findTrainedModelFileName(os.path.join(modelDir, 'missing'), condition) == getModelFileName(condition)
+    assert findTrainedModelFileName(modelDir, condition) == getModelFileName(condition)
+
+    [writeCheckpoint(modelDir, stoppedFileName(numEpisodes) + '0') for numEpisodes in [1200, 34000, 5000]]
+    writeCheckpoint(modelDir, getModelFileName({**condition, 'selfish': 1.0, 'maxEpisode': 50000}) + '0')
+    assert findTrainedModelFileName(modelDir, condition) == stoppedFileName(34000)
+    writeCheckpoint(modelDir, getModelFileName(condition) + '0')
+    assert findTrainedModelFileName(modelDir, condition) == getModelFileName(condition)
+
+
+def testRemoveCheckpointKeepsOtherAgents(tmp_path):
+    modelDir = str(tmp_path)
+    fileName = getModelFileName(getCondition(3))
+    [writeCheckpoint(modelDir, fileName + agentID) for agentID in ['1', '10']]
+    removeCheckpoint(os.path.join(modelDir, fileName + '1'))
+    assert sorted(os.listdir(modelDir)) == sorted(fileName + '10' + extension for extension in ['.index', '.meta', '.data-00000-of-00001'])
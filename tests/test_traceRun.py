@@ -0,0 +1,71 @@
+import os
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow.contrib.layers')
+
+from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainCriticBySASR, TraceRun, runWithoutTrace
+from src.maddpg.rlTools.RLrun import UpdateParameters
+from src.functionTools.experiment import actionDim
+from src.functionTools.loadSaveModel import saveVariables, restoreVariables
+
+layersWidths = [16, 16]
+obsShape = [10, 10, 10, 8]
+numAgents, batchSize, numLearnSteps, traceInterval = len(obsShape), 8, 7, 3
+
+
+def sampleMiniBatch(rng):
+    allAgentsStateBatch = [[rng.randn(agentObsDim) for agentObsDim in obsShape] for sample in range(batchSize)]
+    allAgentsActionsBatch = [[rng.dirichlet(np.ones(actionDim)) for agentObsDim in obsShape] for sample in range(batchSize)]
+    allAgentsNextStatesBatch = [[rng.randn(agentObsDim) for agentObsDim in obsShape] for sample in range(batchSize)]
+    allAgentsRewardBatch = [rng.randn(numAgents) for sample in range(batchSize)]
+    return allAgentsStateBatch, allAgentsActionsBatch, allAgentsNextStatesBatch, allAgentsRewardBatch
+
+
+def actByFixedTargetPolicy(model, allAgentsNextStatesBatch):
+    return np.full((len(allAgentsNextStatesBatch), actionDim), 1.0 / actionDim)
+
+
+def runLearnSteps(model, runSession, traceRun):
+    trainCriticBySASR = TrainCriticBySASR(actByFixedTargetPolicy, 0.01, 0.95, None, runSession)
+    updateParameters = UpdateParameters(1, 0.01, traceRun)
+    rng = np.random.RandomState(0)
+    criticLosses = []
+    for learnStep in range(numLearnSteps):
+        criticLoss, model = trainCriticBySASR(0, [model] * numAgents, *sampleMiniBatch(rng))
+        criticLosses.append(criticLoss)
+        updateParameters(model)
+    targetParams = model.run(model.graph.get_collection_ref("criticTargetParams_")[0])
+    return criticLosses, targetParams
+
+
+def testTracedCallsWriteTimelinesWithoutChangingTraining(tmp_path):
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape)
+    model, tracedModel = buildMADDPGModels(layersWidths, 0), buildMADDPGModels(layersWidths, 0)
+    checkpointPath = str(tmp_path / 'model' / 'agent0')
+    saveVariables(model, checkpointPath)
+    restoreVariables(tracedModel, checkpointPath)
+
+    traceDir = str(tmp_path / 'traces')
+    traceRun = TraceRun(traceInterval, traceDir, [tracedModel])
+    tracedLosses, tracedTargetParams = runLearnSteps(tracedModel, traceRun, traceRun)
+    criticLosses, targetParams = runLearnSteps(model, runWithoutTrace, None)
+    np.testing.assert_allclose(tracedLosses, criticLosses, rtol=1e-5)
+    [np.testing.assert_allclose(tracedParam, param, rtol=1e-5, atol=1e-7) for tracedParam, param in zip(tracedTargetParams, targetParams)]
+
+    tracedSteps = list(range(0, numLearnSteps, traceInterval))
+    expectedTraceFiles = ['{}{}.json'.format(callName, step) for callName in ['trainCritic', 'updateParameters'] for step in tracedSteps]
+    assert sorted(os.listdir(os.path.join(traceDir, 'agent0'))) == sorted(expectedTraceFiles)
+    with open(os.path.join(traceDir, 'agent0', 'trainCritic0.json')) as traceFile:
+        assert len(json.load(traceFile)['traceEvents']) > 0
+
+    with open(os.path.join(traceDir, 'opSummary.json')) as summaryFile:
+        agentSummary = json.load(summaryFile)['agent0']
+    assert agentSummary['tracedCalls'] == {'trainCritic': len(tracedSteps), 'updateParameters': len(tracedSteps)}
+    assert set(agentSummary['meanMicrosByCall']) == {'trainCritic', 'updateParameters'}
+    assert 0 < len(agentSummary['topOps']) <= traceRun.numTopOps
+    assert sum(op['share'] for op in agentSummary['topOps']) <= 1 + 1e-6
+    totalMeanMicros = sum(agentSummary['meanMicrosByCall'].values())
+    np.testing.assert_allclose(sum(agentSummary['meanMicrosByType'].values()), totalMeanMicros)
+    np.testing.assert_allclose(sum(agentSummary['meanMicrosByScope'].values()), totalMeanMicros)
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow.contrib.layers')
+import tensorflow as tf
+
+from src.maddpg.trainer.MADDPG import BuildMADDPGModels, TrainCriticBySASR, TrainActorFromSA, WriteSummary, runWithoutTrace
+from src.functionTools.experiment import actionDim
+from src.functionTools.loadSaveModel import saveVariables, restoreVariables
+
+layersWidths = [16, 16]
+obsShape = [10, 10, 10, 8]
+numAgents, batchSize, numLearnSteps = len(obsShape), 8, 5
+
+
+def sampleMiniBatch(rng):
+    allAgentsStateBatch = [[rng.randn(agentObsDim) for agentObsDim in obsShape] for sample in range(batchSize)]
+    allAgentsActionsBatch = [[rng.dirichlet(np.ones(actionDim)) for agentObsDim in obsShape] for sample in range(batchSize)]
+    allAgentsNextStatesBatch = [[rng.randn(agentObsDim) for agentObsDim in obsShape] for sample in range(batchSize)]
+    allAgentsRewardBatch = [rng.randn(numAgents) for sample in range(batchSize)]
+    return allAgentsStateBatch, allAgentsActionsBatch, allAgentsNextStatesBatch, allAgentsRewardBatch
+
+
+def actByFixedTargetPolicy(model, allAgentsNextStatesBatch):
+    # a deterministic stand-in for the noisy target policy, so runs from the same weights make the same critic updates
+    return np.full((len(allAgentsNextStatesBatch), actionDim), 1.0 / actionDim)
+
+
+class RecordFetches:
+    def __init__(self):
+        self.fetches = []
+
+    def __call__(self, agentModel, callName, fetches, feedDict):
+        self.fetches.append((callName, fetches))
+        return runWithoutTrace(agentModel, callName, fetches, feedDict)
+
+
+def runLearnSteps(model, writeSummary, runSession = runWithoutTrace):
+    trainCriticBySASR = TrainCriticBySASR(actByFixedTargetPolicy, 0.01, 0.95, writeSummary, runSession)
+    trainActorFromSA = TrainActorFromSA(0.01, writeSummary, runSession)
+    rng = np.random.RandomState(0)
+    criticLosses = []
+    for learnStep in range(numLearnSteps):
+        allAgentsStateBatch, allAgentsActionsBatch, allAgentsNextStatesBatch, allAgentsRewardBatch = sampleMiniBatch(rng)
+        criticLoss, model = trainCriticBySASR(0, [model] * numAgents, allAgentsStateBatch, allAgentsActionsBatch,
+                                              allAgentsNextStatesBatch, allAgentsRewardBatch)
+        criticLosses.append(criticLoss)
+        trainActorFromSA(0, model, allAgentsStateBatch, allAgentsActionsBatch)
+    return criticLosses
+
+
+def getSummaryStepsByTag(logDir):
+    stepsByTag = {}
+    for eventFileName in os.listdir(logDir):
+        for event in tf.train.summary_iterator(os.path.join(logDir, eventFileName)):
+            for value in event.summary.value:
+                stepsByTag.setdefault(value.tag, []).append(event.step)
+    return stepsByTag
+
+
+def testSummariesAreNotFetchedByDefault():
+    model = BuildMADDPGModels(actionDim, numAgents, obsShape)(layersWidths, 0)
+    summaryOps = model.graph.get_collection_ref("criticSummary_") + model.graph.get_collection_ref("actorSummary_")
+    recordFetches = RecordFetches()
+    runLearnSteps(model, None, recordFetches)
+    assert [callName for callName, fetches in recordFetches.fetches] == ['trainCritic', 'trainActor'] * numLearnSteps
+    fetchedTensors = [tensor for callName, fetches in recordFetches.fetches
+                      for tensor in (fetches if isinstance(fetches, list) else [fetches])]
+    assert not any(tensor in summaryOps for tensor in fetchedTensors)
+
+
+def testSummariesAreWrittenEveryIntervalWithoutChangingTraining(tmp_path):
+    buildMADDPGModels = BuildMADDPGModels(actionDim, numAgents, obsShape)
+    model, summaryModel = buildMADDPGModels(layersWidths, 0), buildMADDPGModels(layersWidths, 0)
+    checkpointPath = str(tmp_path / 'model' / 'agent0')
+    saveVariables(model, checkpointPath)
+    restoreVariables(summaryModel, checkpointPath)
+
+    writeSummary = WriteSummary(2, str(tmp_path / 'summaries'))
+    summaryCriticLosses = runLearnSteps(summaryModel, writeSummary)
+    writeSummary.close()
+    np.testing.assert_allclose(summaryCriticLosses, runLearnSteps(model, None), rtol=1e-5)
+
+    stepsByTag = getSummaryStepsByTag(str(tmp_path / 'summaries' / 'agent0'))
+    summaryTags = ['criticLoss', 'targetQMean', 'QMean', 'QMax', 'QMin', 'criticGradNorm', 'actorLoss', 'policyQMean', 'actorGradNorm']
+    assert set(summaryTags) <= {tag.split('/')[-1] for tag in stepsByTag}
+    assert all(sorted(steps) == [0, 2, 4] for tag, steps in stepsByTag.items())
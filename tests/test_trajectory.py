@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.functionTools.trajectory import SampleTrajectory
+from src.functionTools.trajectoryStore import WriteColumnarTrajectories, saveColumnarTrajectories, ColumnarTrajectories
+
+# a one-agent world on a line: the action moves the agent, the reward is its position and it is reset past 3
+transit = lambda state, action: state + action
+rewardFunc = lambda state, action, nextState: [float(nextState[0])]
+isTerminal = lambda state: state[0] > 3
+
+
+def sampleTrajectoryInOneList(maxRunningSteps, reset, policy):
+    # SampleTrajectory before steps were generated one at a time
+    state = reset()
+    trajectory = []
+    for runningStep in range(maxRunningSteps):
+        action = policy(state)
+        nextState = transit(state, action)
+        reward = rewardFunc(state, action, nextState)
+        trajectory.append((state, action, reward, nextState))
+        state = nextState
+        if isTerminal(state):
+            state = reset()
+    return trajectory
+
+
+def testGeneratedStepsMatchListTrajectory():
+    reset = lambda: np.random.uniform(-1, 1, size=1)
+    policy = lambda state: np.random.uniform(0, 1, size=1)
+    np.random.seed(0)
+    expectedTrajectory = sampleTrajectoryInOneList(30, reset, policy)
+    np.random.seed(0)
+    trajectory = list(SampleTrajectory(30, transit, isTerminal, rewardFunc, reset).generate(policy))
+    assert len(trajectory) == len(expectedTrajectory)
+    for timeStep, expectedTimeStep in zip(trajectory, expectedTrajectory):
+        [np.testing.assert_array_equal(field, expectedField) for field, expectedField in zip(timeStep, expectedTimeStep)]
+
+
+def testStreamedStoreMatchesStoreOfListedTrajectories(tmp_path):
+    reset = lambda: np.random.uniform(-1, 1, size=1)
+    policy = lambda state: np.random.uniform(0, 1, size=1)
+    sampleTrajectory = SampleTrajectory(20, transit, isTerminal, rewardFunc, reset)
+
+    np.random.seed(1)
+    writeColumnarTrajectories = WriteColumnarTrajectories(str(tmp_path / 'streamed'))
+    for trajectoryID in range(3):
+        [writeColumnarTrajectories.appendStep(timeStep) for timeStep in sampleTrajectory.generate(policy)]
+        writeColumnarTrajectories.endTrajectory()
+    writeColumnarTrajectories.close()
+    np.random.seed(1)
+    saveColumnarTrajectories([sampleTrajectory(policy) for trajectoryID in range(3)], str(tmp_path / 'listed'))
+
+    streamed, listed = ColumnarTrajectories(str(tmp_path / 'streamed')), ColumnarTrajectories(str(tmp_path / 'listed'))
+    np.testing.assert_array_equal(streamed.episodeOffsets, listed.episodeOffsets)
+    for field in listed.columns:
+        np.testing.assert_array_equal(streamed.columns[field], listed.columns[field])
@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.environment.multiAgentEnv import IsCollision, getPosFromAgentState
+from src.functionTools.trajectoryStatus import GetTrajectoryStatus, CountTrajectoryContacts, getTrajectoryStateArrays, \
+    getStatusLabels, biteStatus, killStatus
+from src.visualize.drawDemo import CheckStatus
+
+numPredators, numPrey, numBlocks = 3, 1, 2
+predatorsID, preyGroupID = list(range(numPredators)), list(range(numPredators, numPredators + numPrey))
+predatorSize, preySize, blockSize = 0.075, 0.05, 0.2
+entitiesSizeList = [predatorSize] * numPredators + [preySize] * numPrey + [blockSize] * numBlocks
+
+
+def sampleTrajectory(numSteps, rng):
+    # random states where some predators touch the prey, and the world is reset after some of those steps
+    numEntities = len(entitiesSizeList)
+    states = [rng.uniform(-1, 1, size=(numEntities, 4))]
+    trajectory = []
+    for timeStep in range(numSteps):
+        nextState = rng.uniform(-1, 1, size=(numEntities, 4))
+        isContact = rng.uniform(size=numPredators) < 0.3
+        nextState[:numPredators][isContact, 0:2] = nextState[numPredators, 0:2] + 0.05
+        isReset = np.any(isContact) and rng.uniform() < 0.5
+        trajectory.append((states[-1], None, None, nextState))
+        states.append(rng.uniform(-1, 1, size=(numEntities, 4)) if isReset else nextState)
+    return trajectory
+
+
+def testTrajectoryStatusMatchesCheckStatus():
+    trajectory = sampleTrajectory(60, np.random.RandomState(0))
+    checkStatus = CheckStatus(predatorsID, preyGroupID, IsCollision(getPosFromAgentState), predatorSize, preySize, 0, 3)
+    expectedLabels = [checkStatus(timeStep, trajectory[index + 1] if index != len(trajectory) - 1 else None)
+                      for index, timeStep in enumerate(trajectory)]
+
+    status = GetTrajectoryStatus(predatorsID, preyGroupID, entitiesSizeList)(*getTrajectoryStateArrays(trajectory))
+    assert status.shape == (len(trajectory), numPredators + numPrey)
+    assert np.any(status == biteStatus) and np.any(status == killStatus)
+    assert getStatusLabels(status, predatorsID) == expectedLabels
+
+
+def testContactCountsSumStatusPerAgent():
+    trajectory = sampleTrajectory(40, np.random.RandomState(1))
+    getTrajectoryStatus = GetTrajectoryStatus(predatorsID, preyGroupID, entitiesSizeList)
+    states, nextStates = getTrajectoryStateArrays(trajectory)
+    status = getTrajectoryStatus(states, nextStates)
+    biteSteps, killSteps = CountTrajectoryContacts(getTrajectoryStatus)(states, nextStates)
+    np.testing.assert_array_equal(biteSteps, np.sum(status == biteStatus, axis=0))
+    np.testing.assert_array_equal(killSteps, np.sum(status == killStatus, axis=0))
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+
+from src.functionTools.trajectoryStore import saveColumnarTrajectories, ColumnarTrajectories
+
+
+def makeTrajectories(numTrajectories, numSteps, seed):
+    # steps chain state -> nextState, with a reset (new state) in the middle of every trajectory, as after a kill
+    rng = np.random.RandomState(seed)
+    trajectories = []
+    for trajectoryID in range(numTrajectories):
+        state = rng.randn(3, 4)
+        trajectory = []
+        for step in range(numSteps):
+            if step == numSteps // 2:
+                state = rng.randn(3, 4)
+            nextState = rng.randn(3, 4)
+            trajectory.append((state, rng.randn(3, 5), rng.randn(3), nextState))
+            state = nextState
+        trajectories.append(trajectory)
+    return trajectories
+
+
+def testRoundTripMatchesTrajectories(tmp_path):
+    path = str(tmp_path / 'store')
+    trajectories = makeTrajectories(3, 6, 0)
+    saveColumnarTrajectories(trajectories, path)
+    store = ColumnarTrajectories(path)
+    assert len(store) == len(trajectories)
+    for trajectory, storedTrajectory in zip(trajectories, store):
+        assert len(storedTrajectory) == len(trajectory)
+        for timeStep, storedTimeStep in zip(trajectory, storedTrajectory):
+            [np.testing.assert_array_equal(field, storedField) for field, storedField in zip(timeStep, storedTimeStep)]
+    # states are pooled: a chained state is stored once, a reset adds one
+    assert len(store.columns['states']) == 3 * (6 + 2)
+
+
+def testFloat16StoreIsClose(tmp_path):
+    path = str(tmp_path / 'store')
+    trajectories = makeTrajectories(2, 4, 1)
+    saveColumnarTrajectories(trajectories, path, float16=True)
+    store = ColumnarTrajectories(path)
+    assert store.columns['states'].dtype == np.float16
+    np.testing.assert_allclose(store[1][2][0], trajectories[1][2][0], atol=1e-2)
+
+
+def testRewriteReplacesEarlierStore(tmp_path):
+    path = str(tmp_path / 'store')
+    saveColumnarTrajectories(makeTrajectories(4, 6, 2), path)
+    np.save(os.path.join(path, 'rewardsSelfish1.0Cost0.0.npy'), np.zeros((24, 3)))
+    newTrajectories = makeTrajectories(2, 3, 3)
+    saveColumnarTrajectories(newTrajectories, path)
+    assert not os.path.exists(os.path.join(path, 'rewardsSelfish1.0Cost0.0.npy'))
+    assert sorted(os.listdir(str(tmp_path))) == ['store']
+    store = ColumnarTrajectories(path)
+    assert len(store) == 2 and 'relabeledRewards' not in store.meta
+    np.testing.assert_array_equal(store[1][2][2], newTrajectories[1][2][2])
@@ -0,0 +1,89 @@
+import numpy as np
+
+from src.environment.chasingEnv import BuildChasingEnv, BuildBatchChasingEnv
+from src.functionTools.vectorizedEvaluation import EvaluateTrajKillsInLockstep
+
+numPredators, numBlocks, numWorlds = 3, 2, 8
+
+
+def buildEnvs(killProportion = 0.2, biteReward = 0.0, cost = 0.0, selfish = 0.0):
+    buildParameters = dict(killProportion=killProportion, biteReward=biteReward)
+    envParameters = (numPredators, numBlocks, 1.0, cost, selfish)
+    return BuildChasingEnv(**buildParameters)(*envParameters), BuildBatchChasingEnv(**buildParameters)(*envParameters)
+
+
+def sampleStatesAndActions(env, rng):
+    states = np.stack([env['reset']() for world in range(numWorlds)])
+    actions = rng.uniform(0, 1, size=(numWorlds, env['numAgents'], 5))
+    return states, actions
+
+
+def getStatesWithPredatorsOnPrey(states):
+    # every predator overlaps the prey, so each of them collides with it
+    preyID = numPredators
+    states = states.copy()
+    states[:, :numPredators, 0:2] = states[:, None, preyID, 0:2] + np.array([[0.01, 0.0], [0.0, 0.02], [-0.03, 0.0]])
+    return states
+
+
+def testBatchTransitMatchesSequentialTransit():
+    np.random.seed(0)
+    env, batchEnv = buildEnvs()
+    states, actions = sampleStatesAndActions(env, np.random.RandomState(1))
+    states = np.concatenate([states, getStatesWithPredatorsOnPrey(states)])
+    actions = np.concatenate([actions, actions])
+    nextStates = batchEnv['transit'](states, actions)
+    for world in range(len(states)):
+        np.testing.assert_allclose(nextStates[world], env['transit'](states[world], list(actions[world])), atol=1e-10)
+
+
+def testBatchObserveMatchesSequentialObserve():
+    np.random.seed(0)
+    env, batchEnv = buildEnvs()
+    states = batchEnv['reset'](numWorlds)
+    observations = batchEnv['observe'](states)
+    for world in range(numWorlds):
+        for agentObs, expectedAgentObs in zip(observations, env['observe'](states[world])):
+            np.testing.assert_allclose(agentObs[world], expectedAgentObs)
+
+
+def testBatchRewardMatchesSequentialRewardWithoutKills():
+    # with no kill draws the sequential reward is deterministic: every colliding predator bites
+    np.random.seed(0)
+    env, batchEnv = buildEnvs(killProportion=0.0, biteReward=1.0, cost=0.1)
+    states, actions = sampleStatesAndActions(env, np.random.RandomState(1))
+    nextStates = np.concatenate([states, getStatesWithPredatorsOnPrey(states)])
+    actions = np.concatenate([actions, actions])
+    rewards, terminal = batchEnv['rewardFunc'](nextStates, actions, nextStates)
+    assert not np.any(terminal)
+    assert np.all(rewards[numWorlds:, :numPredators] > 0)
+    for world in range(len(nextStates)):
+        np.testing.assert_allclose(rewards[world], env['rewardFunc'](nextStates[world], list(actions[world]), nextStates[world]))
+
+
+def testBatchRewardMatchesSequentialRewardWithCertainKill():
+    # with certain kills the first colliding predator kills and nobody bites, whatever the random order
+    np.random.seed(0)
+    env, batchEnv = buildEnvs(killProportion=1.0, biteReward=1.0)
+    states, actions = sampleStatesAndActions(env, np.random.RandomState(1))
+    nextStates = getStatesWithPredatorsOnPrey(states)
+    rewards, terminal = batchEnv['rewardFunc'](nextStates, actions, nextStates)
+    assert np.all(terminal)
+    for world in range(numWorlds):
+        expectedReward = env['rewardFunc'](nextStates[world], list(actions[world]), nextStates[world])
+        assert env['isTerminal'](nextStates[world])
+        np.testing.assert_allclose(rewards[world], expectedReward)
+        np.testing.assert_allclose(np.sum(rewards[world, :numPredators]), 10)
+
+
+def testLockstepEvaluationSplitsTrajectoriesIntoWorldChunks():
+    chunkSizes = []
+
+    def sampleTrajKillsInLockstep(batchPolicy, numWorlds):
+        chunkSizes.append(numWorlds)
+        return np.full(numWorlds, len(chunkSizes), dtype=float)
+
+    trajKills, meanTrajKill, seTrajKill, trajPerSecond = EvaluateTrajKillsInLockstep(sampleTrajKillsInLockstep, 4)(None, 10)
+    assert chunkSizes == [4, 4, 2]
+    np.testing.assert_array_equal(trajKills, [1, 1, 1, 1, 2, 2, 2, 2, 3, 3])
+    np.testing.assert_allclose(meanTrajKill, np.mean(trajKills))
@@ -0,0 +1,71 @@
+import json
+import os
+import numpy as np
+
+from src.functionTools.experiment import getCondition, buildEnvFromCondition
+from src.functionTools.goldenTrajectory import SampleChasingAction
+from src.functionTools.rewardRelabel import getRelabeledRewardField
+from src.functionTools.trajectoryStore import saveColumnarTrajectories, ColumnarTrajectories
+from src.functionTools.warmStart import BatchChasePolicy, getReplayTransitions, getWarmStartRewardField
+from src.maddpg.rlTools.RLrun import RunTimeStep, SampleOneStep
+
+numPredators, actionDim = 3, 5
+
+
+def testBatchChasePolicyMatchesSampleChasingAction():
+    env = buildEnvFromCondition(getCondition(numPredators))
+    states = np.stack([env['reset']() for world in range(6)])
+    actions = BatchChasePolicy(env['predatorsID'], env['preyGroupID'][0], env['numAgents'], actionDim, seed=0)(states)
+
+    randomState = np.random.RandomState(0)
+    sampleRandomAction = lambda state: list(randomState.dirichlet(np.ones(actionDim), size=env['numAgents']))
+    sampleChasingAction = SampleChasingAction(env['predatorsID'], env['preyGroupID'][0], sampleRandomAction)
+    for worldActions, state in zip(actions, states):
+        np.testing.assert_allclose(worldActions, sampleChasingAction(state))
+
+
+def testReplayTransitionsMatchTransitionsCollectedByActing(tmp_path):
+    # the transitions RunTimeStep appends while acting, against those rebuilt from a store of the same steps
+    np.random.seed(0)
+    condition = getCondition(numPredators, killProportion=1.0)
+    env, batchEnv = buildEnvFromCondition(condition), buildEnvFromCondition(condition, batch=True)
+    trajectory = []
+
+    def sampleOneStep(state, action):
+        reward, nextState = SampleOneStep(env['transit'], env['rewardFunc'])(state, action)
+        trajectory.append((state, action, reward, nextState))
+        return reward, nextState
+
+    actOneStep = lambda observation, runTime: list(np.random.dirichlet(np.ones(actionDim), size=env['numAgents']))
+    runTimeStep = RunTimeStep(actOneStep, sampleOneStep, lambda replayBuffer, runTime: None, env['observe'])
+    replayBuffer, state = [], env['reset']()
+    for step in range(40):
+        reward, state, replayBuffer = runTimeStep(state, replayBuffer)
+        state = env['reset']() if env['isTerminal'](state) else state
+
+    path = str(tmp_path / 'store')
+    saveColumnarTrajectories([trajectory], path)
+    assert len(getReplayTransitions(path, batchEnv['observe'], 30, condition['selfish'], condition['cost'])) == 30
+    transitions = getReplayTransitions(path, batchEnv['observe'], 100, condition['selfish'], condition['cost'])
+    assert len(transitions) == len(replayBuffer) == 40
+    for transition, bufferTransition in zip(transitions, replayBuffer):
+        for field, bufferField in zip(transition, bufferTransition):
+            np.testing.assert_allclose(np.concatenate([np.ravel(row) for row in field]), np.concatenate([np.ravel(row) for row in bufferField]))
+
+
+def testRelabeledRewardColumnIsUsedWhenPresent(tmp_path):
+    path = str(tmp_path / 'store')
+    state = np.zeros((6, 4))
+    saveColumnarTrajectories([[(state, np.zeros((4, actionDim)), np.ones(4), state)]], path)
+    field = getRelabeledRewardField(2.0, 0.1)
+    np.save(os.path.join(path, field + '.npy'), np.full((1, 4), 5.0))
+    with open(os.path.join(path, 'meta.json')) as metaFile:
+        meta = json.load(metaFile)
+    with open(os.path.join(path, 'meta.json'), 'w') as metaFile:
+        json.dump({**meta, 'relabeledRewards': {field: {'selfish': 2.0, 'cost': 0.1}}}, metaFile)
+
+    trajectories = ColumnarTrajectories(path)
+    assert getWarmStartRewardField(trajectories, 2.0, 0.1) == field
+    assert getWarmStartRewardField(trajectories, 0.0, 0.1) == 'rewards'
+    batchObserve = lambda states: [states[:, agentID].reshape(len(states), -1) for agentID in range(4)]
+    assert getReplayTransitions(path, batchObserve, 10, 2.0, 0.1)[0][2] == [5.0] * 4